@@ -0,0 +1,65 @@
+"""Periodische uasyncio-Tasks mit Zeitbudget und Statistik.
+
+periodic() ruft eine async-Funktion alle period_ms auf, ohne dass sich
+Verzögerungen aufsummieren (siehe cadence.py). Für jeden Task wird in
+TaskStats festgehalten, wie spät er gestartet wurde (lag), wie lange ein
+Durchlauf gedauert hat und wie oft das Budget überschritten wurde.
+"""
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+from time import ticks_ms, ticks_diff, ticks_add
+from cadence import next_due
+
+try:
+    sleep_ms = asyncio.sleep_ms
+except AttributeError: # CPython
+    def sleep_ms(ms):
+        return asyncio.sleep(ms / 1000)
+
+
+class TaskStats:
+    def __init__(self, name, period_ms, budget_ms):
+        self.name = name
+        self.period_ms = period_ms
+        self.budget_ms = budget_ms
+        self.runs = 0
+        self.overruns = 0   # Durchläufe länger als budget_ms
+        self.skipped = 0    # Ganz ausgefallene Perioden
+        self.lag_max = 0    # Größte Verspätung beim Start in ms
+        self.lag_sum = 0
+        self.run_max = 0    # Längster Durchlauf in ms
+
+    def __repr__(self):
+        lag = self.lag_sum // self.runs if self.runs else 0
+        return (f"{self.name}: {self.runs} Läufe, Verzug Mittel {lag} ms Max {self.lag_max} ms, "
+                f"Dauer Max {self.run_max} ms, {self.overruns} Überschreitungen, "
+                f"{self.skipped} ausgefallen")
+
+
+async def periodic(stats, fn):
+    """Runs the coroutine function fn every stats.period_ms."""
+    due = ticks_add(ticks_ms(), stats.period_ms)
+    while True:
+        wait = ticks_diff(due, ticks_ms())
+        if wait > 0:
+            await sleep_ms(wait)
+        start = ticks_ms()
+        lag = ticks_diff(start, due)
+        await fn()
+        dur = ticks_diff(ticks_ms(), start)
+        stats.runs += 1
+        stats.lag_sum += lag
+        if lag > stats.lag_max:
+            stats.lag_max = lag
+        if dur > stats.run_max:
+            stats.run_max = dur
+        if dur > stats.budget_ms:
+            stats.overruns += 1
+        due = next_due(stats, due, ticks_ms())
+
+
+def report(stats):
+    for s in stats:
+        print(s)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Startzeit der Firmware: Relais gesetzt, erste Schaltentscheidung, fertig.
+
+Die Firmware misst das selbst ab BOOT_TICKS (relay_ms, boot_ms, ready_ms)
+und gibt es beim Start auf der Konsole aus, auf dem Board genügt also ein
+Reset. Dieses Skript startet sie wie sim/replay.py --runs mal auf dem
+Host, jeweils nach einer Stunde Betrieb, so dass RELAYFILE, Logspeicher
+und Statistik schon angelegt sind. Während des Starts läuft die virtuelle
+Uhr zusätzlich mit der Rechenzeit des Hosts, sonst stünde sie bis auf die
+Wartezeiten still. Gemessen wird wie in der Firmware ab BOOT_TICKS (dem
+ersten Aufruf von ticks_ms()): bis die Relais-Pins als Ausgang angelegt sind, bis zur ersten Schaltentscheidung
+(boot_ms der Firmware) und bis zum Ende des Setups. Das geht auch mit
+älteren Ständen, die relay_ms noch nicht kennen. Die Zeiten sind die des
+Hosts, nicht die des RP2040, taugen aber zum Vergleich zweier Stände (das
+Skript in beiden aufrufen):
+
+    python3 bench/bench_boot.py
+    python3 bench/bench_boot.py --reset
+
+Nach dem Einschalten wartet die Firmware den Rest von SENSOR_WARMUP_MS
+auf die Sensoren (virtuelle Zeit, in boot_ms enthalten), mit --reset wird
+wie nach machine.reset() gestartet, dann entfällt das.
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "sim"))
+
+import replay  # noqa: E402  (setzt sys.path für sim/ und die Firmware)
+import machine  # noqa: E402  (Ersatzmodul aus sim/)
+
+RUNS = 20
+
+
+def host_clock(clock):
+    """Lets ticks_ms() and ticks_us() of the virtual clock also advance by
+    the host time spent since the previous call.
+    """
+    last = [time.perf_counter()]
+
+    def advance():
+        t = time.perf_counter()
+        clock.us += int((t - last[0]) * 1e6)
+        last[0] = t
+
+    def ticks_ms():
+        advance()
+        return clock.ticks_ms()
+
+    def ticks_us():
+        advance()
+        return clock.ticks_us()
+    time.ticks_ms = ticks_ms
+    time.ticks_us = time.ticks_cpu = ticks_us
+    return advance
+
+
+def measure(runs=RUNS, reset=False):
+    """Boots the firmware runs times. Returns the lists of the times in ms
+    until the relay outputs are set, until the first switching decision
+    (boot_ms of the firmware) and until the setup is done.
+    """
+    sim = replay.Simulation(replay.Trace.synthetic(runs / 24 + 1))
+    advance = host_clock(sim.clock)
+    outputs = {}    # Pin -> Zeit in us, zu der er als Ausgang angelegt wurde
+    pin_init = machine.Pin.__init__
+
+    def init(self, id, mode=machine.Pin.IN, *args, **kw):
+        pin_init(self, id, mode, *args, **kw)
+        if mode == machine.Pin.OUT and id not in outputs:
+            advance()
+            outputs[id] = sim.clock.us
+
+    start = [None]  # Zeit in us beim ersten ticks_ms() der Firmware: BOOT_TICKS
+    ticks_ms = time.ticks_ms
+
+    def first_ticks_ms():
+        if start[0] is None:
+            advance()
+            start[0] = sim.clock.us
+        return ticks_ms()
+
+    out = {"relays": [], "decision": [], "ready": []}
+    machine.Pin.__init__ = init
+    time.ticks_ms = first_ticks_ms
+    try:
+        sim.run(60 * 60)        # RELAYFILE, Logspeicher und Statistik anlegen
+        for _ in range(runs):
+            machine.cause = machine.WDT_RESET if reset else machine.PWRON_RESET
+            outputs.clear()
+            start[0] = None
+            sim.boot()
+            advance()
+            fw = sim.fw
+            t0 = start[0]
+            out["relays"].append(max(outputs[z[3]] for z in fw.ZONES) - t0)
+            out["decision"].append(fw.boot_ms * 1000)
+            out["ready"].append(sim.clock.us - t0)
+            sim.run(60 * 60)
+    finally:
+        machine.Pin.__init__ = pin_init
+        sim.close()
+    return {k: [us / 1000 for us in v] for k, v in out.items()}
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("--runs", type=int, default=RUNS, help="Starts (Standard %(default)s)")
+    p.add_argument("--reset", action="store_true",
+                   help="Neustart ohne Stromausfall, ohne Anlaufzeit der Sensoren")
+    args = p.parse_args(argv)
+    result = measure(args.runs, args.reset)
+    print(f"{args.runs} Starts ({'Reset' if args.reset else 'Einschalten'}), ms:")
+    print(f"{'':24s} {'Median':>8s} {'Min':>8s} {'Max':>8s}")
+    for name, label in (("relays", "Relais gesetzt"), ("decision", "erste Schaltentscheidung"),
+                        ("ready", "Start fertig")):
+        v = sorted(result[name])
+        print(f"{label:24s} {v[len(v) // 2]:8.2f} {v[0]:8.2f} {v[-1]:8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
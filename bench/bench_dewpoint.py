@@ -0,0 +1,93 @@
+"""Genauigkeit und Geschwindigkeit von dewpoint.taupunkt_fast() gegenüber
+der exakten Magnus-Formel taupunkt().
+
+Aufruf auf dem Host aus dem Projektverzeichnis:
+
+    python3 bench/bench_dewpoint.py
+
+Das Skript läuft auch unter MicroPython (dewpoint.py und dieses Skript auf
+das Board kopieren), dort wird mit time.ticks_us gemessen. Unter CPython
+ist die C-Bibliothek für 10** und log10 schneller als die Interpolation in
+Python. Ob sich die Tabellen auf dem RP2040 ohne Gleitkommaeinheit lohnen,
+zeigt erst ein Lauf dort; bis dahin rechnet die Regelung (zones.py) mit
+taupunkt().
+"""
+import sys
+import time
+
+sys.path.insert(0, __file__.rsplit("/", 2)[0] if "/" in __file__ else ".")
+sys.path.insert(0, ".")
+
+from dewpoint import taupunkt, taupunkt_fast, taupunkt_batch
+
+try:
+    _ticks = time.ticks_us
+    _diff = time.ticks_diff
+except AttributeError:
+    def _ticks():
+        return time.perf_counter_ns() // 1000
+    def _diff(a, b):
+        return a - b
+
+
+def accuracy(t_step, r_step):
+    """Returns (max abs error, t, r) of taupunkt_fast over the DHT22 range."""
+    worst = (0.0, 0.0, 0.0)
+    nt = int(120 / t_step) + 1
+    nr = int(99 / r_step) + 1
+    for i in range(nt):
+        t = -40 + i * t_step
+        for j in range(nr):
+            r = 1 + j * r_step
+            e = abs(taupunkt_fast(t, r) - taupunkt(t, r))
+            if e > worst[0]:
+                worst = (e, t, r)
+    return worst
+
+
+def speed(fn, n=2000):
+    """Returns the mean time per call of fn in microseconds."""
+    start = _ticks()
+    for i in range(n):
+        fn(-40 + (i % 1200) * 0.1, 1 + (i % 99))
+    return _diff(_ticks(), start) / n
+
+
+def speed_batch(n=2000):
+    t = [-40 + (i % 1200) * 0.1 for i in range(n)]
+    r = [1 + (i % 99) for i in range(n)]
+    start = _ticks()
+    taupunkt_batch(t, r)
+    return _diff(_ticks(), start) / n
+
+
+def main():
+    # Sanity values taken from standard dew point tables
+    for t, r, tt in ((20, 50, 9.3), (0, 100, 0.0), (-10, 80, -12.8)):
+        assert abs(taupunkt(t, r) - tt) < 0.1, (t, r, taupunkt(t, r))
+    # Raster bewusst neben den Tabellenstützstellen; auf dem Board reicht ein
+    # gröberes Raster, sonst dauert es zu lange
+    if sys.implementation.name == "micropython":
+        err, t, r = accuracy(1.3, 0.13)
+    else:
+        err, t, r = accuracy(0.7, 0.013)
+    print("max. Fehler taupunkt_fast: {:.4f} K bei t={:.1f} °C r={:.1f} %".format(err, t, r))
+    exact = speed(taupunkt)
+    fast = speed(taupunkt_fast)
+    batch = speed_batch()
+    print("taupunkt:       {:8.2f} us/Aufruf".format(exact))
+    print("taupunkt_fast:  {:8.2f} us/Aufruf ({:.2f}x)".format(fast, exact / fast))
+    print("taupunkt_batch: {:8.2f} us/Wert   ({:.2f}x)".format(batch, exact / batch))
+    try:
+        import numpy as np
+    except ImportError:
+        return
+    n = 1000000
+    t = np.random.uniform(-40, 80, n)
+    r = np.random.uniform(1, 100, n)
+    start = _ticks()
+    taupunkt_batch(t, r)
+    print("taupunkt_batch (NumPy, {} Werte): {:.4f} us/Wert".format(n, _diff(_ticks(), start) / n))
+
+
+main()
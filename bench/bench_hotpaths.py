@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""Laufzeit, Speicheranforderungen und I2C-Verkehr der heißen Pfade.
+
+Die Firmware läuft wie in sim/replay.py unverändert mit den Ersatzmodulen
+aus sim/ (machine mit bytezählendem I2C, dht, neopixel, micropython) auf
+der virtuellen Uhr, gewartet wird also nicht. Gemessen werden
+
+    taupunkt, taupunkt_fast       dewpoint.py
+    display, measure, logdta      Callbacks der Firmware
+    control                       Schaltentscheidung einer Zone
+    flush_log                     logdta(), das ein volles Segment schreibt
+    putstr, clear, custom_char    LcdApi
+    hal_*                         I2cLcd
+
+Je Pfad werden die mittlere Zeit pro Aufruf (perf_counter), die größte
+vorübergehende Speicheranforderung eines Aufrufs und der dauerhaft
+belegte Speicher (tracemalloc) sowie I2C-Transaktionen und Bytes pro
+Aufruf ausgegeben. Die Zeitmessung wird --repeat mal wiederholt, es zählt
+der Median. Beim Vergleich werden die Zeiten über eine feste
+Kalibrierschleife auf die Geschwindigkeit des Rechners bezogen. Deren
+Streuung über die Wiederholungen (mittlere relative Abweichung vom Median)
+gibt die Toleranz vor: NOISE_FACTOR mal die größere Streuung der beiden
+Läufe, mindestens MIN_TOLERANCE. Auf virtuellen Maschinen mit schwankender
+Taktung wird sie so von selbst größer, ein größeres --repeat macht den
+Median stabiler. Die Werte von CPython sind nicht die des RP2040,
+taugen aber zum Vergleich zweier Stände:
+
+    python3 bench/bench_hotpaths.py --save baseline.json
+    ... Änderung ...
+    python3 bench/bench_hotpaths.py --baseline baseline.json
+
+Mit --baseline endet das Skript mit Status 1, wenn ein Pfad um mehr als
+die Toleranz (oder --tolerance, Anteil) langsamer geworden ist, mehr
+Speicher anfordert oder mehr I2C-Verkehr erzeugt.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "sim"))
+
+import replay  # noqa: E402  (setzt sys.path für sim/ und die Firmware)
+import machine  # noqa: E402  (Ersatzmodul aus sim/)
+
+# Zeitabweichung, die noch nicht als Verschlechterung gilt: NOISE_FACTOR mal
+# die Streuung der Kalibrierung (Anteil), mindestens MIN_TOLERANCE
+NOISE_FACTOR = 5
+MIN_TOLERANCE = 0.05
+# Speicher: Abweichung in Bytes, die noch als gleich gilt
+ALLOC_SLACK = 64
+ALLOC_CALLS = 50   # Aufrufe mit tracemalloc je Pfad
+REPEAT = 10        # Zeitmessung wiederholen, der Median zählt
+
+
+class Bench:
+    """One hot path: fn(i) is called n times, setup(i) before each call
+    outside of the measurement.
+    """
+
+    def __init__(self, name, fn, n, setup=None):
+        self.name = name
+        self.fn = fn
+        self.n = n
+        self.setup = setup
+
+
+def time_bench(b):
+    """Returns the total time of b.n calls in seconds."""
+    fn = b.fn
+    setup = b.setup
+    if setup is None:
+        start = time.perf_counter()
+        for i in range(b.n):
+            fn(i)
+        return time.perf_counter() - start
+    total = 0.0
+    for i in range(b.n):
+        setup(i)
+        start = time.perf_counter()
+        fn(i)
+        total += time.perf_counter() - start
+    return total
+
+
+def spread(times):
+    """Median of times and the median relative deviation from it."""
+    med = statistics.median(times)
+    return med, statistics.median(abs(t / med - 1) for t in times) if med else 0.0
+
+
+def calibrate():
+    """Time in seconds of a fixed pure Python workload. The times of two
+    runs are compared relative to it, so that a slower or throttled host
+    does not count as a regression, and its spread sets the tolerance.
+    """
+    start = time.perf_counter()
+    x = 0
+    buf = bytearray(16)
+    for i in range(20000):
+        x += (i * 7) % 13
+        buf[i & 15] = x & 0xFF
+    return time.perf_counter() - start
+
+
+def time_benches(selected, repeat=REPEAT):
+    """Times the benches in repeat passes, each with one calibration and
+    one measurement of every bench, so that a slow phase of the host hits
+    all of them and the calibration alike. Returns the calibration times
+    and the times and I2C traffic (of the first pass) per bench.
+    """
+    calib = []
+    times = {b.name: [] for b in selected}
+    i2c = {}
+    for k in range(repeat):
+        calib.append(calibrate())
+        for b in selected:
+            t0 = machine.I2C.transactions
+            b0 = machine.I2C.bytes
+            times[b.name].append(time_bench(b))
+            if k == 0:
+                i2c[b.name] = (machine.I2C.transactions - t0, machine.I2C.bytes - b0)
+    return calib, times, i2c
+
+
+def run_bench(b, times, i2c):
+    """Result of bench b from its times and I2C traffic, plus the memory
+    measurement.
+    """
+    fn = b.fn
+    setup = b.setup
+    total = statistics.median(times)
+    transactions, nbytes = i2c
+    # Speicher mit tracemalloc, getrennt, weil es die Zeit verfälscht
+    k = min(b.n, ALLOC_CALLS)
+    tracemalloc.start()
+    peak = 0
+    first = tracemalloc.get_traced_memory()[0]
+    for i in range(k):
+        if setup is not None:
+            setup(i)
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn(i)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    net = tracemalloc.get_traced_memory()[0] - first
+    tracemalloc.stop()
+    return {
+        "calls": b.n,
+        "mean_us": 1e6 * total / b.n,
+        "alloc_peak_bytes": peak,
+        "alloc_net_bytes": net / k,
+        "i2c_transactions": transactions / b.n,
+        "i2c_bytes": nbytes / b.n,
+    }
+
+
+def boot_firmware(workdir):
+    """Boots the firmware in the simulation and returns the module."""
+    trace = replay.Trace.synthetic(1)
+    sim = replay.Simulation(trace, workdir=workdir)
+    sim.boot()
+    # Die Timer der Firmware anhalten, sonst laufen während der virtuellen
+    # Wartezeiten in den gemessenen Pfaden weitere Callbacks mit
+    sim.fw.alarm.stop()
+    # Fester Messtakt, sonst fielen die meisten measure() Aufrufe aus
+    sim.fw.reader.max_ms = 0
+    return sim
+
+
+def benches(fw, scale):
+    import dewpoint
+    from machine_i2c_lcd import I2cLcd
+
+    lcd = I2cLcd(machine.I2C(0), 0x27, 2, 16)
+    text = "12" + chr(223) + "C|45%|-3.4" + chr(223) + "C|"
+    charmap = bytearray(b"\x04\x0a\x04\x00\x00\x00\x00\x00")
+    data = bytearray(b"0123456789ABCDEF")
+
+    zone = fw.zones[0]
+    snapshots = [zone.snapshot._replace(t1=20.0 + k, h2=60.0 + k) for k in (0, 1)]
+
+    def display(i):
+        # Abwechselnd zwei Stände, damit render_frame() etwas zu tun hat
+        zone.snapshot = snapshots[i & 1]
+        fw.display()
+
+    def measure(i):
+        # Die Uhr steht, ohne das hielte der Mindestabstand des DHT22 alle
+        # weiteren Messungen zurück
+        for ch in fw.channels:
+            ch.last = None
+        fw.measure()
+
+    def fill_log(i):
+        # Bis auf einen Eintrag füllen, logdta() schreibt dann ein Segment
+        while len(fw.logbuffer) < fw.logstores[0].space() - 1:
+            fw.log_append()
+
+    def flush(i):
+        # logdta() schreibt nur das erste Stück, hier das ganze Segment
+        fw.logdta()
+        while fw.flush_next():
+            pass
+
+    def move_home(i):
+        lcd.move_to(0, 0)
+
+    return [
+        Bench("taupunkt", lambda i: dewpoint.taupunkt(-40 + (i % 1200) * 0.1, 1 + i % 99),
+              20000 * scale),
+        Bench("taupunkt_fast", lambda i: dewpoint.taupunkt_fast(-40 + (i % 1200) * 0.1, 1 + i % 99),
+              20000 * scale),
+        Bench("display", display, 2000 * scale),
+        Bench("measure", measure, 500 * scale),
+        Bench("control", lambda i: fw.zones[0].control(fw.SENSOR_STALE_MS), 2000 * scale),
+        Bench("logdta", lambda i: fw.logdta(), 500 * scale),
+        Bench("flush_log", flush, 20 * scale, setup=fill_log),
+        Bench("putstr", lambda i: lcd.putstr(text), 2000 * scale, setup=move_home),
+        Bench("clear", lambda i: lcd.clear(), 500 * scale),
+        Bench("custom_char", lambda i: lcd.custom_char(i & 7, charmap), 1000 * scale),
+        Bench("hal_write_command", lambda i: lcd.hal_write_command(0x80), 2000 * scale),
+        Bench("hal_write_data", lambda i: lcd.hal_write_data(0x41), 2000 * scale),
+        Bench("hal_write_run", lambda i: lcd.hal_write_run(0x80, data, 0, 16), 2000 * scale),
+        Bench("hal_backlight", lambda i: lcd.hal_backlight_on() if i & 1 else lcd.hal_backlight_off(),
+              2000 * scale),
+    ]
+
+
+def run(names=None, scale=1, repeat=REPEAT):
+    """Runs all (or the named) benchmarks and returns the result dict."""
+    import tempfile
+    import shutil
+    workdir = tempfile.mkdtemp(prefix="taupunkt_bench_")
+    stdout = sys.stdout
+    try:
+        sim = boot_firmware(workdir)
+        fw = sim.fw
+        results = {}
+        cwd = os.getcwd()
+        os.chdir(workdir)  # Logspeicher im temporären Verzeichnis
+        sys.stdout = replay._Null()  # Ausgaben der Firmware verwerfen
+        try:
+            selected = [b for b in benches(fw, scale) if not names or b.name in names]
+            calib, times, i2c = time_benches(selected, repeat)
+            for b in selected:
+                results[b.name] = run_bench(b, times[b.name], i2c[b.name])
+        finally:
+            sys.stdout = stdout
+            os.chdir(cwd)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "calibration_us": 1e6 * statistics.median(calib),
+        "calibration_noise": spread(calib)[1],
+        "results": results,
+    }
+
+
+def speed_factor(current, baseline):
+    """Factor which converts the current times to the speed of the host
+    of the baseline.
+    """
+    return baseline.get("calibration_us", 1.0) / current.get("calibration_us", 1.0)
+
+
+def tolerance_of(current, baseline):
+    """Allowed slowdown (fraction) from the calibration spread of both runs."""
+    noise = max(current.get("calibration_noise", 0.0), baseline.get("calibration_noise", 0.0))
+    return max(MIN_TOLERANCE, NOISE_FACTOR * noise)
+
+
+def compare(current, baseline, tolerance=None):
+    """Returns a list of (name, metric, baseline, current) regressions.
+    Without tolerance it follows from the calibration, see tolerance_of().
+    """
+    worse = []
+    base = baseline["results"]
+    speed = speed_factor(current, baseline)
+    if tolerance is None:
+        tolerance = tolerance_of(current, baseline)
+    for name, r in current["results"].items():
+        b = base.get(name)
+        if b is None:
+            continue
+        if r["mean_us"] * speed > b["mean_us"] * (1 + tolerance):
+            worse.append((name, "mean_us", b["mean_us"], r["mean_us"] * speed))
+        for metric in ("alloc_peak_bytes", "alloc_net_bytes"):
+            if r[metric] > b[metric] + max(ALLOC_SLACK, 0.1 * b[metric]):
+                worse.append((name, metric, b[metric], r[metric]))
+        for metric in ("i2c_transactions", "i2c_bytes"):
+            if r[metric] > b[metric] + 1e-9:
+                worse.append((name, metric, b[metric], r[metric]))
+    return worse
+
+
+def print_results(current, baseline=None, out=sys.stdout):
+    base = baseline["results"] if baseline else {}
+    speed = speed_factor(current, baseline) if baseline else 1.0
+    out.write(f"{'Pfad':20s} {'us/Aufruf':>11s} {'Basis':>9s} {'Spitze B':>9s} "
+              f"{'bleibt B':>9s} {'I2C Tr.':>8s} {'I2C B':>8s}\n")
+    for name, r in current["results"].items():
+        b = base.get(name)
+        ref = f"{100 * (r['mean_us'] * speed / b['mean_us'] - 1):+8.0f}%" if b and b["mean_us"] else ""
+        out.write(f"{name:20s} {r['mean_us']:11.2f} {ref:>9s} {r['alloc_peak_bytes']:9d} "
+                  f"{r['alloc_net_bytes']:9.1f} {r['i2c_transactions']:8.2f} {r['i2c_bytes']:8.1f}\n")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("names", nargs="*", help="nur diese Pfade messen")
+    p.add_argument("--save", metavar="JSON", help="Ergebnis als JSON speichern")
+    p.add_argument("--baseline", metavar="JSON", help="mit früherem Ergebnis vergleichen")
+    p.add_argument("--tolerance", type=float,
+                   help="erlaubte Zeitabweichung als Anteil (Standard: aus der Streuung "
+                        "der Kalibrierung)")
+    p.add_argument("--scale", type=int, default=1, help="Anzahl Aufrufe vervielfachen")
+    p.add_argument("--repeat", type=int, default=REPEAT,
+                   help="Zeitmessungen je Pfad, der Median zählt (Standard %(default)s)")
+    args = p.parse_args(argv)
+
+    current = run(args.names, args.scale, args.repeat)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(current, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=1)
+    if baseline:
+        tolerance = args.tolerance
+        if tolerance is None:
+            tolerance = tolerance_of(current, baseline)
+        print(f"Toleranz {100 * tolerance:.0f} % (Streuung der Kalibrierung "
+              f"{100 * current['calibration_noise']:.1f} %, Basis "
+              f"{100 * baseline.get('calibration_noise', 0.0):.1f} %)")
+        worse = compare(current, baseline, tolerance)
+        for name, metric, b, r in worse:
+            print(f"Verschlechtert: {name} {metric} {b:.2f} -> {r:.2f}")
+        if worse:
+            return 1
+        print("Keine Verschlechterung gegenüber", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Benchmark für tools/loganalyse.py mit synthetischen Logdateien.
+
+Erzeugt --rows Zeilen (Standard 10 Millionen, ca. 650 MB) im Format von
+taupunkt.csv, verteilt auf --units Dateien mit 10 min Abstand, und misst
+Laufzeit, Zeilen pro Sekunde und maximalen Speicherbedarf der Auswertung
+mit einem und mit --jobs Prozessen.
+
+    python3 bench/bench_loganalyse.py --rows 10000000 --units 8 --jobs 4
+"""
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tools"))
+import loganalyse  # noqa: E402
+
+START = 1661217168  # 23.08.2022 01:12:48
+
+
+def _fmt_times(ts):
+    """Formats epoch seconds as DD.MM.YYYY HH:MM:SS (vectorized per day)."""
+    days = ts // 86400
+    out = []
+    cache = {}
+    for day, t in zip(days.tolist(), ts.tolist()):
+        date = cache.get(day)
+        if date is None:
+            date = cache[day] = time.strftime("%d.%m.%Y", time.gmtime(day * 86400))
+        s = t % 86400
+        out.append(f"{date} {s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}")
+    return out
+
+
+def write_synthetic(name, rows, seed, block=200000):
+    """Writes a plausible logfile: daily temperature cycle plus noise."""
+    rng = np.random.default_rng(seed)
+    fan = True
+    with open(name, "w") as f:
+        f.write("Date,t1,h1,tp1,t2,h2,tp2,fan\n")
+        for first in range(0, rows, block):
+            n = min(block, rows - first)
+            ts = START + (first + np.arange(n, dtype=np.int64)) * 600
+            phase = np.sin(ts % 86400 / 86400 * 2 * np.pi)
+            t1 = 15 + 2 * phase + rng.normal(0, 0.3, n)
+            h1 = np.clip(65 + rng.normal(0, 3, n), 1, 100)
+            t2 = 8 + 8 * phase + rng.normal(0, 0.5, n)
+            h2 = np.clip(75 - 15 * phase + rng.normal(0, 3, n), 1, 100)
+            tp1 = loganalyse.taupunkt_batch(t1, h1)
+            tp2 = loganalyse.taupunkt_batch(t2, h2)
+            delta = tp1 - tp2
+            lines = []
+            for i, date in enumerate(_fmt_times(ts)):
+                if delta[i] > 3.2:
+                    fan = True
+                elif delta[i] < 0.2:
+                    fan = False
+                lines.append(f"{date},{t1[i]:.2f},{h1[i]:.2f},{tp1[i]:.2f},"
+                             f"{t2[i]:.2f},{h2[i]:.2f},{tp2[i]:.2f},{fan}\n")
+            f.writelines(lines)
+
+
+def run(names, jobs):
+    start = time.perf_counter()
+    results = loganalyse.analyse(names, jobs)
+    elapsed = time.perf_counter() - start
+    hours = sum(len(r[0].keys) for r in results.values())
+    return elapsed, hours
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument("--units", type=int, default=8)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--dir", help="Verzeichnis für die Testdaten (Standard: temporär)")
+    parser.add_argument("--keep", action="store_true", help="Testdaten nicht löschen")
+    args = parser.parse_args()
+    workdir = args.dir or tempfile.mkdtemp(prefix="taupunkt_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    names = []
+    try:
+        start = time.perf_counter()
+        per_unit = args.rows // args.units
+        for u in range(args.units):
+            name = os.path.join(workdir, f"einheit{u}.csv")
+            if not os.path.exists(name):
+                write_synthetic(name, per_unit, u)
+            names.append(name)
+        size = sum(os.path.getsize(n) for n in names)
+        rows = per_unit * args.units
+        print(f"{rows} Zeilen, {size / 1e6:.0f} MB in {args.units} Dateien "
+              f"(erzeugt in {time.perf_counter() - start:.1f} s)")
+        for jobs in sorted({1, args.jobs}):
+            elapsed, hours = run(names, jobs)
+            print(f"jobs={jobs}: {elapsed:.2f} s, {rows / elapsed / 1e6:.2f} Mio. Zeilen/s, "
+                  f"{hours} Stundenwerte")
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss_children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        print(f"max. RSS: {rss / 1024:.0f} MB (Hauptprozess), {rss_children / 1024:.0f} MB (Worker)")
+    finally:
+        if not args.keep and not args.dir:
+            shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
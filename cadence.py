@@ -0,0 +1,22 @@
+"""Takt der periodischen Aufgaben von aiotasks.periodic() und power.Tickless.
+
+Der nächste Termin folgt period_ms nach dem vorigen, nicht nach dem Ende
+des Laufs, so summieren sich Verzögerungen nicht auf. Sind beim Ende eines
+Laufs schon ganze Perioden verstrichen, werden sie nicht nachgeholt.
+"""
+from time import ticks_diff, ticks_add
+
+
+def next_due(stats, due, now):
+    """Returns the due time following due for a run that ended at now.
+    Whole periods missed are skipped and counted in stats.skipped (stats
+    needs period_ms and skipped, like TaskStats and Job).
+    """
+    period = stats.period_ms
+    due = ticks_add(due, period)
+    late = ticks_diff(now, due)
+    if late >= period:
+        # Verpasste Perioden nicht nachholen, sondern neu aufsetzen
+        stats.skipped += late // period
+        due = ticks_add(due, (late // period) * period)
+    return due
@@ -0,0 +1,160 @@
+"""Stromausfallsichere Sicherung des Logpuffers im Flash.
+
+Die Einträge im RAM (logring) gehen nur ganzsegmentweise in den
+Logspeicher, das sind gut 2 Tage. Damit ein Stromausfall nicht so viel
+kostet, wird jeder neue Eintrag zusätzlich in eine Sicherungsdatei
+geschrieben. Die Datei wird einmal in fester Größe angelegt und als Ring
+von Slots beschrieben:
+
+    Folgenummer (4 Bytes), Zone (1), Eintrag (RECSIZE), CRC32 (4)
+
+Ein Schreibvorgang betrifft nur die neuen Slots, meist also einen
+Flashblock. Beim Start liefert recover() die gültigen Slots (CRC stimmt)
+jeder Zone mit einer höheren Folgenummer als der des letzten Eintrags, der
+im Logspeicher steht (LogStore.slot); ein beim Stromausfall halb
+geschriebener Slot fällt durch die CRC-Prüfung. Die Zeit der Einträge
+zählt dabei nicht, die Uhr kann nach dem Start wieder bei 2021 beginnen.
+
+WriteBudget begrenzt die Zahl der Blockschreibvorgänge pro Tag
+(Token-Bucket), damit der Flash nicht schneller verschleißt als geplant.
+"""
+import os
+import struct
+from time import ticks_ms, ticks_diff
+from logring import RECSIZE, unpack_from
+
+try:
+    from binascii import crc32
+except ImportError:
+    def crc32(data, crc=0):
+        crc ^= 0xFFFFFFFF
+        for b in data:
+            crc ^= b
+            for _ in range(8):
+                crc = (crc >> 1) ^ (0xEDB88320 & -(crc & 1))
+        return crc ^ 0xFFFFFFFF
+
+BLOCK = 4096            # Löschblock des Flash (und Blockgröße von littlefs)
+SLOTHEAD = "<IB"        # Folgenummer, Zone
+SLOTDATA = struct.calcsize(SLOTHEAD) + RECSIZE
+SLOTSIZE = SLOTDATA + 4
+
+
+class Checkpoint:
+    def __init__(self, path, nslots):
+        self.path = path
+        self.nslots = nslots
+        self.seq = 0            # Folgenummer des nächsten Slots
+        self.writes = 0
+        self.bytes_written = 0
+        self.slot = bytearray(SLOTSIZE)
+        try:
+            size = os.stat(path)[6]
+        except OSError:
+            size = -1
+        if size != nslots * SLOTSIZE:
+            self._create()
+
+    def _create(self):
+        """Preallocates the file, all slots invalid."""
+        zero = bytes(512)
+        size = self.nslots * SLOTSIZE
+        with open(self.path, "wb") as f:
+            while size > 0:
+                f.write(zero[:min(size, 512)])
+                size -= 512
+        self.bytes_written += self.nslots * SLOTSIZE
+
+    def recover(self, slots, last_ts):
+        """Returns for every zone a list of (seq, record) with the records
+        (ts, t1, h1, t2, h2, fan) of the slots with seq > slots[zone],
+        oldest first. If slots[zone] is None (log store of an older
+        version), the records with ts > last_ts[zone] (None: all) instead.
+        """
+        found = [[] for _ in slots]
+        top = max([-1] + [slot for slot in slots if slot is not None])
+        buf = bytearray(SLOTSIZE * 32)
+        mv = memoryview(buf)
+        with open(self.path, "rb") as f:
+            while True:
+                n = f.readinto(buf) // SLOTSIZE
+                if n == 0:
+                    break
+                for i in range(n):
+                    pos = i * SLOTSIZE
+                    crc = struct.unpack_from("<I", buf, pos + SLOTDATA)[0]
+                    if crc32(mv[pos:pos + SLOTDATA]) != crc:
+                        continue
+                    seq, zone = struct.unpack_from(SLOTHEAD, buf, pos)
+                    if seq > top:
+                        top = seq
+                    if zone >= len(found):
+                        continue
+                    rec = unpack_from(buf, pos + SLOTDATA - RECSIZE)
+                    if slots[zone] is not None:
+                        if seq <= slots[zone]:
+                            continue
+                    elif last_ts[zone] is not None and rec[0] <= last_ts[zone]:
+                        continue
+                    found[zone].append((seq, rec))
+        self.seq = top + 1  # Auch nach neu angelegter Datei hinter slots
+        for recs in found:
+            recs.sort()
+        return found
+
+    def blocks(self, n):
+        """Number of flash blocks touched by writing n slots."""
+        start = (self.seq % self.nslots) * SLOTSIZE
+        end = start + n * SLOTSIZE
+        size = self.nslots * SLOTSIZE
+        if end <= size:
+            return (end - 1) // BLOCK - start // BLOCK + 1
+        return (size - 1) // BLOCK - start // BLOCK + 1 + (end - size - 1) // BLOCK + 1
+
+    def save(self, items):
+        """Writes (zone, packed record) items into the next slots."""
+        slot = self.slot
+        with open(self.path, "r+b") as f:
+            pos = self.seq % self.nslots
+            f.seek(pos * SLOTSIZE)
+            for zone, raw in items:
+                struct.pack_into(SLOTHEAD, slot, 0, self.seq, zone)
+                slot[SLOTDATA - RECSIZE:SLOTDATA] = raw
+                struct.pack_into("<I", slot, SLOTDATA, crc32(memoryview(slot)[:SLOTDATA]))
+                f.write(slot)
+                self.bytes_written += SLOTSIZE
+                self.seq += 1
+                pos += 1
+                if pos == self.nslots:
+                    pos = 0
+                    f.seek(0)
+        self.writes += 1
+
+
+class WriteBudget:
+    """Allows per_day block writes per day, at most burst at once."""
+
+    def __init__(self, per_day, burst=None):
+        self.rate = per_day / 86400000  # Blöcke pro ms
+        self.burst = burst or max(4, per_day // 24)
+        self.tokens = self.burst
+        self.last = ticks_ms()
+        self.used = 0
+        self.denied = 0
+
+    def take(self, blocks=1, force=False):
+        """Takes blocks from the budget. Returns False (and takes nothing)
+        if there are not enough, unless force is True.
+        """
+        now = ticks_ms()
+        self.tokens = min(self.burst, self.tokens + ticks_diff(now, self.last) * self.rate)
+        self.last = now
+        if self.tokens >= blocks or force:
+            self.tokens -= blocks
+            self.used += blocks
+            return True
+        self.denied += 1
+        return False
+
+    def __repr__(self):
+        return f"Flashbudget: {self.used} Blöcke geschrieben, {self.denied}x verschoben"
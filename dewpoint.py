@@ -0,0 +1,122 @@
+"""Taupunktberechnung (Magnus-Formel) mit Tabellen und Batch-Variante.
+
+taupunkt() rechnet exakt mit der Magnus-Formel. taupunkt_fast() ersetzt
+10** und log10 durch zwei vorberechnete Tabellen mit linearer Interpolation:
+
+    v  = a*t/(b+t) + log10(r/100)
+    tt = b*v / (a-v)
+
+Die Temperaturtabelle deckt -40..80 °C in 0,5 K Schritten ab, die
+Feuchtetabelle 0..100 % in 0,1 % Schritten (Auflösung des DHT22), zusammen
+etwa 5 kB. Im Bereich -40 <= t <= 80 °C, 1 <= r <= 100 % weicht
+taupunkt_fast() um höchstens 0,02 K von taupunkt() ab (siehe
+bench/bench_dewpoint.py). Werte außerhalb der Tabellen werden auf den
+Tabellenrand begrenzt.
+"""
+import math
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+T_MIN = -40.0
+T_MAX = 80.0
+T_STEP = 0.5
+R_STEP = 0.1
+
+
+def _magnus(t):
+    """Returns the Magnus coefficients a, b valid for temperature t."""
+    if t >= 0:
+        return 7.5, 237.3
+    return 7.6, 240.7
+
+
+def taupunkt(t, r):
+    """Exact dew point in °C for temperature t (°C) and rel. humidity r (%)."""
+    a, b = _magnus(t)
+
+    # Sättigungsdampfdruck in hPa
+    sdd = 6.1078 * 10**((a*t)/(b+t))
+
+    # Dampfdruck in hPa
+    dd = sdd * (r/100)
+
+    # v-Parameter
+    v = math.log10(dd/6.1078)
+
+    # Taupunkttemperatur (°C)
+    tt = (b*v) / (a-v)
+    return tt
+
+
+def _build_tables():
+    n = int((T_MAX - T_MIN) / T_STEP) + 1
+    alpha = array('f', [0.0] * n)
+    for i in range(n):
+        t = T_MIN + i * T_STEP
+        a, b = _magnus(t)
+        alpha[i] = (a*t)/(b+t)
+    n = int(100 / R_STEP) + 1
+    lg = array('f', [0.0] * n)
+    lg[0] = math.log10(R_STEP / 200) # r = 0 wird wie r = 0.05 % behandelt
+    for i in range(1, n):
+        lg[i] = math.log10(i * R_STEP / 100)
+    return alpha, lg
+
+_alpha, _log = _build_tables()
+_NA = len(_alpha) - 2
+_NL = len(_log) - 2
+
+
+def taupunkt_fast(t, r):
+    """Dew point like taupunkt(), but from the lookup tables."""
+    x = (t - T_MIN) * (1 / T_STEP)
+    i = int(x)
+    if x < 0:
+        i = x = 0
+    elif i > _NA:
+        i = _NA
+        x = i + 1
+    v = _alpha[i] + (x - i) * (_alpha[i+1] - _alpha[i])
+    x = r * (1 / R_STEP)
+    i = int(x)
+    if x < 0:
+        i = x = 0
+    elif i > _NL:
+        i = _NL
+        x = i + 1
+    v += _log[i] + (x - i) * (_log[i+1] - _log[i])
+    if t >= 0:
+        return (237.3*v) / (7.5-v)
+    return (240.7*v) / (7.6-v)
+
+
+def taupunkt_batch(t, r, out=None):
+    """Dew points for sequences of temperatures t and humidities r.
+
+    NumPy arrays are computed vectorized with the exact formula and a NumPy
+    array is returned. Any other sequences (e.g. array('f') on the device)
+    go through taupunkt_fast() and the result is written to out, which is
+    allocated as array('f') if not given.
+    """
+    if np is not None and isinstance(t, np.ndarray):
+        t = np.asarray(t, dtype=np.float64)
+        r = np.asarray(r, dtype=np.float64)
+        neg = t < 0
+        a = np.where(neg, 7.6, 7.5)
+        b = np.where(neg, 240.7, 237.3)
+        v = (a*t)/(b+t) + np.log10(r/100)
+        tt = (b*v) / (a-v)
+        if out is not None:
+            out[:] = tt
+            return out
+        return tt
+    n = len(t)
+    if out is None:
+        out = array('f', [0.0] * n)
+    for i in range(n):
+        out[i] = taupunkt_fast(t[i], r[i])
+    return out
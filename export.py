@@ -0,0 +1,101 @@
+"""Export des Logs über die serielle Konsole (REPL) in Blöcken mit CRC.
+
+send() schreibt einen Bytestrom (z. B. das Log als CSV) in Blöcken fester
+Größe auf die Konsole. Jeder Block ist eine Textzeile mit Folgenummer,
+Position im Strom und CRC32 der Daten, die Daten selbst stehen base64
+kodiert darin, so übersteht die Zeile die Umwandlung von \\n in \\r\\n und
+das Echo des REPL. Mit compress=True wird jeder Block für sich mit zlib
+komprimiert (braucht das Modul deflate, ab MicroPython 1.21), so bleibt
+jeder Block einzeln prüfbar und der Export kann an jeder Blockgrenze
+fortgesetzt werden:
+
+    #TPX B <Version> <Modus r|z> <Blockgröße> <Start>
+    #TPX K <Position>
+    #TPX D <Folgenummer> <Position> <CRC32 hex> <Daten base64>
+    #TPX E <Folgenummer> <Länge des ganzen Stroms>
+
+Position und CRC beziehen sich auf die unkomprimierten Daten. offset
+überspringt den Anfang des Stroms, mit dem Empfänger tools/logrecv.py
+lässt sich so ein abgebrochener Export fortsetzen. Der Anfang muss dafür
+trotzdem erzeugt werden; damit der Empfänger nicht zu lange auf den ersten
+Block wartet, kommt dabei alle KEEPALIVE Bytes eine K-Zeile.
+"""
+import sys
+from binascii import b2a_base64
+from checkpoint import crc32
+
+VERSION = 1
+PREFIX = "#TPX"
+CHUNK = 2048        # Bytes unkomprimierter Daten je Block
+KEEPALIVE = 64*1024 # Übersprungene Bytes je K-Zeile
+
+try:
+    import deflate
+except ImportError:
+    deflate = None
+    try:
+        import zlib     # CPython, z. B. in sim/fakerepl.py
+    except ImportError:
+        zlib = None
+
+
+def _compress(data):
+    if deflate:
+        import io
+        buf = io.BytesIO()
+        with deflate.DeflateIO(buf, deflate.ZLIB) as d:
+            d.write(data)
+        return buf.getvalue()
+    return zlib.compress(data)
+
+
+def send(pieces, offset=0, chunk=CHUNK, compress=False, write=None):
+    """Writes the stream given as iterable of str or bytes pieces in
+    blocks of chunk bytes, starting at byte offset. Returns the length of
+    the whole stream.
+    """
+    if compress and not (deflate or zlib):
+        raise ValueError("Komprimierung braucht das Modul deflate")
+    write = write or sys.stdout.write
+    write(f"{PREFIX} B {VERSION} {'z' if compress else 'r'} {chunk} {offset}\n")
+    buf = bytearray(chunk)
+    n = 0       # Bytes in buf
+    pos = 0     # Position des Stroms am Ende von buf
+    seq = 0
+    alive = KEEPALIVE
+    for piece in pieces:
+        if isinstance(piece, str):
+            piece = piece.encode()
+        k = 0
+        if pos + len(piece) <= offset:
+            pos += len(piece)
+            if pos >= alive:
+                write(f"{PREFIX} K {pos}\n")
+                alive = pos + KEEPALIVE
+            continue
+        if pos < offset:
+            k = offset - pos
+            pos = offset
+        while k < len(piece):
+            m = min(chunk - n, len(piece) - k)
+            buf[n:n + m] = piece[k:k + m]
+            n += m
+            k += m
+            pos += m
+            if n == chunk:
+                _block(write, seq, pos - n, buf, compress)
+                seq += 1
+                n = 0
+    if n:
+        _block(write, seq, pos - n, memoryview(buf)[:n], compress)
+        seq += 1
+    write(f"{PREFIX} E {seq} {pos}\n")
+    return pos
+
+
+def _block(write, seq, pos, data, compress):
+    crc = crc32(data)
+    payload = _compress(bytes(data)) if compress else data
+    # In einem Aufruf: Ausgaben der Timer-Callbacks (print) kommen so
+    # höchstens zwischen zwei Zeilen, der Empfänger überliest sie
+    write(f"{PREFIX} D {seq} {pos} {crc:08x} " + b2a_base64(payload).decode()) # Endet mit \n
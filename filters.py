@@ -0,0 +1,129 @@
+"""Glättung der Messwerte vor der Schaltentscheidung.
+
+Alle Filter haben update(x), das den neuen Rohwert aufnimmt und den
+gefilterten Wert zurückgibt. Die Puffer werden beim Anlegen reserviert,
+update() alloziert nichts.
+
+    Passthrough     keine Filterung
+    EMA(alpha)      exponentiell gleitender Mittelwert, O(1)
+    Median(n)       gleitender Median über n Werte; Suche der Position im
+                    sortierten Fenster O(log n), Verschieben O(n) bei
+                    kleinem n (typisch 5)
+    Outlier(n, d)   verwirft Werte, die mehr als d vom Median der letzten n
+                    Werte abweichen, sonst Durchreichen
+"""
+from array import array
+
+
+class Passthrough:
+    def __init__(self):
+        self.value = None
+
+    def update(self, x):
+        self.value = x
+        return x
+
+    def reset(self):
+        self.value = None
+
+
+class EMA:
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.value = None
+
+    def update(self, x):
+        if self.value is None:
+            self.value = x
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+    def reset(self):
+        self.value = None
+
+
+class Median:
+    def __init__(self, n=5):
+        self.n = n
+        self.ring = array('f', [0.0] * n)   # Werte in Ankunftsreihenfolge
+        self.sorted = array('f', [0.0] * n) # dieselben Werte sortiert
+        self.reset()
+
+    def reset(self):
+        self.pos = 0
+        self.count = 0
+        self.value = None
+
+    def _find(self, x, count):
+        """Binary search: index of the first element >= x in sorted."""
+        s = self.sorted
+        lo = 0
+        hi = count
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if s[mid] < x:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def update(self, x):
+        s = self.sorted
+        count = self.count
+        if count == self.n:
+            # Ältesten Wert aus dem sortierten Fenster entfernen
+            i = self._find(self.ring[self.pos], count)
+            while i < count - 1:
+                s[i] = s[i + 1]
+                i += 1
+            count -= 1
+        self.ring[self.pos] = x
+        x = self.ring[self.pos] # mit der Genauigkeit des Puffers vergleichen
+        self.pos = (self.pos + 1) % self.n
+        i = self._find(x, count)
+        j = count
+        while j > i:
+            s[j] = s[j - 1]
+            j -= 1
+        s[i] = x
+        count += 1
+        self.count = count
+        if count & 1:
+            self.value = s[count >> 1]
+        else:
+            self.value = (s[(count >> 1) - 1] + s[count >> 1]) / 2
+        return self.value
+
+
+class Outlier:
+    def __init__(self, n=5, max_dev=2.0):
+        self.median = Median(n)
+        self.max_dev = max_dev
+        self.rejected = 0
+        self.value = None
+
+    def update(self, x):
+        m = self.median.update(x)
+        if self.value is not None and self.median.count >= 3 and abs(x - m) > self.max_dev:
+            self.rejected += 1
+            return self.value
+        self.value = x
+        return x
+
+    def reset(self):
+        self.median.reset()
+        self.value = None
+
+
+def make_filter(kind, n=5, alpha=0.3, max_dev=2.0):
+    """Returns a filter by name: "none", "ema", "median" or "outlier"."""
+    if kind == "median":
+        return Median(n)
+    if kind == "ema":
+        return EMA(alpha)
+    if kind == "outlier":
+        return Outlier(n, max_dev)
+    if kind == "none":
+        return Passthrough()
+    raise ValueError("unknown filter " + kind)
@@ -0,0 +1,187 @@
+"""Rollende Statistik der Messwerte, z. B. über 24 Stunden und 7 Tage.
+
+Rolling teilt die Zeit in nbuckets Abschnitte von bucket_s Sekunden und
+hält je Abschnitt für jeden Kanal Minimum, Maximum und den zeitgewichteten
+Mittelwert von Temperatur und Feuchte, für jede Zone die Laufzeit des
+Lüfters und die Zahl der Schaltvorgänge. Alles liegt in Arrays fester
+Größe. Ein Messwert ändert nur den aktuellen Abschnitt (O(1)); beginnt ein
+neuer Abschnitt, wird der älteste Platz im Ring überschrieben. summary()
+und fan_summary() fassen die noch gültigen Abschnitte zusammen, das ist das
+rollende Fenster (24 Stunden-Abschnitte: die letzten 23 bis 24 Stunden).
+
+save() schreibt alle Arrays mit CRC32 in eine Datei (erst in eine
+temporäre, dann umbenannt), load() liest sie beim Start wieder ein. Passt
+die Datei nicht (andere Zahl von Kanälen, CRC falsch), beginnt die
+Statistik leer.
+"""
+import os
+import struct
+from array import array
+from checkpoint import crc32
+
+MAGIC = b"TPH1"
+HEAD = "<4sHHHI"    # Kennung, Kanäle, Zonen, Abschnitte, Abschnittslänge in s
+MAX_DT = 600        # Längste Zeit in s, für die ein Messwert im Mittel zählt
+
+
+class Rolling:
+    def __init__(self, nchannels, nzones, bucket_s, nbuckets):
+        self.nch = nchannels
+        self.nz = nzones
+        self.bucket_s = bucket_s
+        self.nb = nbuckets
+        n = nbuckets * nchannels
+        self.t_min = array("f", [0.0] * n)
+        self.t_max = array("f", [0.0] * n)
+        self.t_sum = array("f", [0.0] * n)
+        self.h_min = array("f", [0.0] * n)
+        self.h_max = array("f", [0.0] * n)
+        self.h_sum = array("f", [0.0] * n)
+        self.weight = array("f", [0.0] * n)     # Summe der Gewichte in s, 0: leer
+        self.fan_s = array("L", [0] * (nbuckets * nzones))
+        self.switches = array("H", [0] * (nbuckets * nzones))
+        self.epoch = array("l", [-1] * nbuckets) # Nummer des Abschnitts je Platz
+        self.last = array("l", [0] * nchannels)  # Zeit des letzten Messwerts
+        self.fan_on = array("b", [0] * nzones)
+        self.fan_since = array("l", [0] * nzones)
+        self.arrays = (self.t_min, self.t_max, self.t_sum, self.h_min, self.h_max,
+                       self.h_sum, self.weight, self.fan_s, self.switches, self.epoch)
+
+    def _slot(self, now):
+        """Returns the slot of the bucket for time now, clearing it first
+        if it still holds an older bucket.
+        """
+        e = now // self.bucket_s
+        s = e % self.nb
+        if self.epoch[s] != e:
+            for k in range(s * self.nch, (s + 1) * self.nch):
+                self.weight[k] = 0.0
+                self.t_sum[k] = 0.0
+                self.h_sum[k] = 0.0
+            for k in range(s * self.nz, (s + 1) * self.nz):
+                self.fan_s[k] = 0
+                self.switches[k] = 0
+            self.epoch[s] = e
+        return s
+
+    def sample(self, i, t, h, now):
+        """Adds a measurement of channel i taken at now (seconds)."""
+        k = self._slot(now) * self.nch + i
+        dt = now - self.last[i] if self.last[i] else 1
+        if dt < 1:
+            dt = 1
+        elif dt > MAX_DT:
+            dt = MAX_DT
+        self.last[i] = now
+        if self.weight[k] == 0.0:
+            self.t_min[k] = self.t_max[k] = t
+            self.h_min[k] = self.h_max[k] = h
+        else:
+            if t < self.t_min[k]:
+                self.t_min[k] = t
+            elif t > self.t_max[k]:
+                self.t_max[k] = t
+            if h < self.h_min[k]:
+                self.h_min[k] = h
+            elif h > self.h_max[k]:
+                self.h_max[k] = h
+        self.t_sum[k] += t * dt
+        self.h_sum[k] += h * dt
+        self.weight[k] += dt
+
+    def fan(self, z, on, now):
+        """Records the fan state of zone z at now; the time it was on since
+        the last call is added to the current bucket.
+        """
+        k = self._slot(now) * self.nz + z
+        if self.fan_on[z] and self.fan_since[z]:
+            dt = now - self.fan_since[z]
+            if dt > 0:
+                self.fan_s[k] += dt
+        self.fan_on[z] = 1 if on else 0
+        self.fan_since[z] = now
+
+    def switch(self, z, on, now):
+        """Records a switching of zone z."""
+        self.fan(z, not on, now)
+        self.switches[self._slot(now) * self.nz + z] += 1
+        self.fan_on[z] = 1 if on else 0
+
+    def _valid(self, s, now):
+        return self.epoch[s] > now // self.bucket_s - self.nb
+
+    def summary(self, i, now):
+        """(t_min, t_mean, t_max, h_min, h_mean, h_max) of channel i over
+        the window, None without data.
+        """
+        w = 0.0
+        ts = hs = 0.0
+        out = None
+        for s in range(self.nb):
+            k = s * self.nch + i
+            if not self._valid(s, now) or self.weight[k] == 0.0:
+                continue
+            if out is None:
+                out = [self.t_min[k], 0.0, self.t_max[k], self.h_min[k], 0.0, self.h_max[k]]
+            else:
+                out[0] = min(out[0], self.t_min[k])
+                out[2] = max(out[2], self.t_max[k])
+                out[3] = min(out[3], self.h_min[k])
+                out[5] = max(out[5], self.h_max[k])
+            w += self.weight[k]
+            ts += self.t_sum[k]
+            hs += self.h_sum[k]
+        if out is None:
+            return None
+        out[1] = ts / w
+        out[4] = hs / w
+        return out
+
+    def fan_summary(self, z, now):
+        """(seconds the fan of zone z ran, switchings) over the window."""
+        on = n = 0
+        for s in range(self.nb):
+            if self._valid(s, now):
+                on += self.fan_s[s * self.nz + z]
+                n += self.switches[s * self.nz + z]
+        return on, n
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        head = struct.pack(HEAD, MAGIC, self.nch, self.nz, self.nb, self.bucket_s)
+        crc = crc32(head)
+        with open(tmp, "wb") as f:
+            f.write(head)
+            for a in self.arrays:
+                f.write(a)
+                crc = crc32(bytes(a), crc)
+            f.write(struct.pack("<I", crc))
+        os.rename(tmp, path)
+
+    def load(self, path):
+        """Reads the data saved by save(). Returns False (and stays empty)
+        if there is none or it does not fit.
+        """
+        head = struct.pack(HEAD, MAGIC, self.nch, self.nz, self.nb, self.bucket_s)
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(head)) != head:
+                    return False
+                crc = crc32(head)
+                for a in self.arrays:
+                    if f.readinto(a) != len(a) * a.itemsize:
+                        return self._reset()
+                    crc = crc32(bytes(a), crc)
+                if f.read(4) != struct.pack("<I", crc):
+                    return self._reset()
+        except OSError:
+            return False
+        return True
+
+    def _reset(self):
+        for a in self.arrays:
+            for k in range(len(a)):
+                a[k] = 0
+        for k in range(self.nb):
+            self.epoch[k] = -1
+        return False
@@ -0,0 +1,100 @@
+"""Laufzeit- und Speichermessung der Callbacks.
+
+wrap(name, fn) liefert bei ausgeschalteter Messung (ENABLED = False) die
+Funktion unverändert zurück, dann kostet die Messung nichts. Sonst misst
+der Wrapper bei jedem Aufruf die Laufzeit mit ticks_us (min/max/Mittel
+und Histogramm) und die Änderung von gc.mem_free().
+
+report() gibt alle Messstellen aus, line() liefert eine kompakte Zeile
+für die Statistikdatei.
+"""
+import gc
+from array import array
+from time import ticks_us, ticks_diff
+
+ENABLED = False
+
+# Obergrenzen der Histogrammklassen in us, die letzte Klasse ist offen
+BOUNDS = (100, 300, 1000, 3000, 10000, 30000, 100000, 300000)
+
+probes = {}
+
+
+class Probe:
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total_us = 0
+        self.min_us = 0
+        self.max_us = 0
+        self.hist = array('L', [0] * (len(BOUNDS) + 1))
+        self.alloc_max = 0   # Größter Speicherverbrauch eines Aufrufs (Bytes)
+        self.alloc_total = 0
+        self.gc_runs = 0     # Aufrufe, in denen mem_free gestiegen ist (GC lief)
+
+    def add(self, us, alloc):
+        if self.count == 0 or us < self.min_us:
+            self.min_us = us
+        if us > self.max_us:
+            self.max_us = us
+        self.count += 1
+        self.total_us += us
+        i = 0
+        for b in BOUNDS:
+            if us < b:
+                break
+            i += 1
+        self.hist[i] += 1
+        if alloc < 0:
+            self.gc_runs += 1
+        else:
+            self.alloc_total += alloc
+            if alloc > self.alloc_max:
+                self.alloc_max = alloc
+
+    def __repr__(self):
+        mean = self.total_us // self.count if self.count else 0
+        return (f"{self.name}: {self.count}x {self.min_us}/{mean}/{self.max_us} us "
+                f"(min/Mittel/max), Speicher max {self.alloc_max} B, GC {self.gc_runs}x, "
+                f"Histogramm {list(self.hist)}")
+
+
+def probe(name):
+    p = probes.get(name)
+    if p is None:
+        p = probes[name] = Probe(name)
+    return p
+
+
+def wrap(name, fn):
+    """Returns fn with timing and memory measurement if ENABLED."""
+    if not ENABLED:
+        return fn
+    p = probe(name)
+    def wrapper(*args, **kw):
+        free = gc.mem_free()
+        start = ticks_us()
+        try:
+            return fn(*args, **kw)
+        finally:
+            p.add(ticks_diff(ticks_us(), start), free - gc.mem_free())
+    return wrapper
+
+
+def report():
+    for name in sorted(probes):
+        print(probes[name])
+
+
+def line():
+    """name:count:mean:max per probe, separated by blanks."""
+    out = []
+    for name in sorted(probes):
+        p = probes[name]
+        mean = p.total_us // p.count if p.count else 0
+        out.append(f"{name}:{p.count}:{mean}:{p.max_us}")
+    return " ".join(out)
+
+
+def reset():
+    probes.clear()
@@ -47,6 +47,10 @@ class LcdApi:
     LCD_RW_WRITE = 0
     LCD_RW_READ = 1
 
+    # Unchanged cells between two changed ones which render_frame() rewrites
+    # instead of sending a new DDRAM address.
+    RENDER_GAP = 1
+
     def __init__(self, num_lines, num_columns):
         self.num_lines = num_lines
         if self.num_lines > 4:
@@ -58,6 +62,8 @@ class LcdApi:
         self.cursor_y = 0
         self.implied_newline = False
         self.backlight = True
+        # Abbild des DDRAM (shadow framebuffer), eine Zelle pro Zeichen
+        self.shadow = bytearray(self.num_lines * self.num_columns)
         self.display_off()
         self.backlight_on()
         self.clear()
@@ -73,6 +79,9 @@ class LcdApi:
         self.hal_write_command(self.LCD_HOME)
         self.cursor_x = 0
         self.cursor_y = 0
+        shadow = self.shadow
+        for i in range(len(shadow)):
+            shadow[i] = 0x20
 
     def show_cursor(self):
         """Causes the cursor to be made visible."""
@@ -125,41 +134,146 @@ class LcdApi:
         """
         self.cursor_x = cursor_x
         self.cursor_y = cursor_y
+        self.hal_write_command(self.ddram_cmd(cursor_x, cursor_y))
+
+    def ddram_cmd(self, cursor_x, cursor_y):
+        """Returns the command which sets the DDRAM address to the indicated
+        position, without sending it.
+        """
         addr = cursor_x & 0x3f
         if cursor_y & 1:
             addr += 0x40    # Lines 1 & 3 add 0x40
         if cursor_y & 2:    # Lines 2 & 3 add number of columns
             addr += self.num_columns
-        self.hal_write_command(self.LCD_DDRAM | addr)
+        return self.LCD_DDRAM | addr
 
     def putchar(self, char):
         """Writes the indicated character to the LCD at the current cursor
         position, and advances the cursor by one position.
         """
-        if char == '\n':
-            if self.implied_newline:
-                # self.implied_newline means we advanced due to a wraparound,
-                # so if we get a newline right after that we ignore it.
-                self.implied_newline = False
-            else:
-                self.cursor_x = self.num_columns
-        else:
-            self.hal_write_data(ord(char))
-            self.cursor_x += 1
-        if self.cursor_x >= self.num_columns:
-            self.cursor_x = 0
-            self.cursor_y += 1
-            self.implied_newline = (char != '\n')
-        if self.cursor_y >= self.num_lines:
-            self.cursor_y = 0
-        self.move_to(self.cursor_x, self.cursor_y)
+        self.putstr(char)
 
     def putstr(self, string):
         """Write the indicated string to the LCD at the current cursor
         position and advances the cursor position appropriately.
+
+        The LCD increments its address after each character by itself, so
+        the cursor is tracked here and an address command is only sent when
+        the text wraps to another line. Consecutive characters are handed to
+        the hal layer as one run.
         """
+        cols = self.num_columns
+        lines = self.num_lines
+        shadow = self.shadow
+        cmd = -1        # Ausstehender Adressbefehl
+        start = end = 0 # Ausstehende Zeichen im shadow
+        if self.cursor_x == cols and self.cursor_y < lines:
+            # render_frame() hat in der letzten Spalte aufgehört, die Adresse
+            # des LCD steht hinter der sichtbaren Zeile: wie nach einem Umbruch
+            self.cursor_x = 0
+            self.cursor_y = (self.cursor_y + 1) % lines
+            self.implied_newline = True
+            cmd = self.ddram_cmd(0, self.cursor_y)
         for char in string:
-            self.putchar(char)
+            if char == '\n':
+                if self.implied_newline:
+                    # self.implied_newline means we advanced due to a wraparound,
+                    # so if we get a newline right after that we ignore it.
+                    self.implied_newline = False
+                    continue
+                self.cursor_x = cols
+            elif self.cursor_x < cols and self.cursor_y < lines:
+                pos = self.cursor_y * cols + self.cursor_x
+                if start == end:
+                    start = end = pos
+                shadow[pos] = ord(char)
+                end += 1
+                self.cursor_x += 1
+            else:
+                # Cursor was explicitly moved outside of the display
+                if cmd >= 0 or end > start:
+                    self.hal_write_run(cmd, shadow, start, end)
+                    cmd = -1
+                    start = end = 0
+                self.hal_write_data(ord(char))
+                self.cursor_x += 1
+            moved = False
+            if self.cursor_x >= cols:
+                self.cursor_x = 0
+                self.cursor_y += 1
+                self.implied_newline = (char != '\n')
+                moved = True
+            if self.cursor_y >= lines:
+                self.cursor_y = 0
+                moved = True
+            if moved:
+                if cmd >= 0 or end > start:
+                    self.hal_write_run(cmd, shadow, start, end)
+                    start = end = 0
+                cmd = self.ddram_cmd(self.cursor_x, self.cursor_y)
+        if cmd >= 0 or end > start:
+            self.hal_write_run(cmd, shadow, start, end)
+
+    def render_frame(self, lines):
+        """Brings the LCD to show the given lines (one string per line).
+
+        The new content is compared against the shadow copy of the DDRAM
+        and only the cells which differ are sent, so an unchanged screen
+        costs no bus traffic at all. Lines shorter than the display are
+        padded with blanks, longer lines are truncated. Returns the number
+        of bytes (commands and data) that were sent to the LCD.
+
+        A run ending in the last column leaves cursor_x at num_columns,
+        putstr() takes that as a wrap to the next line.
+        """
+        cols = self.num_columns
+        shadow = self.shadow
+        sent = 0
+        for y in range(min(len(lines), self.num_lines)):
+            line = lines[y]
+            n = len(line)
+            base = y * cols
+            x = 0
+            while x < cols:
+                if shadow[base + x] == self._cell(line, n, x):
+                    x += 1
+                    continue
+                # Anfang eines geänderten Bereichs gefunden, Ende suchen.
+                # Kurze unveränderte Lücken werden mitgeschrieben, weil das
+                # nicht mehr kostet als ein neues Setzen der Adresse.
+                end = x + 1
+                gap = 0
+                i = end
+                while i < cols and gap <= self.RENDER_GAP:
+                    if shadow[base + i] == self._cell(line, n, i):
+                        gap += 1
+                    else:
+                        gap = 0
+                        end = i + 1
+                    i += 1
+                cmd = -1
+                if self.cursor_x != x or self.cursor_y != y:
+                    cmd = self.ddram_cmd(x, y)
+                    self.cursor_y = y
+                    sent += 1
+                for i in range(x, end):
+                    shadow[base + i] = self._cell(line, n, i)
+                # Adresse und Zeichen in einem Rutsch übertragen
+                self.hal_write_run(cmd, shadow, base + x, base + end)
+                sent += end - x
+                x = end
+                self.cursor_x = x
+        self.implied_newline = False
+        return sent
+
+    def _cell(self, line, n, x):
+        """Returns the character code of column x of line (blank padded)."""
+        if x >= n:
+            return 0x20
+        c = line[x]
+        if isinstance(c, int):
+            return c
+        return ord(c)
 
     def custom_char(self, location, charmap):
         """Write a character to one of the 8 CGRAM locations, available
@@ -203,6 +317,18 @@ class LcdApi:
         """
         raise NotImplementedError
 
+    def hal_write_run(self, cmd, data, start, end):
+        """Write an optional command followed by the data bytes
+        data[start:end] to the LCD. A negative cmd means no command.
+
+        This default implementation sends everything byte by byte. A derived
+        HAL class may override it to transfer the whole run at once.
+        """
+        if cmd >= 0:
+            self.hal_write_command(cmd)
+        for i in range(start, end):
+            self.hal_write_data(data[i])
+
     # This is a default implementation of hal_sleep_us which is suitable
     # for most micropython implementations. For platforms which don't
     # support `time.sleep_us()` they should provide their own implementation
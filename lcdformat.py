@@ -0,0 +1,127 @@
+"""Formatierung der Anzeigezeilen ohne Speicheranforderung.
+
+SensorLine hält eine Zeile im Layout
+
+    0123456789ABCDEF
+    xxx°C|xx%|xx.x°C
+
+als vorab angelegtes bytearray. set() schreibt nur die Ziffern mit
+Ganzzahlarithmetik an ihre Stelle, dabei entstehen weder Strings noch
+andere Objekte. Die Zeile kann direkt an LcdApi.render_frame() übergeben
+werden.
+
+lcd_bytes() bringt feste Texte wie Namen von Zonen und Sensoren in den
+Zeichensatz des HD44780.
+"""
+GRAD = 223   # Gradzeichen im Zeichensatz des HD44780
+MINUS = 0x2D
+BLANK = 0x20
+ZERO = 0x30
+# Umlaute und ß stehen im ROM (A00) des HD44780 an anderer Stelle als in
+# latin-1, große Umlaute gibt es nicht
+CHARSET = {"ä": 225, "ö": 239, "ü": 245, "ß": 226, "°": GRAD,
+           "Ä": 225, "Ö": 239, "Ü": 245}
+
+
+def lcd_bytes(s):
+    """Returns the text s as bytes for the LCD. Umlauts, ß and ° get their
+    ROM codes, other characters their latin-1 code, "?" if there is none.
+    """
+    buf = bytearray(len(s))
+    for i, c in enumerate(s):
+        b = CHARSET.get(c)
+        if b is None:
+            b = ord(c)
+            if b > 255:
+                b = 0x3F
+        buf[i] = b
+    return bytes(buf)
+
+
+def put_int(buf, pos, width, v):
+    """Writes the integer v right aligned into buf[pos:pos+width].
+    Values which do not fit are clamped to the largest (smallest) value
+    of the field width.
+    """
+    neg = v < 0
+    if neg:
+        v = -v
+        width1 = width - 1  # eine Stelle für das Vorzeichen
+    else:
+        width1 = width
+    limit = 1
+    for _ in range(width1):
+        limit *= 10
+    if v >= limit:
+        v = limit - 1
+    i = pos + width - 1
+    while True:
+        buf[i] = ZERO + v % 10
+        v //= 10
+        i -= 1
+        if v == 0:
+            break
+    if neg:
+        buf[i] = MINUS
+        i -= 1
+    while i >= pos:
+        buf[i] = BLANK
+        i -= 1
+
+
+def put_fixed1(buf, pos, width, tenths):
+    """Writes tenths/10 with one decimal right aligned into
+    buf[pos:pos+width]. If the value does not fit (e.g. -12.3 in 4 places)
+    it is written rounded to an integer instead.
+    """
+    neg = tenths < 0
+    a = -tenths if neg else tenths
+    digits = 2   # Mindestens "0.0"
+    v = a // 100
+    while v:
+        digits += 1
+        v //= 10
+    if digits + 1 + neg > width:
+        v = (a + 5) // 10
+        put_int(buf, pos, width, -v if neg else v)
+        return
+    i = pos + width - 1
+    buf[i] = ZERO + a % 10
+    buf[i - 1] = 0x2E   # Dezimalpunkt
+    a //= 10
+    i -= 2
+    while True:
+        buf[i] = ZERO + a % 10
+        a //= 10
+        i -= 1
+        if a == 0:
+            break
+    if neg:
+        buf[i] = MINUS
+        i -= 1
+    while i >= pos:
+        buf[i] = BLANK
+        i -= 1
+
+
+class SensorLine:
+    """One display line "xxx°C|xx%|xx.x°C" with in-place digit updates."""
+
+    def __init__(self, cols=16):
+        self.buf = bytearray(cols)
+        for i in range(cols):
+            self.buf[i] = BLANK
+        for i, c in ((3, GRAD), (4, 0x43), (5, 0x7C), (8, 0x25), (9, 0x7C),
+                     (14, GRAD), (15, 0x43)):
+            if i < cols:
+                self.buf[i] = c
+
+    def set(self, t, h, tp_tenths):
+        """Sets temperature and humidity (integers) and the dew point in
+        tenths of a degree.
+        """
+        buf = self.buf
+        put_int(buf, 0, 3, t)
+        put_int(buf, 6, 2, h)   # 100 % wird als 99 % angezeigt
+        put_fixed1(buf, 10, 4, tp_tenths)
+        return buf
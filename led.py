@@ -1,11 +1,19 @@
-from machine import Pin
+from machine import Pin, Timer
 from neopixel import NeoPixel # We have a ws2812rgb LED
-from time import sleep_ms
+from time import ticks_ms, ticks_diff, ticks_add
+import micropython
 # RGB Led
 PIN_NP = 23
 LEDS = 1
 BRIGHTNESS = 10
 
+# Effekte (blink, pulse, sequence) kehren sofort zurück. Sie werden pro LED
+# in eine Warteschlange gestellt und von Effects Schritt für Schritt
+# abgespielt: ein Effekt ist ein Generator, der (Wert, Dauer in ms)
+# liefert. Danach zeigt die LED wieder ihren Zustand (set(), on(), off()).
+# Geschrieben wird nur, wenn sich der angezeigte Wert ändert.
+MAX_EFFECTS = 4 # Weitere Effekte je LED werden verworfen
+
 # We use singletons
 class Singleton(object):
   def __new__(cls):
@@ -13,7 +21,118 @@ class Singleton(object):
       cls.instance = super(Singleton, cls).__new__(cls)
     return cls.instance
 
-class RGB_led(Singleton):
+class Effects:
+    """Advances the effects of all LEDs.
+
+    With use_timer (RUNTIME "timer") a one-shot Timer is armed for the next
+    step and tick() runs via micropython.schedule. Otherwise the runtime
+    calls tick() itself; on_start is called when an effect is queued while
+    nothing is playing, e.g. to wake a task.
+    """
+    def __init__(self):
+        self.leds = []
+        self.use_timer = True
+        self.on_start = None
+        self.running = False
+        self.timer = None
+        self.tick_ref = self.tick # Referenz für schedule(), ohne Allokation in der ISR
+        self.dropped = 0
+
+    def add(self, led):
+        if led not in self.leds:
+            self.leds.append(led)
+
+    def start(self):
+        # Auch wenn schon Effekte laufen: ein neuer soll sofort beginnen
+        self.running = True
+        if self.use_timer:
+            self._arm(0)
+        elif self.on_start:
+            self.on_start()
+
+    def _arm(self, ms):
+        if self.timer is None:
+            self.timer = Timer()
+        self.timer.init(mode=Timer.ONE_SHOT, period=max(1, ms), callback=self._cb)
+
+    def _cb(self, tim):
+        try:
+            micropython.schedule(self.tick_ref, 0)
+        except RuntimeError: # Warteschlange voll, später noch einmal
+            self.timer.init(mode=Timer.ONE_SHOT, period=10, callback=self._cb)
+
+    def tick(self, arg=None):
+        """Plays the due steps. Returns the ms until the next step, None
+        if no effect is left.
+        """
+        now = ticks_ms()
+        wait = None
+        for led in self.leds:
+            w = led.advance(now)
+            if w is not None and (wait is None or w < wait):
+                wait = w
+        self.running = wait is not None
+        if self.running and self.use_timer:
+            self._arm(wait)
+        return wait
+
+
+effects = Effects()
+
+def _blink(value, dark, ms, num):
+    for i in range(num):
+        yield value, ms
+        yield dark, ms
+
+def _sequence(values, ms):
+    for value in values:
+        yield value, ms
+
+def _pulse(color, ms, steps):
+    # Helligkeit in steps Stufen hoch und wieder herunter
+    dt = max(1, ms // (2 * steps))
+    for k in range(1, steps + 1):
+        yield (color[0] * k // steps, color[1] * k // steps, color[2] * k // steps), dt
+    for k in range(steps - 1, -1, -1):
+        yield (color[0] * k // steps, color[1] * k // steps, color[2] * k // steps), dt
+
+class Animated:
+    """Effect queue of one LED, subclasses implement _show()."""
+    def _init_effects(self):
+        self.queue = []
+        self.until = None   # Ende des aktuellen Schritts (ticks_ms)
+        self.shown = None   # Zuletzt geschriebener Wert
+        effects.add(self)
+
+    def play(self, effect):
+        """Queues an effect (generator of (value, ms)), returns at once."""
+        if len(self.queue) >= MAX_EFFECTS:
+            effects.dropped += 1
+            return
+        self.queue.append(effect)
+        effects.start()
+
+    def show(self, value):
+        if value != self.shown:
+            self.shown = value
+            self._show(value)
+
+    def advance(self, now):
+        while self.queue:
+            if self.until is not None and ticks_diff(self.until, now) > 0:
+                return ticks_diff(self.until, now)
+            try:
+                value, ms = next(self.queue[0])
+            except StopIteration:
+                self.queue.pop(0)
+                self.until = None
+                continue
+            self.show(value)
+            self.until = ticks_add(now, ms)
+        self.show(self.status)
+        return None
+
+class RGB_led(Singleton, Animated):
     # GPIO-Pin für WS2812
     pin_np = PIN_NP
     # Anzahl der LEDs
@@ -31,44 +150,47 @@ class RGB_led(Singleton):
     np = NeoPixel(Pin(pin_np, Pin.OUT), leds)
     def __init__(self):
         self.status = RGB_led.off
-        self.np[0] = self.status
-        self.np.write()
-    
-    def set(self,color):
+        self._init_effects()
+        self.show(self.status)
+
+    def _show(self, color):
         self.np[0] = color
         self.np.write()
+
+    def set(self,color):
         self.status = color
-    
+        if not self.queue:
+            self.show(color)
+
     def blink(self, color, ms=50, num=1):
-        for i in range(0,num):
-            self.np[0] = color
-            self.np.write()
-            sleep_ms(ms)
-            self.np[0] = self.off
-            self.np.write()
-            sleep_ms(ms)
-        self.np[0] = self.status
-        self.np.write()
-        
-class Led(Singleton):
+        self.play(_blink(color, RGB_led.off, ms, num))
+
+    def pulse(self, color, ms=1000, steps=8):
+        self.play(_pulse(color, ms, steps))
+
+    def sequence(self, colors, ms=200):
+        self.play(_sequence(colors, ms))
+
+class Led(Singleton, Animated):
     def __init__(self):
         # Initialisierung von GPIO25 als Ausgang
         self.led_onboard = Pin(25, Pin.OUT)
-        self.led_onboard.off()
         self.status = 0
-    
+        self._init_effects()
+        self.show(0)
+
+    def _show(self, v):
+        self.led_onboard.value(v)
+
     def on(self):
-        self.led_onboard.on()
         self.status = 1
-        
+        if not self.queue:
+            self.show(1)
+
     def off(self):
-        self.led_onboard.off()
-        self.status = 0        
-        
+        self.status = 0
+        if not self.queue:
+            self.show(0)
+
     def blink(self, ms=50, num=1):
-        for i in range(0,num):
-            self.led_onboard.on()
-            sleep_ms(ms)
-            self.led_onboard.off()
-            sleep_ms(ms)
-        self.led_onboard.value(self.status)
+        self.play(_blink(1, 0, ms, num))
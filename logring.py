@@ -0,0 +1,83 @@
+"""Ringpuffer fester Größe für Logeinträge im RAM.
+
+Jeder Eintrag ist ein gepackter Datensatz fester Länge (siehe RECORD):
+Zeitstempel in Sekunden, t1, h1, t2, h2 als Hundertstel und der
+Lüfterzustand. Der Puffer wird einmal angelegt und wächst nie, anhängen
+und zählen kosten O(1).
+"""
+import struct
+
+RECORD = "<ihhhhB"  # Zeit, t1, h1, t2, h2 (x100), fan
+RECSIZE = struct.calcsize(RECORD)
+
+
+def pack_into(buf, offset, ts, t1, h1, t2, h2, fan):
+    """Packs one record into buf at offset."""
+    struct.pack_into(RECORD, buf, offset, ts,
+                     int(round(t1 * 100)), int(round(h1 * 100)),
+                     int(round(t2 * 100)), int(round(h2 * 100)),
+                     1 if fan else 0)
+
+
+def unpack_from(buf, offset):
+    """Returns the record at offset as (ts, t1, h1, t2, h2, fan)."""
+    ts, t1, h1, t2, h2, fan = struct.unpack_from(RECORD, buf, offset)
+    return ts, t1 / 100, h1 / 100, t2 / 100, h2 / 100, fan
+
+
+class LogRing:
+    """Ring buffer of packed log records.
+
+    When the buffer is full, append() overwrites the oldest record and
+    counts it in dropped.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buf = bytearray(capacity * RECSIZE)
+        self.head = 0     # Index des ältesten Eintrags
+        self.count = 0
+        self.dropped = 0  # Wegen Überlauf verlorene Einträge
+
+    def __len__(self):
+        return self.count
+
+    def append(self, ts, t1, h1, t2, h2, fan):
+        """Appends a record, overwriting the oldest one if full."""
+        if self.count == self.capacity:
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+            self.dropped += 1
+        i = (self.head + self.count) % self.capacity
+        pack_into(self.buf, i * RECSIZE, ts, t1, h1, t2, h2, fan)
+        self.count += 1
+
+    def get(self, i):
+        """Returns record i, 0 being the oldest and -1 the newest one."""
+        if i < 0:
+            i += self.count
+        if i < 0 or i >= self.count:
+            raise IndexError("LogRing index out of range")
+        return unpack_from(self.buf, ((self.head + i) % self.capacity) * RECSIZE)
+
+    def records(self, n=None, start=0):
+        """Yields n records from record start on (all if n is None)."""
+        if n is None or start + n > self.count:
+            n = self.count - start
+        for i in range(start, start + n):
+            yield self.get(i)
+
+    def raw(self, i):
+        """Returns record i packed, as memoryview into the buffer."""
+        if i < 0:
+            i += self.count
+        if i < 0 or i >= self.count:
+            raise IndexError("LogRing index out of range")
+        pos = ((self.head + i) % self.capacity) * RECSIZE
+        return memoryview(self.buf)[pos:pos + RECSIZE]
+
+    def discard(self, n):
+        """Removes the oldest n records, e.g. after they have been stored."""
+        if n > self.count:
+            n = self.count
+        self.head = (self.head + n) % self.capacity
+        self.count -= n
@@ -0,0 +1,302 @@
+"""Segmentierter Logspeicher im Flash.
+
+Die Einträge werden im Binärformat von logring (RECORD) in Segmentdateien
+fester Größe geschrieben (LOGDIR/00000.bin, 00001.bin, ...). Ist ein
+Segment voll, wird das nächste begonnen; sind mehr als maxsegments
+vorhanden, wird das älteste gelöscht. Eine kleine Indexdatei hält für
+jedes Segment erste und letzte Zeit, so dass query() nur die Segmente liest,
+die das gewünschte Zeitfenster berühren.
+
+Der Index gilt als Abschluss eines Schreibvorgangs: was beim Start hinter
+der im Index vermerkten Anzahl steht (Stromausfall beim Schreiben), wird
+abgeschnitten. Im Kopf des Index steht außerdem slot, die Folgenummer des
+Slots in der Sicherung (checkpoint.py) des neuesten gespeicherten Eintrags.
+Danach richtet sich, was beim Start aus der Sicherung zurückgeholt wird,
+nicht nach der Zeit, die nach einem Stromausfall wieder bei 2021 anfangen
+kann.
+
+csvline() erzeugt aus einem Eintrag die Zeile im bisherigen CSV-Format
+(CSV_HEADER), parseline() liest sie zurück. import_csv() übernimmt so die
+Logdatei älterer Versionen (taupunkt.csv) in den Logspeicher.
+"""
+import os
+import struct
+import time
+from dewpoint import taupunkt
+from logring import RECSIZE, pack_into, unpack_from
+
+LOGDIR = "log"
+SEGRECORDS = 315    # ca. 4 kB pro Segment, gut 2 Tage bei 10 min Takt
+MAXSEGMENTS = 200   # ca. 1 Jahr
+CSV_HEADER = "Date,t1,h1,tp1,t2,h2,tp2,fan\n"
+
+INDEX = "<Iiii"     # Segmentnummer, erste Zeit, letzte Zeit, Anzahl
+INDEXSIZE = struct.calcsize(INDEX)
+INDEXHEAD = "<4si"  # INDEXMAGIC, slot
+INDEXHEADSIZE = struct.calcsize(INDEXHEAD)
+INDEXMAGIC = b"TPX1" # Ältere Versionen schreiben den Index ohne Kopf
+
+
+def now():
+    """
+    Current time as integer
+    """
+    t = time.time()
+    if t > 1913677968 : # Hot fix for emulator
+        t = time.mktime((2022, 8, 23, 1, 12, 48, 0, 0))
+    return t
+
+def pt(t = None):
+    """
+    Format a time integer in human readable form (pt for Pretty format Time)
+    """
+    if t == None:
+        t = now()
+    y, mm, d, h, m, s = time.localtime(t)[0:6]
+    return f"{d:02d}.{mm:02d}.{y} {h:02d}:{m:02d}:{s:02d}"
+
+def parse_time(s):
+    """
+    Time integer of "23.08.2022 01:12:48", the inverse of pt()
+    """
+    d, t = s.strip().split(" ")
+    day, month, year = d.split(".")
+    h, m, sec = t.split(":")
+    return time.mktime((int(year), int(month), int(day), int(h), int(m), int(sec), 0, 0, -1))
+
+def parseline(line):
+    """
+    Log record (ts, t1, h1, t2, h2, fan) of a line of the logfile, with or
+    without the tp columns. None for the header or a damaged line
+    """
+    f = line.strip().split(",")
+    try:
+        if len(f) == 8:
+            return (parse_time(f[0]), float(f[1]), float(f[2]), float(f[4]), float(f[5]),
+                    f[7] == "True")
+        if len(f) == 6:
+            return (parse_time(f[0]), float(f[1]), float(f[2]), float(f[3]), float(f[4]),
+                    f[5] == "True")
+    except ValueError:
+        pass
+    return None
+
+def csvline(rec, tp1=None, tp2=None):
+    """
+    Format a log record (ts, t1, h1, t2, h2, fan) as line of the logfile.
+    Dew points not given are computed from the record
+    """
+    ts, t1, h1, t2, h2, fan = rec
+    if tp1 is None:
+        tp1 = taupunkt(t1, h1)
+    if tp2 is None:
+        tp2 = taupunkt(t2, h2)
+    return f"{pt(ts)},{t1:.2f},{h1:.2f},{tp1:.2f},{t2:.2f},{h2:.2f},{tp2:.2f},{bool(fan)}\n"
+
+
+class LogStore:
+    """Append-only log store made of fixed-size segment files."""
+
+    # Anzahl Einträge, die query() auf einmal aus einem Segment liest
+    CHUNK = 32
+
+    def __init__(self, path=LOGDIR, segrecords=SEGRECORDS, maxsegments=MAXSEGMENTS):
+        self.path = path
+        self.segrecords = segrecords
+        self.maxsegments = maxsegments
+        self._rec = bytearray(RECSIZE)
+        self._f = None          # Offene Segmentdatei zwischen write() und sync()
+        self.bytes_written = 0  # Zähler für die Statistik
+        self.slot = -1          # Folgenummer in der Sicherung, None: unbekannt
+        try:
+            os.mkdir(path)
+        except OSError:
+            pass # existiert schon
+        self.index = self._load_index()
+
+    def _segname(self, seg):
+        return f"{self.path}/{seg:05d}.bin"
+
+    def _load_index(self):
+        """Reads the index file and cuts off what was written after its last
+        save. Rebuilds it from the segments if it is missing or damaged, the
+        slot is unknown then.
+        """
+        index = []
+        try:
+            with open(self.path + "/index.bin", "rb") as f:
+                data = f.read()
+            pos = 0
+            self.slot = None
+            if data[:4] == INDEXMAGIC:
+                self.slot = struct.unpack_from(INDEXHEAD, data)[1]
+                pos = INDEXHEADSIZE
+            if (len(data) - pos) % INDEXSIZE:
+                raise ValueError("index damaged")
+            for pos in range(pos, len(data), INDEXSIZE):
+                index.append(list(struct.unpack_from(INDEX, data, pos)))
+            changed = self._cut(index)
+        except (OSError, ValueError):
+            index = self._rebuild_index()
+            self.slot = None if index else -1
+            changed = True
+        if changed:
+            self.index = index
+            self._save_index()
+        return index
+
+    def _cut(self, index):
+        """Brings the segments back to the state of index: drops the entry
+        of an oldest segment already removed, truncates the segments to
+        their count and removes newer ones. Returns True if index changed.
+        """
+        changed = False
+        if index:
+            try:
+                os.stat(self._segname(index[0][0]))
+            except OSError:
+                index.pop(0) # write() löscht das älteste Segment vor sync()
+                changed = True
+        for seg, first, last, count in index:
+            size = os.stat(self._segname(seg))[6]
+            if size < count * RECSIZE:
+                raise OSError("index out of date")
+            if size > count * RECSIZE:
+                with open(self._segname(seg), "rb") as f:
+                    data = f.read(count * RECSIZE)
+                with open(self._segname(seg), "wb") as f:
+                    f.write(data)
+        top = index[-1][0] if index else -1
+        for name in os.listdir(self.path):
+            if name.endswith(".bin") and name != "index.bin" and int(name[:-4]) > top:
+                os.remove(f"{self.path}/{name}")
+        return changed
+
+    def _rebuild_index(self):
+        index = []
+        names = [n for n in os.listdir(self.path) if n.endswith(".bin") and n != "index.bin"]
+        names.sort()
+        for name in names:
+            seg = int(name[:-4])
+            with open(f"{self.path}/{name}", "rb") as f:
+                data = f.read()
+            count = len(data) // RECSIZE
+            if count == 0:
+                continue
+            if len(data) != count * RECSIZE:
+                # Abgeschnittener Eintrag, z. B. nach Stromausfall
+                with open(f"{self.path}/{name}", "wb") as f:
+                    f.write(data[:count * RECSIZE])
+            first = unpack_from(data, 0)[0]
+            last = unpack_from(data, (count - 1) * RECSIZE)[0]
+            index.append([seg, first, last, count])
+        return index
+
+    def _save_index(self):
+        head = 0 if self.slot is None else INDEXHEADSIZE
+        buf = bytearray(head + INDEXSIZE * len(self.index))
+        if head:
+            struct.pack_into(INDEXHEAD, buf, 0, INDEXMAGIC, self.slot)
+        for i, entry in enumerate(self.index):
+            struct.pack_into(INDEX, buf, head + i * INDEXSIZE, *entry)
+        with open(self.path + "/index.bin", "wb") as f:
+            f.write(buf)
+        self.bytes_written += len(buf)
+
+    def __len__(self):
+        return sum(entry[3] for entry in self.index)
+
+    def last_ts(self):
+        """Time of the newest stored record, None if the store is empty."""
+        return self.index[-1][2] if self.index else None
+
+    def space(self):
+        """Records which still fit into the current segment. Appending
+        exactly this many fills the segment file, so each segment is
+        written in one piece.
+        """
+        if self.index and self.index[-1][3] < self.segrecords:
+            return self.segrecords - self.index[-1][3]
+        return self.segrecords
+
+    def write(self, records):
+        """Appends the records (ts, t1, h1, t2, h2, fan) and returns their
+        count. The segment file stays open and the index unsaved until
+        sync(), so a segment written in several calls still goes to the
+        flash in one piece. Set slot before sync() when the records come
+        from the checkpoint.
+        """
+        n = 0
+        entry = self.index[-1] if self.index else None
+        for rec in records:
+            if entry is None or entry[3] >= self.segrecords:
+                self._close()
+                seg = entry[0] + 1 if entry else 0
+                entry = [seg, rec[0], rec[0], 0]
+                self.index.append(entry)
+                if len(self.index) > self.maxsegments:
+                    old = self.index.pop(0)
+                    os.remove(self._segname(old[0]))
+            if self._f is None:
+                self._f = open(self._segname(entry[0]), "ab")
+            pack_into(self._rec, 0, *rec)
+            self._f.write(self._rec)
+            self.bytes_written += RECSIZE
+            entry[2] = rec[0]
+            entry[3] += 1
+            n += 1
+        return n
+
+    def _close(self):
+        if self._f:
+            self._f.close()
+            self._f = None
+
+    def sync(self):
+        """Closes the segment file and saves the index."""
+        self._close()
+        self._save_index()
+
+    def append(self, records):
+        """Appends the records (ts, t1, h1, t2, h2, fan) and returns their count."""
+        try:
+            return self.write(records)
+        finally:
+            self.sync()
+
+    def query(self, t0=None, t1=None):
+        """Yields the records with t0 <= ts <= t1 (None means open end)."""
+        buf = bytearray(RECSIZE * self.CHUNK)
+        for seg, first, last, count in list(self.index):
+            if (t1 is not None and first > t1) or (t0 is not None and last < t0):
+                continue
+            with open(self._segname(seg), "rb") as f:
+                while True:
+                    n = f.readinto(buf) // RECSIZE
+                    if n == 0:
+                        break
+                    for i in range(n):
+                        rec = unpack_from(buf, i * RECSIZE)
+                        if (t0 is None or rec[0] >= t0) and (t1 is None or rec[0] <= t1):
+                            yield rec
+
+    def import_csv(self, f):
+        """Appends the lines of the open CSV file f (format of the former
+        logfile) which are newer than the stored records, so an interrupted
+        import can simply be repeated. Returns the number of records.
+        """
+        last = self.last_ts()
+        batch = []
+        n = 0
+        for line in f:
+            rec = parseline(line)
+            if rec is None or (last is not None and rec[0] <= last):
+                continue
+            last = rec[0]
+            batch.append(rec)
+            if len(batch) >= self.segrecords:
+                n += self.append(batch)
+                batch = []
+        if batch:
+            n += self.append(batch)
+        return n
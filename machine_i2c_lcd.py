@@ -19,7 +19,17 @@ class I2cLcd(LcdApi):
     def __init__(self, i2c, i2c_addr, num_lines, num_columns):
         self.i2c = i2c
         self.i2c_addr = i2c_addr
-        self.i2c.writeto(self.i2c_addr, bytearray([0]))
+        # Vorbelegter Sendepuffer: 4 Bytes (zwei Nibbles mit E-Puls) pro
+        # LCD-Byte, Platz für eine ganze Zeile plus einen Befehl. Die Views
+        # werden einmal angelegt, damit beim Senden nichts alloziert wird.
+        self.batch_len = min(num_columns, 40) + 1
+        self._buf = bytearray(4 * self.batch_len)
+        mv = memoryview(self._buf)
+        self._views = [mv[0:i] for i in range(4 * self.batch_len + 1)]
+        self.i2c_transfers = 0 # Zähler für die Statistik
+        self.i2c_bytes = 0
+        self._buf[0] = 0
+        self._send(1)
         sleep_ms(20)   # Allow LCD time to powerup
         # Send reset 3 times
         self.hal_write_init_nibble(self.LCD_FUNCTION_RESET)
@@ -42,36 +52,70 @@ class I2cLcd(LcdApi):
         This particular function is only used during initialization.
         """
         byte = ((nibble >> 4) & 0x0f) << SHIFT_DATA
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
+        self._buf[0] = byte | MASK_E
+        self._buf[1] = byte
+        self._send(2)
 
     def hal_backlight_on(self):
         """Allows the hal layer to turn the backlight on."""
-        self.i2c.writeto(self.i2c_addr, bytearray([1 << SHIFT_BACKLIGHT]))
+        self._buf[0] = 1 << SHIFT_BACKLIGHT
+        self._send(1)
 
     def hal_backlight_off(self):
         """Allows the hal layer to turn the backlight off."""
-        self.i2c.writeto(self.i2c_addr, bytearray([0]))
+        self._buf[0] = 0
+        self._send(1)
 
     def hal_write_command(self, cmd):
         """Writes a command to the LCD.
         Data is latched on the falling edge of E.
         """
-        byte = ((self.backlight << SHIFT_BACKLIGHT) | (((cmd >> 4) & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
-        byte = ((self.backlight << SHIFT_BACKLIGHT) | ((cmd & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
+        self._send(self._put(0, cmd, 0))
         if cmd <= 3:
             # The home and clear commands require a worst case delay of 4.1 msec
             sleep_ms(5)
 
     def hal_write_data(self, data):
         """Write data to the LCD."""
-        byte = (MASK_RS | (self.backlight << SHIFT_BACKLIGHT) | (((data >> 4) & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
-        byte = (MASK_RS | (self.backlight << SHIFT_BACKLIGHT) | ((data & 0x0f) << SHIFT_DATA))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
\ No newline at end of file
+        self._send(self._put(0, data, MASK_RS))
+
+    def hal_write_run(self, cmd, data, start, end):
+        """Write an optional command and the data bytes data[start:end] with
+        as few I2C transfers as possible (one per line of the display).
+
+        At 100 kHz a single byte on the bus takes about 90 usec, so the
+        37 usec the LCD needs per command or character are always met.
+        """
+        pos = 0
+        if cmd >= 0:
+            if cmd <= 3:
+                self.hal_write_command(cmd) # Braucht eine Pause danach
+            else:
+                pos = self._put(0, cmd, 0)
+        limit = len(self._buf)
+        for i in range(start, end):
+            if pos == limit:
+                self._send(pos)
+                pos = 0
+            pos = self._put(pos, data[i], MASK_RS)
+        if pos:
+            self._send(pos)
+
+    def _send(self, n):
+        """Sends the first n bytes of the transfer buffer."""
+        self.i2c.writeto(self.i2c_addr, self._views[n])
+        self.i2c_transfers += 1
+        self.i2c_bytes += n
+
+    def _put(self, pos, value, rs):
+        """Stores the two nibbles of value, each strobed with E, at pos in
+        the transfer buffer and returns the position behind them.
+        """
+        buf = self._buf
+        byte = rs | (self.backlight << SHIFT_BACKLIGHT) | (((value >> 4) & 0x0f) << SHIFT_DATA)
+        buf[pos] = byte | MASK_E
+        buf[pos + 1] = byte
+        byte = rs | (self.backlight << SHIFT_BACKLIGHT) | ((value & 0x0f) << SHIFT_DATA)
+        buf[pos + 2] = byte | MASK_E
+        buf[pos + 3] = byte
+        return pos + 4
@@ -0,0 +1,179 @@
+"""Minimaler MQTT 3.1.1 Client (nur Veröffentlichen), der nie auf das Netz wartet.
+
+Läuft unter MicroPython und CPython mit den Modulen socket und select. Der
+Socket ist nicht blockierend: connect() beginnt nur den Verbindungsaufbau,
+poll() führt ihn weiter, sendet den Rest des Sendepuffers und liest, was
+angekommen ist. publish() legt das Paket in den Sendepuffer und gibt die
+Paketnummer zurück, das PUBACK dazu liefert ein späterer poll() in seiner
+Liste. So kann der Aufrufer mehrere Nachrichten unterwegs haben und
+braucht nie zu warten, auch nicht in einem Timer-Callback.
+
+Alle Fehler (Zeitüberschreitung beim Verbindungsaufbau, Verbindungsabbruch,
+abgelehnte Verbindung) werden als OSError gemeldet, danach ist der Client
+getrennt. Der Servername wird nur einmal aufgelöst: mit einer IP-Adresse
+gibt es keine DNS-Anfrage, ein Name blockiert bei der ersten Auflösung.
+"""
+import errno
+import select
+import socket
+import struct
+from time import ticks_ms, ticks_diff
+
+CLOSED = 0
+CONNECTING = 1  # TCP-Verbindung im Aufbau
+CONNACK = 2     # CONNECT gesendet, warten auf CONNACK
+UP = 3
+
+
+class MQTTClient:
+    def __init__(self, client_id, server, port=1883, keepalive=0, timeout=5.0):
+        self.client_id = client_id
+        self.server = server
+        self.port = port
+        self.keepalive = keepalive
+        self.timeout = timeout  # s für den Verbindungsaufbau
+        self.addr = None
+        self.sock = None
+        self.poller = None
+        self.state = CLOSED
+        self.since = 0          # ticks_ms() beim Beginn des Verbindungsaufbaus
+        self.out = b""          # Noch nicht gesendete Bytes
+        self.inbuf = b""        # Empfangene Bytes eines unvollständigen Pakets
+        self.pid = 0
+
+    def isconnected(self):
+        return self.state == UP
+
+    def _header(self, first, length):
+        """Fixed header: packet type and remaining length."""
+        out = bytearray((first,))
+        while True:
+            b = length & 0x7F
+            length >>= 7
+            out.append(b | 0x80 if length else b)
+            if not length:
+                return out
+
+    def _str(self, s):
+        if isinstance(s, str):
+            s = s.encode()
+        return struct.pack("!H", len(s)) + s
+
+    def connect(self):
+        """Starts connecting and returns at once, poll() continues."""
+        self.close()
+        if self.addr is None:
+            self.addr = socket.getaddrinfo(self.server, self.port)[0][-1]
+        self.sock = socket.socket()
+        self.sock.setblocking(False)
+        self.poller = select.poll()
+        self.poller.register(self.sock, select.POLLIN | select.POLLOUT)
+        self.state = CONNECTING
+        self.since = ticks_ms()
+        try:
+            self.sock.connect(self.addr)
+        except OSError as e:
+            if e.errno not in (errno.EINPROGRESS, errno.EAGAIN):
+                self.close()
+                raise
+        body = self._str("MQTT") + bytes((4, 0x02)) + struct.pack("!H", self.keepalive) \
+            + self._str(self.client_id)
+        self.out = bytes(self._header(0x10, len(body))) + body
+
+    def poll(self):
+        """Continues connecting, sends what the socket takes and reads what
+        has arrived. Returns the packet ids of the PUBACKs received.
+        """
+        if self.sock is None:
+            raise OSError("not connected")
+        acked = []
+        try:
+            for _, ev in self.poller.poll(0):
+                if ev & (select.POLLERR | select.POLLHUP):
+                    raise OSError("connection failed")
+                if ev & select.POLLOUT:
+                    if self.state == CONNECTING:
+                        self.state = CONNACK
+                    self._flush()
+                if ev & select.POLLIN:
+                    data = self.sock.recv(256)
+                    if not data:
+                        raise OSError("connection closed")
+                    self.inbuf += data
+            self._parse(acked)
+            if self.state != UP and ticks_diff(ticks_ms(), self.since) > self.timeout * 1000:
+                raise OSError("timeout")
+        except OSError:
+            self.close()
+            raise
+        return acked
+
+    def _flush(self):
+        if self.out and self.state != CONNECTING:
+            try:
+                n = self.sock.send(self.out)
+            except OSError as e:
+                if e.errno != errno.EAGAIN:
+                    raise
+                return  # Sendepuffer voll, beim nächsten poll() weiter
+            self.out = self.out[n:]
+
+    def _parse(self, acked):
+        buf = self.inbuf
+        while len(buf) >= 2:
+            length = 0
+            shift = 0
+            k = 1
+            while k < len(buf):
+                b = buf[k]
+                k += 1
+                length |= (b & 0x7F) << shift
+                shift += 7
+                if not b & 0x80:
+                    break
+            else:
+                break   # Länge noch unvollständig
+            if len(buf) < k + length:
+                break
+            kind = buf[0] >> 4
+            body = buf[k:k + length]
+            buf = buf[k + length:]
+            if kind == 2:       # CONNACK
+                if len(body) < 2 or body[1]:
+                    raise OSError("connection refused %d" % (body[1] if len(body) > 1 else -1))
+                self.state = UP
+            elif kind == 4 and len(body) >= 2:  # PUBACK
+                acked.append(struct.unpack("!H", body[:2])[0])
+            # Alles andere (z. B. PINGRESP) verwerfen
+        self.inbuf = buf
+
+    def publish(self, topic, msg, qos=1):
+        """Queues a PUBLISH and returns its packet id (0 for qos=0)."""
+        if self.state != UP:
+            raise OSError("not connected")
+        if isinstance(msg, str):
+            msg = msg.encode()
+        topic = self._str(topic)
+        pid = 0
+        if qos:
+            self.pid = pid = self.pid % 65535 + 1
+            head = self._header(0x32, len(topic) + 2 + len(msg))
+            self.out += bytes(head) + topic + struct.pack("!H", pid) + msg
+        else:
+            head = self._header(0x30, len(topic) + len(msg))
+            self.out += bytes(head) + topic + msg
+        try:
+            self._flush()
+        except OSError:
+            self.close()
+            raise
+        return pid
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        self.poller = None
+        self.state = CLOSED
+        self.out = b""
+        self.inbuf = b""
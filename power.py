@@ -0,0 +1,165 @@
+"""Stromsparender Betrieb ohne Timer (RUNTIME = "lowpower").
+
+Statt Hardware-Timern ruft Tickless.run() die periodischen Aufgaben selbst
+auf. Nach jedem Durchlauf wird die nächste Fälligkeit aller Aufgaben
+bestimmt und bis dahin mit machine.lightsleep() geschlafen, dabei stehen
+die CPU und die meisten Takte still. Ein Pin-Interrupt (der USR-Taster)
+weckt vorzeitig; der Handler setzt nur ein Flag, die eigentliche Arbeit
+macht on_wake nach dem Aufwachen.
+
+Gibt eine Aufgabe eine Zahl zurück, ist das der Abstand in ms bis zu
+ihrem nächsten Lauf, sonst läuft sie wieder nach period_ms, im selben Takt
+wie aiotasks.periodic() (siehe cadence.py). So kann z. B. die Messung
+länger schlafen, wenn kein Sensor fällig ist.
+
+Für jede Aufgabe wird wie in aiotasks.TaskStats der Verzug festgehalten,
+für die Schleife die Wach- und Schlafzeit (Tastverhältnis). So lässt sich
+prüfen, ob die Regelung auch im Sparbetrieb ihre Termine hält.
+
+Backlight schaltet die Hintergrundbeleuchtung des LCD timeout_ms nach dem
+letzten Tastendruck aus.
+"""
+import machine
+from time import ticks_ms, ticks_us, ticks_diff, ticks_add, sleep_ms
+from cadence import next_due
+
+MIN_SLEEP_MS = 2    # Kürzere Pausen lohnen lightsleep nicht, nur sleep_ms()
+LATE_MS = 100       # Verzug, ab dem ein Lauf als verspätet zählt
+
+# Ersetzt die Endlosschleife von Tickless.run(): Funktion(tickless), die
+# step() selbst aufruft. run() kehrt danach zurück; sim/replay.py setzt eine,
+# die sofort zurückkehrt, und ruft step() bis zur jeweiligen Zielzeit auf
+driver = None
+
+
+class Job:
+    def __init__(self, name, period_ms, fn):
+        self.name = name
+        self.period_ms = period_ms
+        self.fn = fn
+        self.due = 0
+        self.runs = 0
+        self.late = 0       # Läufe mit mehr als late_ms Verzug
+        self.skipped = 0    # Ganz ausgefallene Perioden
+        self.lag_max = 0    # Größte Verspätung beim Start in ms
+
+    def __repr__(self):
+        return (f"{self.name}: {self.runs} Läufe, Verzug Max {self.lag_max} ms, "
+                f"{self.late} verspätet, {self.skipped} ausgefallen")
+
+
+class Tickless:
+    """Runs jobs at their period and sleeps in between."""
+
+    def __init__(self, jobs, on_wake=None, sleep=None, min_sleep_ms=MIN_SLEEP_MS,
+                 late_ms=LATE_MS):
+        self.jobs = jobs
+        self.on_wake = on_wake      # Funktion nach einem Wecken durch wake()
+        self.sleep = sleep or machine.lightsleep
+        self.min_sleep_ms = min_sleep_ms
+        self.late_ms = late_ms
+        self.woken = False
+        self.wakeups = 0
+        self.sleeps = 0
+        self.awake_us = 0
+        self.asleep_us = 0
+
+    def wake(self, pin=None):
+        """Pin interrupt handler: only sets a flag."""
+        self.woken = True
+
+    def start(self):
+        now = ticks_ms()
+        for job in self.jobs:
+            job.due = ticks_add(now, job.period_ms)
+
+    def step(self):
+        """Runs the due jobs, then sleeps until the next one is due."""
+        t0 = ticks_us()
+        if self.woken:
+            self.woken = False
+            self.wakeups += 1
+            if self.on_wake:
+                self.on_wake()
+        now = ticks_ms()
+        for job in self.jobs:
+            lag = ticks_diff(now, job.due)
+            if lag < 0:
+                continue
+            wait = job.fn()
+            job.runs += 1
+            if lag > job.lag_max:
+                job.lag_max = lag
+            if lag > self.late_ms:
+                job.late += 1
+            now = ticks_ms()
+            if wait is not None:
+                job.due = ticks_add(now, wait)
+                continue
+            job.due = next_due(job, job.due, now)
+        wait = self.jobs[0].period_ms
+        for job in self.jobs:
+            d = ticks_diff(job.due, now)
+            if d < wait:
+                wait = d
+        t1 = ticks_us()
+        self.awake_us += ticks_diff(t1, t0)
+        # Ein Interrupt zwischen der Prüfung und lightsleep() verzögert die
+        # Reaktion höchstens bis zur nächsten Aufgabe
+        if self.woken or wait <= 0:
+            return
+        if wait >= self.min_sleep_ms:
+            self.sleep(wait)
+            self.sleeps += 1
+            self.asleep_us += ticks_diff(ticks_us(), t1)
+        else:
+            sleep_ms(wait)
+
+    def run(self):
+        self.start()
+        if driver:
+            driver(self)
+            return
+        while True:
+            self.step()
+
+    def duty(self):
+        """Fraction of the time spent awake."""
+        total = self.awake_us + self.asleep_us
+        return self.awake_us / total if total else 1.0
+
+    def __repr__(self):
+        return (f"Sparbetrieb: {100 * self.duty():.1f} % wach, "
+                f"{self.awake_us // 1000} ms wach, {self.asleep_us // 1000} ms Schlaf, "
+                f"{self.sleeps} Schlafphasen, {self.wakeups}x geweckt")
+
+
+class Backlight:
+    """Switches the LCD backlight off timeout_ms after the last press()."""
+
+    def __init__(self, lcd, timeout_ms):
+        self.lcd = lcd
+        self.timeout_ms = timeout_ms # 0: immer an
+        self.last = ticks_ms()
+        self.on = True
+        self.pressed = False
+
+    def press(self, pin=None):
+        """Pin interrupt handler: only sets a flag, see poll()."""
+        self.pressed = True
+
+    def poll(self):
+        """Handles a press and the timeout. Returns True if the backlight
+        has just been switched on.
+        """
+        if self.pressed:
+            self.pressed = False
+            self.last = ticks_ms()
+            if not self.on:
+                self.lcd.backlight_on()
+                self.on = True
+                return True
+        elif self.on and self.timeout_ms and ticks_diff(ticks_ms(), self.last) >= self.timeout_ms:
+            self.lcd.backlight_off()
+            self.on = False
+        return False
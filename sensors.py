@@ -0,0 +1,95 @@
+"""Robuste Abfrage der DHT22-Sensoren.
+
+Sensor kapselt einen DHT22: fehlgeschlagene oder unplausible Messungen
+werden gezählt und erst nach einer exponentiell wachsenden Pause erneut
+versucht (backoff_ms, 2*backoff_ms, ...). Wiederholt wird nie im selben
+Aufruf von update(): der DHT22 braucht 2 s zwischen zwei Messungen, so
+lange darf ein Timer-Callback nicht warten. Die Wiederholung ist ein
+späterer update() nach der Pause, also frühestens die nächste Messung.
+Nach max_retries Wiederholungen in Folge ohne gute Messung gilt der Sensor
+als ausgefallen (failed), dann wird er nur noch alle max_backoff_ms
+versucht. Bis dahin bleibt der letzte gute Wert mit seinem Alter
+erhalten; ob er noch verwendet werden darf, entscheidet der Aufrufer mit
+fresh().
+"""
+from time import ticks_ms, ticks_diff, ticks_add
+
+BACKOFF_MS = 2000       # Der DHT22 braucht ohnehin 2 s zwischen Messungen
+MAX_BACKOFF_MS = 60000  # Pause nach max_retries Wiederholungen
+MAX_RETRIES = 4         # Pausen 2, 4, 8, 16 s, danach alle 60 s
+
+
+class Sensor:
+    def __init__(self, dht, korr_t=0, korr_h=0, name="",
+                 backoff_ms=BACKOFF_MS, max_backoff_ms=MAX_BACKOFF_MS, max_retries=MAX_RETRIES):
+        self.dht = dht
+        self.korr_t = korr_t
+        self.korr_h = korr_h
+        self.name = name
+        self.backoff_ms = backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+        self.max_retries = max_retries
+        self.t = 0.0
+        self.h = 0.0
+        self.stamp = None       # ticks_ms() der letzten guten Messung
+        self.next_try = None    # Frühester nächster Versuch nach Fehlern
+        self.reads = 0
+        self.errors = 0         # Fehler insgesamt (OSError oder unplausibel)
+        self.consecutive = 0    # Fehler in Folge
+        self.failures = 0       # Wie oft der Sensor als ausgefallen galt
+
+    def update(self):
+        """Measures once unless still backing off, never retries within
+        the call. Returns True if a new good value was read.
+        """
+        now = ticks_ms()
+        if self.next_try is not None and ticks_diff(self.next_try, now) > 0:
+            return False
+        self.reads += 1
+        try:
+            self.dht.measure()
+            h = self.dht.humidity() + self.korr_h
+            t = self.dht.temperature() + self.korr_t
+            ok = 1 <= h <= 100 and -40 <= t <= 80
+        except OSError:
+            ok = False
+        if not ok:
+            self.errors += 1
+            self.consecutive += 1
+            if self.consecutive <= self.max_retries:
+                backoff = self.backoff_ms << (self.consecutive - 1)
+            else:
+                if self.consecutive == self.max_retries + 1:
+                    self.failures += 1
+                backoff = self.max_backoff_ms
+            self.next_try = ticks_add(now, backoff)
+            return False
+        self.t = t
+        self.h = h
+        self.stamp = now
+        self.next_try = None
+        self.consecutive = 0
+        return True
+
+    @property
+    def failed(self):
+        """True once max_retries retries in a row have failed."""
+        return self.consecutive > self.max_retries
+
+    def age_ms(self):
+        """Age of the cached value in ms, None if there never was one."""
+        if self.stamp is None:
+            return None
+        return ticks_diff(ticks_ms(), self.stamp)
+
+    def fresh(self, max_age_ms):
+        """True if the cached value is at most max_age_ms old."""
+        age = self.age_ms()
+        return age is not None and 0 <= age <= max_age_ms
+
+    def __repr__(self):
+        age = self.age_ms()
+        age = "-" if age is None else f"{age // 1000} s"
+        return (f"{self.name}: {self.t:.1f}°C {self.h:.1f}% Alter {age}, "
+                f"{self.reads} Messungen, {self.errors} Fehler, {self.consecutive} in Folge"
+                f"{' (ausgefallen)' if self.failed else ''}, {self.failures}x ausgefallen")
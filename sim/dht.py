@@ -0,0 +1,46 @@
+"""Ersatz für das MicroPython-Modul dht in der Simulation.
+
+Die Messwerte kommen aus sources: Pin-Nummer -> Objekt mit einer Methode
+read(t), die zur Unix-Zeit t ein Tupel (Temperatur, Feuchte) liefert oder
+OSError auslöst. t ist clock.realtime(), nicht die Uhr des Boards.
+"""
+import errno
+from vclock import clock
+
+sources = {}
+
+
+class DHT22:
+    MIN_INTERVAL_US = 2000000  # Der DHT22 braucht 2 s zwischen Messungen
+
+    reads = 0
+    too_fast = 0  # Messungen schneller als MIN_INTERVAL_US
+
+    def __init__(self, pin):
+        self.pin = pin
+        self._t = 0.0
+        self._h = 0.0
+        self._last = None
+
+    def measure(self):
+        DHT22.reads += 1
+        if self._last is not None and clock.us - self._last < self.MIN_INTERVAL_US:
+            DHT22.too_fast += 1
+        self._last = clock.us
+        clock.sleep_us(5000) # Dauer der Übertragung
+        source = sources.get(self.pin.id)
+        if source is None:
+            raise OSError(errno.ETIMEDOUT)
+        t, h = source.read(clock.realtime())
+        # Auflösung des Sensors: 0,1
+        self._t = round(t * 10) / 10
+        self._h = round(h * 10) / 10
+
+    def temperature(self):
+        return self._t
+
+    def humidity(self):
+        return self._h
+
+
+DHT11 = DHT22
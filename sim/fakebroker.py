@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Kleiner MQTT-Broker im Prozess zum Testen von telemetry.py und mqtt.py.
+
+FakeBroker nimmt Verbindungen an, bestätigt CONNECT, PUBLISH (QoS 0 und 1)
+und PINGREQ und sammelt alle Nachrichten in messages als (topic, payload).
+Mit down() werden alle Verbindungen getrennt und neue abgewiesen, bis
+up() aufgerufen wird, so lässt sich ein Ausfall der Verbindung
+nachstellen.
+
+Als Skript gestartet läuft der Broker auf dem angegebenen Port und gibt
+jede Nachricht aus (Ersatz für mosquitto und mosquitto_sub):
+
+    python3 sim/fakebroker.py 1883
+"""
+import socket
+import struct
+import sys
+import threading
+
+
+class FakeBroker:
+    def __init__(self, host="127.0.0.1", port=0, verbose=False):
+        self.messages = []
+        self.connects = 0
+        self.verbose = verbose
+        self._up = True
+        self._conns = []
+        self._lock = threading.Lock()
+        self.server = socket.socket()
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen(4)
+        self.host, self.port = self.server.getsockname()
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+
+    def down(self):
+        """Drops all connections and refuses new ones."""
+        with self._lock:
+            self._up = False
+            for c in self._conns:
+                try:
+                    c.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                c.close()
+            self._conns.clear()
+
+    def up(self):
+        with self._lock:
+            self._up = True
+
+    def close(self):
+        self.down()
+        self.server.close()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            with self._lock:
+                if not self._up:
+                    conn.close()
+                    continue
+                self._conns.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _recv(conn, n):
+        buf = b""
+        while len(buf) < n:
+            data = conn.recv(n - len(buf))
+            if not data:
+                raise OSError("closed")
+            buf += data
+        return buf
+
+    def _serve(self, conn):
+        try:
+            while True:
+                first = self._recv(conn, 1)[0]
+                length = 0
+                shift = 0
+                while True:
+                    b = self._recv(conn, 1)[0]
+                    length |= (b & 0x7F) << shift
+                    shift += 7
+                    if not b & 0x80:
+                        break
+                body = self._recv(conn, length) if length else b""
+                kind = first >> 4
+                if kind == 1:     # CONNECT
+                    self.connects += 1
+                    conn.sendall(b"\x20\x02\x00\x00")
+                elif kind == 3:   # PUBLISH
+                    n = struct.unpack("!H", body[:2])[0]
+                    topic = body[2:2 + n].decode()
+                    pos = 2 + n
+                    qos = (first >> 1) & 3
+                    if qos:
+                        pid = body[pos:pos + 2]
+                        pos += 2
+                    payload = body[pos:]
+                    with self._lock:
+                        if not self._up:
+                            return
+                        self.messages.append((topic, payload))
+                    if self.verbose:
+                        print(topic, payload.decode(errors="replace"), flush=True)
+                    if qos:
+                        conn.sendall(b"\x40\x02" + pid)
+                elif kind == 12:  # PINGREQ
+                    conn.sendall(b"\xd0\x00")
+                elif kind == 14:  # DISCONNECT
+                    return
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                if conn in self._conns:
+                    self._conns.remove(conn)
+            conn.close()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 1883
+    broker = FakeBroker("0.0.0.0", port, verbose=True)
+    print(f"MQTT auf Port {broker.port}, Ende mit Strg-C", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        broker.close()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""REPL eines Boards auf einem Pseudoterminal zum Testen von export.py und
+tools/logrecv.py ohne Hardware.
+
+FakeRepl öffnet ein Pseudoterminal (name ist der Pfad für den Empfänger)
+und beantwortet dort export_log(...) wie die Firmware mit einem
+synthetischen Log (records). Wie auf dem Board wird jedes \\n als \\r\\n
+gesendet, die Eingabe als Echo zurückgeschickt, und Strg-C bricht einen
+laufenden Export ab. Störungen lassen sich einstellen: corrupt (Anteil der
+Blöcke mit einem falschen Zeichen), drop (Anteil verlorener Zeilen) und
+stall (nach so vielen Blöcken kommt nichts mehr, wie bei einem gezogenen
+Kabel).
+
+Als Skript gestartet läuft die Schleifenprüfung: Empfänger und FakeRepl
+über das Pseudoterminal, unkomprimiert, komprimiert, mit Störungen, mit
+--resume und mit --since; Ende mit Status 1, wenn eine Datei nicht
+stimmt:
+
+    python3 sim/fakerepl.py
+"""
+import ast
+import os
+import random
+import sys
+import threading
+import time
+import tty
+
+SIMDIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(SIMDIR, "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(1, os.path.join(ROOT, "tools"))
+sys.path.insert(2, SIMDIR)
+import vclock  # noqa: E402
+vclock.install(0)   # ticks_ms() usw. für die Firmware-Module
+import export  # noqa: E402
+from logstore import CSV_HEADER, csvline, parse_time  # noqa: E402
+
+
+def synthetic(n, start=1661217168, step=600):
+    """n log records (ts, t1, h1, t2, h2, fan) every step seconds."""
+    import math
+    recs = []
+    for i in range(n):
+        a = 2 * math.pi * i * step / 86400
+        t2 = 10.0 + 6.0 * math.sin(a)
+        recs.append((start + i * step, round(13.0 + math.sin(a), 1), round(70.0 + 5.0 * math.cos(a), 1),
+                     round(t2, 1), round(80.0 - 15.0 * math.sin(a), 1), i % 37 < 12))
+    return recs
+
+
+def csv(records, since=None):
+    out = [CSV_HEADER]
+    out += [csvline(r) for r in records if since is None or r[0] > since]
+    return "".join(out).encode()
+
+
+class _Interrupted(Exception):
+    pass
+
+
+class FakeRepl:
+    def __init__(self, records, corrupt=0.0, drop=0.0, stall=None, seed=0):
+        self.records = records
+        self.corrupt = corrupt
+        self.drop = drop
+        self.stall = stall      # Blöcke bis zum Verstummen (einmalig), None: nie
+        self.rng = random.Random(seed)
+        self.exports = 0
+        self.interrupts = 0
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.name = os.ttyname(self.slave)
+        self._stop = False
+        self._interrupt = threading.Event()
+        self._lines = []
+        self._cond = threading.Condition()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._reader.start()
+        self._worker.start()
+
+    def close(self):
+        self._stop = True
+        with self._cond:
+            self._cond.notify()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def _send(self, s):
+        data = s.replace("\n", "\r\n").encode()
+        while data and not self._stop:
+            try:
+                data = data[os.write(self.master, data):]
+            except OSError:     # close() während des Sendens
+                return
+
+    def _read(self):
+        line = b""
+        while not self._stop:
+            try:
+                data = os.read(self.master, 1024)
+            except OSError:
+                return
+            for c in data:
+                if c == 3:      # Strg-C
+                    self._interrupt.set()
+                    line = b""
+                elif c == 13:
+                    with self._cond:
+                        self._lines.append(line.decode())
+                        self._cond.notify()
+                    line = b""
+                else:
+                    line += bytes((c,))
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._lines and not self._stop:
+                    self._cond.wait()
+                if self._stop:
+                    return
+                line = self._lines.pop(0)
+            self._interrupt.clear()
+            self._send(line + "\n")     # Echo
+            if line.startswith("export_log("):
+                try:
+                    self._export(line)
+                except _Interrupted:
+                    self.interrupts += 1
+                    self._send("Traceback (most recent call last):\n"
+                               '  File "<stdin>", line 1, in <module>\nKeyboardInterrupt: \n')
+            self._send(">>> ")
+
+    def _export(self, line):
+        call = ast.parse(line).body[0].value
+        kw = {k.arg: ast.literal_eval(k.value) for k in call.keywords}
+        since = kw.get("since")
+        if isinstance(since, str):
+            since = parse_time(since)
+        records = self.records
+
+        def pieces():   # Wie export_log(): erst beim Senden formatieren
+            yield CSV_HEADER
+            for r in records:
+                if since is None or r[0] > since:
+                    yield csvline(r)
+        self.exports += 1
+        blocks = [0]
+
+        def write(s):
+            if self._interrupt.is_set():
+                raise _Interrupted()
+            if s.startswith("#TPX D"):
+                blocks[0] += 1
+                if self.stall is not None and blocks[0] > self.stall:
+                    self.stall = None
+                    self._interrupt.wait()  # Bis der Empfänger aufgibt
+                    raise _Interrupted()
+                if self.drop and self.rng.random() < self.drop:
+                    return
+                if self.corrupt and self.rng.random() < self.corrupt:
+                    k = self.rng.randrange(s.rindex(" ") + 1, len(s) - 1)
+                    s = s[:k] + ("A" if s[k] != "A" else "B") + s[k + 1:]
+            self._send(s)
+
+        export.send(pieces(), kw.get("offset", 0), kw.get("chunk", export.CHUNK),
+                    kw.get("compress", False), write)
+
+
+def _receive(repl, out, *args):
+    import logrecv
+    t0 = time.monotonic()
+    try:
+        logrecv.main([repl.name, "-o", out, "--timeout", "0.5"] + list(args))
+    except SystemExit as e:
+        return f"Abbruch: {e}", time.monotonic() - t0
+    return None, time.monotonic() - t0
+
+
+def main():
+    import tempfile
+    records = synthetic(52 * 7 * 144)   # Ein Jahr alle 10 min
+    full = csv(records)
+    work = tempfile.mkdtemp(prefix="logrecv_")
+    out = os.path.join(work, "taupunkt.csv")
+    failed = 0
+
+    def check(name, repl, expect, *args):
+        nonlocal failed
+        err, dt = _receive(repl, out, *args)
+        with open(out, "rb") as f:
+            ok = err is None and f.read() == expect
+        failed += not ok
+        print(f"{name:28} {'ok' if ok else 'FEHLER'}  {dt:5.2f} s, {repl.exports} Exporte, "
+              f"{repl.interrupts} abgebrochen" + (f" ({err})" if err else ""))
+        repl.close()
+
+    print(f"Log: {len(records)} Einträge, {len(full)} Bytes")
+    check("unkomprimiert", FakeRepl(records), full)
+    check("komprimiert", FakeRepl(records), full, "--compress")
+    check("gestört (CRC, Verlust)", FakeRepl(records, corrupt=0.02, drop=0.01, seed=1), full,
+          "--retries", "20")
+    # Abbruch mitten im Export, danach Fortsetzung mit --resume
+    _receive(FakeRepl(records, stall=100), out, "--retries", "0")
+    partial = os.path.getsize(out)
+    print(f"{'abgebrochen bei':28} {partial} Bytes")
+    check("--resume", FakeRepl(records), full, "--resume")
+    # Nur neue Einträge: der erste Teil liegt schon vor
+    half = len(records) // 2
+    with open(out, "wb") as f:
+        f.write(csv(records[:half]))
+    check("--since", FakeRepl(records), full, "--since")
+    # Das Log hat vorne Einträge verloren: --resume muss das bemerken
+    with open(out, "wb") as f:
+        f.write(full[:len(full) // 2])
+    err, _ = _receive(FakeRepl(records[300:]), out, "--resume")
+    ok = err is not None and "geändert" in err
+    failed += not ok
+    print(f"{'--resume nach Löschen':28} {'ok' if ok else 'FEHLER'}  ({err})")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
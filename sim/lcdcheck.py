@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""Prüfung der LCD-Ausgabe gegen einen dekodierenden I2C-Bus.
+
+Hd44780 ersetzt den I2C-Bus und spielt den HD44780 hinter dem PCF8574
+nach: aus den Bytes jeder Übertragung werden die Nibbles bei der
+fallenden Flanke von E übernommen, im 4-Bit-Modus zu Befehlen und Zeichen
+zusammengesetzt und in DDRAM und CGRAM ausgeführt. text() liefert, was
+das LCD zeigt. Dabei wird auch geprüft, ob nach jedem Befehl die
+Ausführungszeit des HD44780 abgewartet wurde (37 us, 1,52 ms nach clear
+und home), die Bytes brauchen dafür wie in sim/machine.py ihre Zeit auf
+dem Bus.
+
+Als Skript gestartet zeigt es die Anzeige von --minutes Minuten
+Messwerten (alle 2 s wie display(), aus einem synthetischen Verlauf wie
+sim/replay.py) auf vier Arten an: byteweise (eine Übertragung je Befehl
+oder Zeichen, LcdApi.hal_write_run) und gebündelt (I2cLcd.hal_write_run),
+jeweils mit clear() und putstr() wie früher und mit render_frame(). Nach
+jedem Bild muss das LCD genau die Zeilen zeigen. Ausgegeben werden
+Übertragungen, Bytes und Busszeit (100 kHz, mit Adressbytes) je Bild.
+Zuletzt folgt auf ein Bild, das in der letzten Spalte endet, ein putstr(),
+das am Anfang der nächsten Zeile stehen muss. Ende mit Status 1, wenn eine
+Anzeige nicht stimmt oder eine Wartezeit fehlt:
+
+    python3 sim/lcdcheck.py
+"""
+import argparse
+import os
+import sys
+
+SIMDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [SIMDIR, os.path.dirname(SIMDIR)]
+import vclock  # noqa: E402
+from vclock import clock  # noqa: E402
+vclock.install(0)   # sleep_ms() usw. für machine_i2c_lcd
+from lcd_api import LcdApi  # noqa: E402
+from machine_i2c_lcd import I2cLcd, MASK_RS, MASK_E, SHIFT_BACKLIGHT  # noqa: E402
+
+ADDR = 0x27
+BUSY_US = 37        # Ausführungszeit der meisten Befehle und Zeichen
+BUSY_CLEAR_US = 1520
+
+
+class Hd44780:
+    """I2C bus with a PCF8574 and a HD44780 behind it."""
+
+    def __init__(self, lines=2, cols=16, freq=100000):
+        self.lines = lines
+        self.cols = cols
+        self.freq = freq
+        self.transactions = 0
+        self.bytes = 0          # Daten ohne Adressbyte
+        self.bus_us = 0         # Zeit auf dem Bus mit Adressbytes
+        self.too_fast = 0       # Nibbles vor Ende der Ausführungszeit
+        self.errors = []        # Nicht unterstützte Befehle
+        self.ddram = bytearray(b" " * 0x80)
+        self.cgram = bytearray(64)
+        self.addr = 0
+        self.cgaddr = None      # Nicht None: Zeichen gehen ins CGRAM
+        self.backlight = False
+        self.mode8 = True       # Nach dem Einschalten im 8-Bit-Modus
+        self.high = None        # Erstes Nibble im 4-Bit-Modus
+        self.strobe = False     # E im letzten Byte gesetzt
+        self.busy_until = 0
+
+    def writeto(self, addr, buf, stop=True):
+        if addr != ADDR:
+            raise OSError(19)
+        n = len(buf)
+        us = 9 * 1000000 / self.freq    # Ein Byte mit ACK
+        t0 = clock.us + us              # Nach dem Adressbyte
+        for k in range(n):
+            self._byte(buf[k], t0 + (k + 1) * us)
+        self.transactions += 1
+        self.bytes += n
+        self.bus_us += (n + 1) * us
+        clock.sleep_us(int((n + 1) * us))
+        return n
+
+    def scan(self):
+        return [ADDR]
+
+    def _byte(self, b, t):
+        self.backlight = bool(b >> SHIFT_BACKLIGHT & 1)
+        if self.strobe and not b & MASK_E:  # Fallende Flanke von E
+            if t < self.busy_until:
+                self.too_fast += 1
+            nibble = b >> 4
+            rs = b & MASK_RS
+            if self.mode8:
+                self._execute(rs, nibble << 4, t)
+            elif self.high is None:
+                self.high = nibble
+            else:
+                value = self.high << 4 | nibble
+                self.high = None
+                self._execute(rs, value, t)
+        self.strobe = bool(b & MASK_E)
+
+    def _execute(self, rs, v, t):
+        busy = BUSY_US
+        if rs:
+            if self.cgaddr is None:
+                self.ddram[self.addr] = v
+                self.addr = self._next(self.addr)
+            else:
+                self.cgram[self.cgaddr] = v
+                self.cgaddr = (self.cgaddr + 1) & 0x3F
+        elif v & LcdApi.LCD_DDRAM:
+            self.addr = v & 0x7F
+            self.cgaddr = None
+        elif v & LcdApi.LCD_CGRAM:
+            self.cgaddr = v & 0x3F
+        elif v & LcdApi.LCD_FUNCTION:
+            if not v & LcdApi.LCD_FUNCTION_8BIT:
+                self.mode8 = False
+        elif v & LcdApi.LCD_MOVE:
+            self.errors.append(f"Verschieben {v:#04x}")
+        elif v & LcdApi.LCD_ON_CTRL:
+            pass
+        elif v & LcdApi.LCD_ENTRY_MODE:
+            if v != LcdApi.LCD_ENTRY_MODE | LcdApi.LCD_ENTRY_INC:
+                self.errors.append(f"Eingabemodus {v:#04x}")
+        elif v & LcdApi.LCD_HOME:
+            self.addr = 0
+            self.cgaddr = None
+            busy = BUSY_CLEAR_US
+        elif v & LcdApi.LCD_CLR:
+            self.ddram[:] = b" " * len(self.ddram)
+            self.addr = 0
+            self.cgaddr = None
+            busy = BUSY_CLEAR_US
+        self.busy_until = t + busy
+
+    @staticmethod
+    def _next(addr):
+        """DDRAM address after addr: 0x00-0x27, then 0x40-0x67."""
+        addr += 1
+        if addr == 0x28:
+            return 0x40
+        if addr == 0x68:
+            return 0
+        return addr
+
+    def row(self, y):
+        base = (0x40 if y & 1 else 0) + (self.cols if y & 2 else 0)
+        return bytes(self.ddram[base:base + self.cols])
+
+    def text(self):
+        """The lines shown on the display."""
+        return [self.row(y) for y in range(self.lines)]
+
+
+class ByteLcd(I2cLcd):
+    """I2cLcd without batching: one I2C transfer per command or character."""
+    hal_write_run = LcdApi.hal_write_run
+
+
+def frames(minutes, seed=0):
+    """Display frames every 2 s as display() shows them, from a synthetic
+    trace like sim/replay.py, with a sensor error now and then.
+    """
+    import random
+    import replay
+    from dewpoint import taupunkt
+    from lcdformat import SensorLine
+    trace = replay.Trace.synthetic(minutes / 1440 + 1, seed=seed)
+    rng = random.Random(seed)
+    s1 = replay.Source(trace, trace.t1, trace.h1, rng=rng, noise=(0.1, 0.5))
+    s2 = replay.Source(trace, trace.t2, trace.h2, rng=rng, noise=(0.1, 0.5))
+    line1 = SensorLine()
+    line2 = SensorLine()
+    err = b"Fehler Sensor 2"
+    for k in range(minutes * 30):
+        now = trace.ts[0] + 2 * k
+        t1, h1 = s1.read(now)
+        t2, h2 = s2.read(now)
+        a = bytes(line1.set(round(t1), round(h1), round(taupunkt(t1, h1) * 10)))
+        if k % 500 < 10:
+            b = err
+        else:
+            b = bytes(line2.set(round(t2), round(h2), round(taupunkt(t2, h2) * 10)))
+        yield a, b
+
+
+def check(lcd_class, render, frames, cols=16):
+    """Shows frames on a fresh LCD, with render_frame() or with clear()
+    and putstr(). Returns the bus and the number of frames shown wrong.
+    """
+    bus = Hd44780(2, cols)
+    lcd = lcd_class(bus, ADDR, 2, cols)
+    bus.transactions = bus.bytes = bus.bus_us = 0
+    wrong = 0
+    for frame in frames:
+        if render:
+            lcd.render_frame(frame)
+        else:
+            lcd.clear()
+            lcd.putstr(frame[0].decode("latin-1"))
+            lcd.move_to(0, 1)
+            lcd.putstr(frame[1].decode("latin-1"))
+        expect = [line[:cols].ljust(cols, b" ") for line in frame]
+        if bus.text() != expect or bytes(lcd.shadow) != b"".join(expect):
+            wrong += 1
+    return bus, wrong
+
+
+def check_putstr(lcd_class, cols=16):
+    """render_frame() ending in the last column, then putstr(). Returns
+    the lines shown and the lines expected.
+    """
+    bus = Hd44780(2, cols)
+    lcd = lcd_class(bus, ADDR, 2, cols)
+    lcd.render_frame([b"a", b"0123456789ABCDEF"[:cols]])
+    lcd.putstr("Q")
+    return bus.text(), [b"Q".ljust(cols), b"0123456789ABCDEF"[:cols]]
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("--minutes", type=int, default=60, help="Minuten Anzeige (Standard 60)")
+    args = p.parse_args(argv)
+    shown = list(frames(args.minutes))
+    failed = 0
+    base = None
+    print(f"{len(shown)} Bilder")
+    print(f"{'je Bild':30s} {'Übertragungen':>13s} {'Bytes':>7s} {'Bus ms':>7s} {'Faktor':>7s}")
+    for label, cls, render in (("byteweise, clear+putstr", ByteLcd, False),
+                               ("gebündelt, clear+putstr", I2cLcd, False),
+                               ("byteweise, render_frame", ByteLcd, True),
+                               ("gebündelt, render_frame", I2cLcd, True)):
+        bus, wrong = check(cls, render, shown)
+        n = len(shown)
+        base = base or bus.bus_us
+        ok = not wrong and not bus.too_fast and not bus.errors
+        failed += not ok
+        print(f"{label:30s} {bus.transactions / n:13.1f} {bus.bytes / n:7.1f} "
+              f"{bus.bus_us / n / 1000:7.2f} {base / bus.bus_us if bus.bus_us else 0:6.1f}x  "
+              + ("ok" if ok else f"FEHLER: {wrong} Bilder falsch, {bus.too_fast}x zu schnell, "
+                                 f"{'; '.join(bus.errors[:3])}"))
+    for label, cls in (("byteweise, render_frame+putstr", ByteLcd),
+                       ("gebündelt, render_frame+putstr", I2cLcd)):
+        shown, expect = check_putstr(cls)
+        failed += shown != expect
+        print(f"{label:30s} " + ("ok" if shown == expect else f"FEHLER: {shown}"))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
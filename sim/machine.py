@@ -0,0 +1,176 @@
+"""Ersatz für das MicroPython-Modul machine in der Simulation.
+
+Pins merken sich ihre Zustandswechsel, I2C zählt Transaktionen und Bytes
+und verbraucht auf der virtuellen Uhr die Zeit, die der Bus bräuchte.
+Timer laufen auf vclock.clock, reset() löst SimReset aus.
+"""
+from vclock import clock
+
+
+class SimReset(Exception):
+    """Raised by reset(); the simulation restarts the firmware."""
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    pins = {}          # id -> letzte Pin-Instanz
+    transitions = []   # (Zeit in s, id, neuer Wert) aller Ausgänge
+
+    def __init__(self, id, mode=IN, pull=None, value=None):
+        self.id = id
+        self.mode = mode
+        self._value = 0 if value is None else value
+        self.handler = None
+        self.trigger = 0
+        Pin.pins[id] = self
+
+    def init(self, mode=IN, pull=None, value=None):
+        self.mode = mode
+        if value is not None:
+            self.value(value)
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        v = 1 if v else 0
+        if v != self._value:
+            if self.mode != Pin.IN:
+                Pin.transitions.append((clock.us / 1e6, self.id, v))
+            old = self._value
+            self._value = v
+            if self.handler and (
+                    (old and not v and self.trigger & Pin.IRQ_FALLING) or
+                    (v and not old and self.trigger & Pin.IRQ_RISING)):
+                self.handler(self)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def toggle(self):
+        self.value(not self._value)
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING):
+        self.handler = handler
+        self.trigger = trigger
+
+
+class I2C:
+    # Summen über alle Busse
+    transactions = 0
+    bytes = 0
+
+    def __init__(self, id=0, scl=None, sda=None, freq=400000):
+        self.id = id
+        self.freq = freq
+
+    def writeto(self, addr, buf, stop=True):
+        n = len(buf)
+        I2C.transactions += 1
+        I2C.bytes += n
+        # Adressbyte + Daten, je 9 Takte
+        clock.sleep_us((n + 1) * 9 * 1000000 // self.freq)
+        return n
+
+    def scan(self):
+        return [0x27]
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, mode=PERIODIC, period=-1, freq=None, callback=None):
+        self.callback = None
+        if callback is not None or period > 0 or freq:
+            self.init(mode=mode, period=period, freq=freq, callback=callback)
+
+    def init(self, mode=PERIODIC, period=-1, freq=None, callback=None):
+        if freq:
+            period = 1000 // freq
+        self.mode = mode
+        self.period_us = int(period * 1000)
+        self.callback = callback
+        self.due = clock.us + self.period_us
+        clock.add_timer(self)
+
+    def deinit(self):
+        clock.remove_timer(self)
+
+    def fire(self):
+        if self.mode == Timer.PERIODIC:
+            self.due += self.period_us
+        else:
+            clock.remove_timer(self)
+        if self.callback:
+            self.callback(self)
+
+
+class WDT:
+    def __init__(self, id=0, timeout=5000):
+        self.timeout = timeout
+
+    def feed(self):
+        pass
+
+
+PWRON_RESET = 1
+WDT_RESET = 3
+cause = PWRON_RESET  # Ergebnis von reset_cause(), die Simulation setzt es
+
+
+def reset_cause():
+    return cause
+
+
+def reset():
+    global cause
+    cause = WDT_RESET
+    raise SimReset()
+
+
+def soft_reset():
+    raise SimReset()
+
+
+def disable_irq():
+    return 0
+
+
+def enable_irq(state=0):
+    pass
+
+
+def idle():
+    pass
+
+
+def lightsleep(ms=None):
+    if ms is None:
+        due = clock.next_deadline()
+        ms = 0 if due is None else max(0, due - clock.us) / 1000
+    clock.sleep_us(int(ms * 1000))
+
+
+def deepsleep(ms=None):
+    reset()
+
+
+def freq(hz=None):
+    return 125000000
+
+
+def unique_id():
+    return b"\x00SIMUL\x00\x00"
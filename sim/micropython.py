@@ -0,0 +1,25 @@
+"""Ersatz für das MicroPython-Modul micropython in der Simulation."""
+from vclock import clock
+
+
+def schedule(fn, arg):
+    clock.schedule(fn, arg)
+
+
+def const(x):
+    return x
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def mem_info(verbose=None):
+    pass
+
+
+def native(fn):
+    return fn
+
+
+viper = native
@@ -0,0 +1,25 @@
+"""Ersatz für das MicroPython-Modul neopixel in der Simulation."""
+
+
+class NeoPixel:
+    writes = 0  # Anzahl write() über alle Streifen
+
+    def __init__(self, pin, n, bpp=3, timing=1):
+        self.pin = pin
+        self.n = n
+        self.buf = [(0, 0, 0)] * n
+
+    def __setitem__(self, i, color):
+        self.buf[i] = color
+
+    def __getitem__(self, i):
+        return self.buf[i]
+
+    def __len__(self):
+        return self.n
+
+    def fill(self, color):
+        self.buf = [color] * self.n
+
+    def write(self):
+        NeoPixel.writes += 1
@@ -0,0 +1,701 @@
+#!/usr/bin/env python3
+"""Beschleunigte Simulation der Firmware unter CPython.
+
+Die Firmware (taupunktluefter.py) läuft unverändert mit den Ersatzmodulen
+aus diesem Verzeichnis (machine, dht, neopixel, micropython) auf einer
+virtuellen Uhr. Die Sensoren spielen eine aufgezeichnete Logdatei
+(taupunkt.csv bzw. export_csv()) oder einen synthetischen Verlauf ab,
+linear interpoliert zwischen den Einträgen. Die Timer von Alarm_timer rufen
+measure(), display() und logdta() wie auf dem Board auf, nur ohne Warten.
+
+Am Ende werden die Schaltvorgänge des Relais, der Verkehr auf dem
+LCD-Bus, die CPU-Zeit je Callback sowie Resets und Scheduler-Überläufe
+ausgegeben, außerdem die Schreibvorgänge auf den Flash (jedes Schreiben
+einer Datei zählt mindestens einen 4 kB Block) und wie viele Logeinträge
+bei den mit --power-cut eingestreuten Stromausfällen verloren gingen.
+
+Mit --runtime läuft die Firmware in einer anderen Betriebsart als ihrem
+RUNTIME. Deren Schleifen kämen beim Import nie zurück: für "asyncio" legt
+uasyncio.run() aus diesem Verzeichnis nur den Haupttask an, für
+"lowpower" kehrt Tickless.run() über power.driver gleich zurück. Die
+Simulation treibt dann die Tasks bzw. Tickless.step() bis zur jeweiligen
+Zielzeit. Berichtet werden zusätzlich Läufe, Verzug und ausgefallene
+Perioden je Aufgabe, im Sparbetrieb auch das Tastverhältnis von Tickless.
+Dessen Wachzeit ist hier nur die virtuelle Zeit, die die Aufgaben warten
+(Sensoren, LCD-Bus), ohne die Rechenzeit; sie hängt nicht vom Host ab.
+--press drückt regelmäßig den USR-Taster. Mit --rtc-reset steht die Uhr
+des Boards bei jedem Start wieder auf dem 1.1.2021 wie bei einer RTC ohne
+Batterie; die Sensoren spielen den Verlauf trotzdem in der richtigen Zeit ab.
+--zones N hängt an ZONES der Firmware weitere Zonen bis N an, jede mit einem
+eigenen Innensensor (Innenwerte des Verlaufs) und eigenem Relais, alle mit
+dem Außensensor der ersten Zone; berichtet werden dann die Schaltvorgänge
+je Zone.
+
+    python3 sim/replay.py taupunkt.csv
+    python3 sim/replay.py --synthetic 30 --error-rate 0.001 --json bericht.json
+    python3 sim/replay.py --synthetic 7 --noise 0.3,1.5 --compare-filter
+    python3 sim/replay.py --synthetic 7 --power-cut 5
+    python3 sim/replay.py --synthetic 7 --power-cut 5 --rtc-reset
+    python3 sim/replay.py --synthetic 1 --runtime lowpower --press 12
+    python3 sim/replay.py --synthetic 3 --zones 8
+"""
+import argparse
+import builtins
+import bisect
+import calendar
+import importlib
+import importlib.util
+import io
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+SIMDIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(SIMDIR)
+for p in (ROOT, SIMDIR):
+    if p in sys.path:
+        sys.path.remove(p)
+sys.path[:0] = [SIMDIR, ROOT]
+
+import vclock  # noqa: E402
+import machine  # noqa: E402
+import dht  # noqa: E402
+import neopixel  # noqa: E402
+import uasyncio  # noqa: E402
+
+FIRMWARE = "taupunktluefter"
+RUNTIMES = ("timer", "asyncio", "lowpower")
+
+
+def parse_time(s):
+    """Parses DD.MM.YYYY HH:MM:SS as written by pt() (no time zone)."""
+    return calendar.timegm((int(s[6:10]), int(s[3:5]), int(s[0:2]),
+                            int(s[11:13]), int(s[14:16]), int(s[17:19]), 0, 0, 0))
+
+
+class Trace:
+    """Sensor values over time: sorted timestamps with t1, h1, t2, h2."""
+
+    def __init__(self, ts, t1, h1, t2, h2):
+        self.ts = ts
+        self.t1 = t1
+        self.h1 = h1
+        self.t2 = t2
+        self.h2 = h2
+
+    def __len__(self):
+        return len(self.ts)
+
+    @classmethod
+    def from_csv(cls, *names):
+        """Reads logfiles of logdta()/export_csv(), with or without tp columns."""
+        rows = []
+        for name in names:
+            ncols = 6
+            with open(name) as f:
+                for line in f:
+                    fields = line.rstrip().split(",")
+                    if fields[0] == "Date":
+                        ncols = len(fields) - 2
+                        continue
+                    if len(fields) != ncols + 2:
+                        continue
+                    try:
+                        ts = parse_time(fields[0])
+                        v = [float(x) for x in fields[1:-1]]
+                    except ValueError:
+                        continue
+                    if ncols == 6:
+                        rows.append((ts, v[0], v[1], v[3], v[4]))
+                    else:
+                        rows.append((ts, v[0], v[1], v[2], v[3]))
+        rows.sort()
+        return cls(*[list(c) for c in zip(*rows)])
+
+    @classmethod
+    def synthetic(cls, days, start=1661217168, step=600, seed=0):
+        """A cellar with slow indoor and daily outdoor cycles plus noise."""
+        rng = random.Random(seed)
+        ts, t1, h1, t2, h2 = [], [], [], [], []
+        for i in range(int(days * 86400 / step) + 1):
+            t = start + i * step
+            day = math.sin((t % 86400) / 86400 * 2 * math.pi)
+            season = math.sin(t / (365 * 86400) * 2 * math.pi)
+            ts.append(t)
+            # Taupunktdifferenz schwankt täglich zwischen etwa -2 und +5 K
+            t1.append(14 + season + 0.5 * day + rng.gauss(0, 0.2))
+            h1.append(min(99, max(20, 70 + rng.gauss(0, 2))))
+            t2.append(11 + season + 6 * day + rng.gauss(0, 0.4))
+            h2.append(min(99, max(20, 78 - 12 * day + rng.gauss(0, 3))))
+        return cls(ts, t1, h1, t2, h2)
+
+
+class Source:
+    """Feeds one sensor of a trace into the dht stand-in."""
+
+    def __init__(self, trace, t, h, error_rate=0.0, rng=None, noise=(0.0, 0.0)):
+        self.trace = trace
+        self.t = t
+        self.h = h
+        self.error_rate = error_rate
+        self.noise = noise   # Standardabweichung des Messrauschens (t, h)
+        self.rng = rng or random.Random(0)
+        self.offset_t = 0.0  # Wird abgezogen, damit die Firmware-Korrektur
+        self.offset_h = 0.0  # wieder die Werte der Aufzeichnung ergibt
+        self.errors = 0
+
+    def read(self, now):
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            raise OSError(110)
+        ts = self.trace.ts
+        i = bisect.bisect_right(ts, now)
+        if i == 0:
+            t, h = self.t[0], self.h[0]
+        elif i >= len(ts):
+            t, h = self.t[-1], self.h[-1]
+        else:
+            f = (now - ts[i-1]) / (ts[i] - ts[i-1])
+            t = self.t[i-1] + f * (self.t[i] - self.t[i-1])
+            h = self.h[i-1] + f * (self.h[i] - self.h[i-1])
+        if self.noise[0]:
+            t += self.rng.gauss(0, self.noise[0])
+        if self.noise[1]:
+            h = min(100.0, max(0.0, h + self.rng.gauss(0, self.noise[1])))
+        return t - self.offset_t, h - self.offset_h
+
+
+def _return(tickless):
+    """power.driver: Tickless.run() returns, Simulation.run() calls step()."""
+
+
+class _Null(io.TextIOBase):
+    def write(self, s):
+        return len(s)
+
+
+BLOCK = 4096
+RTC_RESET = calendar.timegm((2021, 1, 1, 0, 0, 0))  # Uhr des Boards nach dem Einschalten
+# Pins (Innensensor, Relais) der mit --zones angehängten Zonen, auf dem Pico
+# sonst nicht belegt
+EXTRA_ZONES = ((3, 14), (4, 15), (5, 16), (7, 17), (8, 18), (9, 19), (11, 22))
+
+
+class FlashMeter:
+    """Counts what the firmware writes to files: every file opened for
+    writing costs at least one flash block when it is closed.
+    """
+
+    def __init__(self):
+        self.sessions = 0
+        self.bytes = 0
+        self.blocks = 0
+        self._open = builtins.open
+
+    def open(self, file, mode="r", *args, **kw):
+        f = self._open(file, mode, *args, **kw)
+        if any(c in mode for c in "wa+"):
+            return _CountingFile(f, self)
+        return f
+
+    def add(self, n):
+        self.sessions += 1
+        self.bytes += n
+        self.blocks += max(1, -(-n // BLOCK))
+
+
+class _CountingFile:
+    def __init__(self, f, meter):
+        self._f = f
+        self._meter = meter
+        self._n = 0
+
+    def write(self, b):
+        self._n += len(b)
+        return self._f.write(b)
+
+    def close(self):
+        if not self._f.closed:
+            self._meter.add(self._n)
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        return iter(self._f)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+class Simulation:
+    """Runs the unmodified firmware against a trace on the virtual clock."""
+
+    def __init__(self, trace, error_rate=0.0, seed=0, workdir=None, quiet=True,
+                 after_boot=None, noise=(0.0, 0.0), power_cut_h=None,
+                 backlight_timeout=False, runtime=None, press_h=None, rtc_reset=False,
+                 zones=1):
+        self.trace = trace
+        if not 1 <= zones <= len(EXTRA_ZONES) + 1:
+            raise ValueError(f"1 bis {len(EXTRA_ZONES) + 1} Zonen")
+        self.zones = zones      # Zonen der Firmware, mehr als 1: angehängt
+        self.rtc_reset = rtc_reset  # Uhr bei jedem Start auf RTC_RESET
+        self.runtime = runtime  # RUNTIME der Firmware ersetzen, None: unverändert
+        self.press_h = press_h  # Abstand der Tastendrücke in Stunden
+        self.next_press = None
+        self.presses = 0
+        # Ohne Tastendruck schaltet die Firmware Beleuchtung und LCD-Ausgabe
+        # ab; standardmäßig bleibt sie an, damit der LCD-Verkehr zählt
+        self.backlight_timeout = backlight_timeout
+        self.power_cut_h = power_cut_h  # Mittlerer Abstand der Stromausfälle
+        self.power_cuts = 0
+        self.next_cut = None
+        self.boot_times = []    # boot_ms der Firmware je Start
+        machine.cause = machine.PWRON_RESET
+        self.flash = FlashMeter()
+        self.after_boot = after_boot  # Funktion(fw), z. B. um Einstellungen zu ändern
+        self.quiet = quiet
+        self.resets = 0
+        self.fw = None
+        self.logged = 0         # Logeinträge aller Starts
+        self.tasks = {}         # Name -> Summen der Aufgaben aller Starts
+        self.idle = {"awake_us": 0, "asleep_us": 0, "sleeps": 0, "wakeups": 0}
+        self.workdir = workdir or tempfile.mkdtemp(prefix="taupunkt_sim_")
+        self._own_workdir = workdir is None
+        rng = random.Random(seed)
+        self.cut_rng = random.Random(seed + 1)
+        self.sensor1 = Source(trace, trace.t1, trace.h1, error_rate, rng, noise)
+        self.sensor2 = Source(trace, trace.t2, trace.h2, error_rate, rng, noise)
+        self.extra = [Source(trace, trace.t1, trace.h1, error_rate, rng, noise)
+                      for _ in range(zones - 1)]
+        self.clock = vclock.install(trace.ts[0])
+        self.clock.on_error = self._on_error
+        machine.Pin.pins.clear()
+        machine.Pin.transitions.clear()
+        machine.I2C.transactions = machine.I2C.bytes = 0
+        neopixel.NeoPixel.writes = 0
+        dht.DHT22.reads = dht.DHT22.too_fast = 0
+        self.wall = 0.0
+
+    def _on_error(self, e):
+        if isinstance(e, machine.SimReset):
+            raise e
+        # Andere Exceptions werden nur gezählt (clock.errors), wie auf dem
+        # Board, wo sie ausgegeben werden und die Timer weiterlaufen.
+
+    def _stdout(self):
+        return _Null() if self.quiet else sys.stdout
+
+    def boot(self):
+        """(Re)starts the firmware like a power-on of the board."""
+        self.clock.timers.clear()
+        self.clock.queue.clear()
+        if self.rtc_reset:
+            self.clock.set_rtc(RTC_RESET)
+        for name, mod in list(sys.modules.items()):
+            f = getattr(mod, "__file__", None) or ""
+            if f.startswith(ROOT + os.sep) and not f.startswith(SIMDIR):
+                del sys.modules[name]
+        cwd = os.getcwd()
+        stdout = sys.stdout
+        os.chdir(self.workdir)
+        sys.stdout = self._stdout()
+        builtins.open = self.flash.open
+        try:
+            # Die Firmware misst schon beim Import: Quellen vorher setzen
+            dht.sources.clear()
+            src = open(os.path.join(ROOT, FIRMWARE + ".py")).read()
+            pins = self._sensor_pins(src)
+            dht.sources[pins[0]] = self.sensor1
+            dht.sources[pins[1]] = self.sensor2
+            for source, (pin, relay) in zip(self.extra, EXTRA_ZONES):
+                dht.sources[pin] = source
+            # Die Schleife von RUNTIME = "lowpower" treibt run()
+            importlib.import_module("power").driver = _return
+            changed = src
+            if self.runtime:
+                changed = changed.replace(self._runtime_line(src), f"RUNTIME = {self.runtime!r}")
+            if self.zones > 1:
+                changed = self._add_zones(changed, self.zones)
+            if changed != src:
+                self.fw = self._load(changed)
+            else:
+                self.fw = importlib.import_module(FIRMWARE)
+        finally:
+            builtins.open = self.flash._open
+            sys.stdout = stdout
+            os.chdir(cwd)
+        fw = self.fw
+        self.sensor1.offset_t = getattr(fw, "Korrektur_t_1", 0)
+        self.sensor1.offset_h = getattr(fw, "Korrektur_h_1", 0)
+        self.sensor2.offset_t = getattr(fw, "Korrektur_t_2", 0)
+        self.sensor2.offset_h = getattr(fw, "Korrektur_h_2", 0)
+        if getattr(fw, "boot_ms", None) is not None:
+            self.boot_times.append(fw.boot_ms)
+        if not self.backlight_timeout and hasattr(fw, "backlight"):
+            fw.backlight.timeout_ms = 0
+        log_append = fw.log_append
+
+        def counted():
+            self.logged += 1
+            log_append()
+        fw.log_append = counted
+        if fw.idle:
+            for job in fw.idle.jobs:
+                job.fn = self._timed(job.fn)
+        if self.after_boot:
+            self.after_boot(fw)
+
+    @staticmethod
+    def _runtime_line(src):
+        for line in src.splitlines():
+            if line.startswith("RUNTIME"):
+                return line
+        raise ValueError("RUNTIME fehlt in " + FIRMWARE)
+
+    @staticmethod
+    def _add_zones(src, n):
+        """src with zones 2 to n appended to ZONES (see EXTRA_ZONES)."""
+        lines = src.splitlines(keepends=True)
+        i = next(k for k, line in enumerate(lines) if line.startswith("ZONES"))
+        while not lines[i].startswith(")"):
+            i += 1
+        sensors = ", ".join(f"{pin}: (\"Sensor {k + 3}\", 0, 0)"
+                            for k, (pin, relay) in enumerate(EXTRA_ZONES[:n - 1]))
+        zones = "".join(f"(\"Zone {k + 2}\", {pin}, DHTPIN_2, {relay}, {{}}), "
+                        for k, (pin, relay) in enumerate(EXTRA_ZONES[:n - 1]))
+        lines.insert(i + 1, f"SENSORS.update({{{sensors}}})\nZONES += ({zones})\n")
+        return "".join(lines)
+
+    @staticmethod
+    def _load(src):
+        """Imports the firmware from the changed source src."""
+        path = os.path.join(ROOT, FIRMWARE + ".py")
+        fw = importlib.util.module_from_spec(
+            importlib.util.spec_from_file_location(FIRMWARE, path))
+        sys.modules[FIRMWARE] = fw
+        try:
+            exec(compile(src, path, "exec"), fw.__dict__)
+        except BaseException:
+            del sys.modules[FIRMWARE]
+            raise
+        return fw
+
+    def _timed(self, fn):
+        """fn with its CPU time in clock.stats like a scheduled function."""
+        stats = self.clock.stats.setdefault(fn.__name__, vclock.CallbackStats())
+
+        def timed(*args):
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                stats.add(time.perf_counter() - start)
+        return timed
+
+    def _collect(self, idle=None, tasks=None):
+        """Adds the task statistics of the running firmware to the totals
+        of all starts (default self.idle and self.tasks).
+        """
+        fw = self.fw
+        idle = self.idle if idle is None else idle
+        tasks = self.tasks if tasks is None else tasks
+        if fw is None:
+            return
+        if fw.idle:
+            for k in idle:
+                idle[k] += getattr(fw.idle, k)
+        for t in fw.idle.jobs if fw.idle else getattr(fw, "task_stats", ()):
+            tot = tasks.setdefault(t.name, {"runs": 0, "lag_max_ms": 0, "skipped": 0})
+            tot["runs"] += t.runs
+            tot["lag_max_ms"] = max(tot["lag_max_ms"], t.lag_max)
+            tot["skipped"] += t.skipped
+            if hasattr(t, "late"):
+                tot["late"] = tot.get("late", 0) + t.late
+
+    def press(self):
+        """Presses the USR button (falling edge on USR_PIN)."""
+        pin = machine.Pin.pins[self.fw.USR_PIN]
+        pin.value(1)
+        pin.value(0)
+        self.presses += 1
+
+    def _run_until(self, us):
+        """Runs the firmware up to the virtual time us; in low power mode
+        the last sleep may go a little beyond.
+        """
+        runtime = getattr(self.fw, "RUNTIME", "timer")
+        if runtime == "lowpower":
+            while self.clock.us < us:
+                self.fw.idle.step()
+        elif runtime == "asyncio":
+            uasyncio.run_until(us)
+        else:
+            self.clock.run_until(us)
+
+    def _plan_cut(self):
+        h = self.power_cut_h * self.cut_rng.uniform(0.5, 1.5)
+        self.next_cut = self.clock.us + int(h * 3600 * 1000000)
+
+    @staticmethod
+    def _sensor_pins(src):
+        pins = {}
+        for line in src.splitlines():
+            for name in ("DHTPIN_1", "DHTPIN_2"):
+                if line.startswith(name):
+                    pins[name] = int(line.split("=")[1].split("#")[0])
+        return pins.get("DHTPIN_1", 2), pins.get("DHTPIN_2", 10)
+
+    def run(self, seconds=None):
+        """Runs for seconds of simulated time (default: the whole trace)."""
+        if seconds is None:
+            end = (self.trace.ts[-1] - self.trace.ts[0]) * 1000000
+        else:
+            end = self.clock.us + int(seconds * 1000000)
+        start = time.perf_counter()
+        cwd = os.getcwd()
+        stdout = sys.stdout
+        try:
+            while True:
+                try:
+                    if self.fw is None:
+                        self.boot()
+                    os.chdir(self.workdir)
+                    sys.stdout = self._stdout()
+                    builtins.open = self.flash.open
+                    target = end
+                    if self.power_cut_h:
+                        if self.next_cut is None:
+                            self._plan_cut()
+                        target = min(target, self.next_cut)
+                    if self.press_h:
+                        if self.next_press is None:
+                            self.next_press = self.clock.us + int(self.press_h * 3600 * 1000000)
+                        target = min(target, self.next_press)
+                    self._run_until(target)
+                    if self.clock.us >= end:
+                        break
+                    if self.press_h and self.clock.us >= self.next_press:
+                        self.press()
+                        self.next_press = None
+                        continue
+                    # Stromausfall: RAM weg, nur der Flash bleibt
+                    self.power_cuts += 1
+                    self.next_cut = None
+                    self._collect()
+                    self.fw = None
+                    machine.cause = machine.PWRON_RESET
+                except machine.SimReset:
+                    self.resets += 1
+                    self._collect()
+                    self.fw = None
+                finally:
+                    builtins.open = self.flash._open
+                    sys.stdout = stdout
+                    os.chdir(cwd)
+        finally:
+            self.wall += time.perf_counter() - start
+
+    def relay_transitions(self, pin=None):
+        """(time in s, fan on) for every change of the relay output (default
+        the relay of the first zone).
+        """
+        if pin is None:
+            pin = getattr(self.fw, "RELAIPIN", 6)
+        return [(t, not v) for t, p, v in machine.Pin.transitions if p == pin]
+
+    def report(self):
+        sim_s = self.clock.us / 1e6
+        callbacks = {}
+        for name, st in self.clock.stats.items():
+            callbacks[name] = {
+                "count": st.count,
+                "mean_us": st.total / st.count * 1e6 if st.count else 0.0,
+                "max_us": st.max * 1e6,
+                "total_s": st.total,
+            }
+        relay = self.relay_transitions()
+        on_time = 0.0
+        last = None
+        for t, on in relay:
+            if last is not None and last[1]:
+                on_time += t - last[0]
+            last = (t, on)
+        if last is not None and last[1]:
+            on_time += sim_s - last[0]
+        logged = self.logged
+        kept = logged
+        if hasattr(self.fw, "log_records"):
+            cwd = os.getcwd()
+            os.chdir(self.workdir)
+            try:
+                kept = len(list(self.fw.log_records()))
+            finally:
+                os.chdir(cwd)
+        idle = dict(self.idle)
+        tasks = {name: dict(t) for name, t in self.tasks.items()}
+        self._collect(idle, tasks)
+        total = idle["awake_us"] + idle["asleep_us"]
+        return {
+            "runtime": getattr(self.fw, "RUNTIME", "timer"),
+            "simulated_s": sim_s,
+            "wall_s": self.wall,
+            "speedup": sim_s / self.wall if self.wall else 0.0,
+            "relay_transitions": len(relay),
+            "relay_events": relay,
+            "zone_relay_transitions": [len(self.relay_transitions(zone[3]))
+                                       for zone in getattr(self.fw, "ZONES", ())],
+            "fan_on_fraction": on_time / sim_s if sim_s else 0.0,
+            "lcd_i2c_transactions": machine.I2C.transactions,
+            "lcd_i2c_bytes": machine.I2C.bytes,
+            "neopixel_writes": neopixel.NeoPixel.writes,
+            "dht_reads": dht.DHT22.reads,
+            "dht_too_fast": dht.DHT22.too_fast,
+            "sensor_errors": sum(s.errors for s in [self.sensor1, self.sensor2] + self.extra),
+            "resets": self.resets,
+            "schedule_failures": self.clock.schedule_failures,
+            "callback_errors": sum(1 for e in self.clock.errors
+                                   if not isinstance(e[2], machine.SimReset)),
+            "flash_write_sessions": self.flash.sessions,
+            "flash_blocks": self.flash.blocks,
+            "flash_bytes": self.flash.bytes,
+            "power_cuts": self.power_cuts,
+            "boot_ms": self.boot_times,
+            "log_entries": logged,
+            "log_entries_lost": max(0, logged - kept),
+            "presses": self.presses,
+            "callbacks": callbacks,
+            "tasks": tasks,
+            "duty": idle["awake_us"] / total if total else None,
+            "sleeps": idle["sleeps"],
+            "wakeups": idle["wakeups"],
+        }
+
+    def close(self):
+        if self._own_workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def print_report(r, out=sys.stdout):
+    days = r["simulated_s"] / 86400
+    out.write(f"Simuliert: {days:.2f} Tage in {r['wall_s']:.1f} s "
+              f"({r['speedup']:.0f}x Echtzeit)\n")
+    out.write(f"Relais: {r['relay_transitions']} Schaltvorgänge, "
+              f"Lüfter {100 * r['fan_on_fraction']:.1f} % an\n")
+    if len(r["zone_relay_transitions"]) > 1:
+        out.write(f"Schaltvorgänge je Zone: "
+                  f"{', '.join(str(n) for n in r['zone_relay_transitions'])}\n")
+    out.write(f"LCD-Bus: {r['lcd_i2c_transactions']} Transaktionen, "
+              f"{r['lcd_i2c_bytes']} Bytes\n")
+    out.write(f"DHT22: {r['dht_reads']} Messungen, {r['sensor_errors']} Fehler, "
+              f"{r['dht_too_fast']} zu schnell\n")
+    out.write(f"Resets: {r['resets']}, Scheduler voll: {r['schedule_failures']}, "
+              f"Exceptions: {r['callback_errors']}\n")
+    out.write(f"Flash: {r['flash_write_sessions']} Schreibvorgänge, {r['flash_blocks']} Blöcke "
+              f"({r['flash_blocks'] / days if days else 0:.0f}/Tag), "
+              f"{r['flash_bytes'] / 1024:.0f} kB\n")
+    if r["boot_ms"]:
+        out.write(f"Start bis zur ersten Schaltentscheidung: {max(r['boot_ms'])} ms "
+                  f"(max. von {len(r['boot_ms'])} Starts)\n")
+    out.write(f"Log: {r['log_entries']} Einträge, {r['log_entries_lost']} verloren "
+              f"bei {r['power_cuts']} Stromausfällen\n")
+    if r["runtime"] != "timer" or r["presses"]:
+        out.write(f"Betriebsart {r['runtime']}, {r['presses']} Tastendrücke\n")
+    if r["duty"] is not None:
+        out.write(f"Sparbetrieb: {100 * r['duty']:.2f} % wach (Wartezeiten ohne Rechenzeit), "
+                  f"{r['sleeps']} Schlafphasen, {r['wakeups']}x geweckt\n")
+    for name, t in r["tasks"].items():
+        out.write(f"  {name:16s} {t['runs']:9d}x  Verzug Max {t['lag_max_ms']:6d} ms  "
+                  f"{t['skipped']} ausgefallen"
+                  + (f", {t['late']} verspätet" if "late" in t else "") + "\n")
+    for name, c in sorted(r["callbacks"].items()):
+        out.write(f"  {name:16s} {c['count']:9d}x  Mittel {c['mean_us']:8.1f} us  "
+                  f"Max {c['max_us']:9.1f} us\n")
+
+
+def simulate(trace, error_rate=0.0, seed=0, quiet=True, filter=None, noise=(0.0, 0.0),
+             power_cut_h=None, runtime=None, press_h=None, rtc_reset=False, zones=1):
+    """Runs a whole trace and returns the report; filter replaces the
+    filter of the firmware (see set_filter()).
+    """
+    after_boot = None
+    if filter:
+        def after_boot(fw):
+            fw.set_filter(filter)
+    sim = Simulation(trace, error_rate, seed, quiet=quiet, after_boot=after_boot, noise=noise,
+                     power_cut_h=power_cut_h, runtime=runtime, press_h=press_h,
+                     rtc_reset=rtc_reset, zones=zones)
+    try:
+        sim.run()
+        return sim.report()
+    finally:
+        sim.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulation der Lüftersteuerung")
+    parser.add_argument("traces", nargs="*", help="Logdateien (taupunkt.csv Format)")
+    parser.add_argument("--synthetic", type=float, metavar="TAGE",
+                        help="Synthetischen Verlauf über TAGE statt Logdateien verwenden")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Anteil fehlerhafter Sensormessungen (OSError)")
+    parser.add_argument("--noise", default="0,0", metavar="T,H",
+                        help="Messrauschen (Standardabweichung) für Temperatur und Feuchte, "
+                             "z. B. 0.3,1.5")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--filter", choices=("none", "median", "ema", "outlier"),
+                        help="Filter der Firmware ersetzen (Standard: FILTER der Firmware)")
+    parser.add_argument("--compare-filter", action="store_true",
+                        help="Zusätzlich ohne Filter laufen lassen und die vermiedenen "
+                             "Schaltvorgänge ausgeben")
+    parser.add_argument("--power-cut", type=float, metavar="STUNDEN",
+                        help="Im Mittel alle STUNDEN den Strom abschalten (Neustart ohne RAM)")
+    parser.add_argument("--runtime", choices=RUNTIMES,
+                        help="Betriebsart statt RUNTIME der Firmware")
+    parser.add_argument("--press", type=float, metavar="STUNDEN",
+                        help="Alle STUNDEN den USR-Taster drücken")
+    parser.add_argument("--rtc-reset", action="store_true",
+                        help="Uhr des Boards bei jedem Start auf den 1.1.2021 setzen")
+    parser.add_argument("--zones", type=int, default=1, metavar="N",
+                        help=f"Firmware mit N Zonen (bis {len(EXTRA_ZONES) + 1}) laufen lassen")
+    parser.add_argument("--json", help="Bericht zusätzlich als JSON speichern")
+    parser.add_argument("--verbose", action="store_true", help="Ausgaben der Firmware zeigen")
+    args = parser.parse_args(argv)
+    if args.synthetic:
+        trace = Trace.synthetic(args.synthetic, seed=args.seed)
+    elif args.traces:
+        trace = Trace.from_csv(*args.traces)
+    else:
+        parser.error("Logdatei oder --synthetic angeben")
+    if len(trace) < 2:
+        parser.error("zu wenige Einträge in der Aufzeichnung")
+    if not 1 <= args.zones <= len(EXTRA_ZONES) + 1:
+        parser.error(f"--zones: 1 bis {len(EXTRA_ZONES) + 1}")
+    noise = tuple(float(x) for x in args.noise.split(","))
+    report = simulate(trace, args.error_rate, args.seed, not args.verbose, args.filter, noise,
+                      args.power_cut, args.runtime, args.press, args.rtc_reset, args.zones)
+    print_report(report)
+    if args.compare_filter:
+        raw = simulate(trace, args.error_rate, args.seed, True, "none", noise,
+                       runtime=args.runtime, zones=args.zones)
+        saved = raw["relay_transitions"] - report["relay_transitions"]
+        report["unfiltered_relay_transitions"] = raw["relay_transitions"]
+        report["switches_prevented"] = saved
+        print(f"Ohne Filter: {raw['relay_transitions']} Schaltvorgänge, "
+              f"durch den Filter vermieden: {saved}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
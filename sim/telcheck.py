@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Prüfung von telemetry.py und mqtt.py gegen den Broker im Prozess.
+
+Telemetry und MQTTClient laufen unverändert auf der virtuellen Uhr
+(vclock) gegen sim/fakebroker.FakeBroker über echte Sockets. Je Zyklus
+werden Messwerte und Schaltvorgänge vorgemerkt, während der Broker
+erreichbar ist, dann fällt er aus (FakeBroker.down()) und es kommen
+weitere dazu, die über die FlashQueue gehen. Am Ende ist der Broker wieder
+da und pump() läuft, bis nichts mehr aussteht. Jede vorgemerkte Zeile muss
+genau einmal beim Broker angekommen sein. Die Zeit für den Broker-Thread
+kommt aus kurzen echten Pausen zwischen den pump()-Aufrufen.
+
+Ausgegeben werden je Phase die Nachrichten beim Broker und der Stand der
+Telemetrie, am Ende fehlende und doppelte Zeilen und die Blöcke aus dem
+Flashbudget; Ende mit Status 1, wenn eine Zeile fehlt oder doppelt ist:
+
+    python3 sim/telcheck.py
+    python3 sim/telcheck.py --cycles 5 --lines 200
+"""
+import argparse
+import os
+import select
+import shutil
+import sys
+import tempfile
+
+SIMDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [SIMDIR, os.path.dirname(SIMDIR)]
+import vclock  # noqa: E402
+from vclock import clock  # noqa: E402
+vclock.install(1661217168)  # ticks_ms() usw. für telemetry und mqtt
+from checkpoint import WriteBudget  # noqa: E402
+from fakebroker import FakeBroker  # noqa: E402
+from mqtt import MQTTClient  # noqa: E402
+from telemetry import Telemetry, FlashQueue  # noqa: E402
+
+STEP_MS = 1000      # Virtuelle Zeit je pump()
+PAUSE_S = 0.002     # Echte Pause je pump() für den Broker-Thread
+DRAIN_STEPS = 3000  # Höchstens so viele pump() bis alles bestätigt ist
+
+
+def pump(tel, steps, until_idle=False):
+    """Calls pump() steps times, or until nothing is outstanding."""
+    for _ in range(steps):
+        tel.pump(flush=until_idle)
+        if until_idle and tel.connected and not (tel.lines or tel.pending or tel.inflight
+                                                 or len(tel.queue)):
+            return True
+        clock.sleep_ms(STEP_MS)
+        select.select([], [], [], PAUSE_S)
+    return False
+
+
+def check(cycles, lines, batch):
+    """Runs the up/down cycles. Returns (sent lines, received lines,
+    telemetry, budget).
+    """
+    broker = FakeBroker()
+    budget = WriteBudget(10**6)
+    tel = Telemetry(MQTTClient("telcheck", broker.host, broker.port), "taupunkt/telcheck",
+                    FlashQueue(budget=budget), batch=batch)
+    sent = []
+    ts = clock.time()
+
+    def note(n):
+        nonlocal ts
+        for i in range(n):
+            ts += 60
+            if i % 7 == 3:
+                tel.event(ts, "Keller", i % 2)
+                sent.append(f"{ts},Keller,E,{i % 2}")
+            else:
+                tel.reading(ts, "Keller", 12.5, 70.0, 8.0, 80.0 + i % 10, 0)
+                sent.append(f"{ts},Keller,12.5,70.0,8.0,{80.0 + i % 10:.1f},0")
+            pump(tel, 1)
+
+    try:
+        for k in range(cycles):
+            broker.up()
+            note(lines)
+            pump(tel, DRAIN_STEPS, until_idle=True)
+            print(f"Zyklus {k + 1} verbunden: {len(broker.messages):4d} Nachrichten, {tel}")
+            broker.down()
+            note(lines)
+            print(f"Zyklus {k + 1} getrennt:   {len(broker.messages):4d} Nachrichten, {tel}")
+        broker.up()
+        drained = pump(tel, DRAIN_STEPS, until_idle=True)
+        print(f"Wieder verbunden:   {len(broker.messages):4d} Nachrichten, {tel}"
+              + ("" if drained else " (nicht alles bestätigt)"))
+        got = b"".join(payload for _, payload in broker.messages).decode().splitlines()
+        return sent, got, tel, budget
+    finally:
+        tel.client.close()
+        broker.close()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("--cycles", type=int, default=3, help="Ausfälle des Brokers (Standard 3)")
+    p.add_argument("--lines", type=int, default=100,
+                   help="Zeilen je Phase (Standard 100)")
+    p.add_argument("--batch", type=int, default=5, help="Zeilen je Nachricht (Standard 5)")
+    args = p.parse_args(argv)
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="telcheck_")
+    os.chdir(workdir)   # Für die FlashQueue
+    try:
+        sent, got, tel, budget = check(args.cycles, args.lines, args.batch)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    counts = {}
+    for line in got:
+        counts[line] = counts.get(line, 0) + 1
+    lost = [line for line in sent if line not in counts]
+    dups = sum(n - 1 for n in counts.values())
+    alien = sum(1 for line in counts if line not in set(sent))
+    print(f"{len(sent)} Zeilen vorgemerkt, {len(got)} angekommen: {len(lost)} fehlen, "
+          f"{dups} doppelt, {alien} unbekannt; {budget.used} Blöcke aus dem Flashbudget")
+    for line in lost[:3]:
+        print("  fehlt:", line)
+    return 1 if lost or dups or alien else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
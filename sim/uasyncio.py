@@ -0,0 +1,113 @@
+"""Ersatz für das MicroPython-Modul uasyncio in der Simulation.
+
+Nur was aiotasks und die Firmware brauchen: create_task(), run(),
+sleep_ms(), sleep() und Event, auf der virtuellen Uhr. run() legt den
+Haupttask nur an und kehrt sofort zurück, sonst käme der Import der
+Firmware (RUNTIME = "asyncio") nie zurück. Die Simulation treibt die
+Tasks danach mit run_until() voran, dazwischen laufen wie bei
+clock.run_until() die Timer und geplanten Funktionen. Eine Exception
+beendet den Task und landet wie bei geplanten Funktionen in clock.errors.
+"""
+import heapq
+from vclock import clock
+
+_ready = []     # Heap (Zeit in us, Nummer, Task) der laufbereiten Tasks
+_seq = 0        # Gleiche Zeit: in der Reihenfolge des Einreihens
+
+
+class Task:
+    def __init__(self, coro):
+        self.coro = coro
+
+
+class _Sleep:
+    def __init__(self, until):
+        self.until = until
+
+    def __await__(self):
+        yield self
+
+
+class _Wait:
+    def __init__(self, event):
+        self.event = event
+
+    def __await__(self):
+        yield self
+
+
+def _push(task, us):
+    global _seq
+    _seq += 1
+    heapq.heappush(_ready, (us, _seq, task))
+
+
+def create_task(coro):
+    task = Task(coro)
+    _push(task, clock.us)
+    return task
+
+
+def run(coro):
+    """Drops the tasks of a previous run and starts coro as main task.
+    Returns at once, see run_until().
+    """
+    _ready.clear()
+    return create_task(coro)
+
+
+def sleep_ms(ms):
+    return _Sleep(clock.us + int(ms * 1000))
+
+
+def sleep(s):
+    return _Sleep(clock.us + int(s * 1000000))
+
+
+class Event:
+    def __init__(self):
+        self.state = False
+        self.waiting = []
+
+    def is_set(self):
+        return self.state
+
+    def set(self):
+        self.state = True
+        for task in self.waiting:
+            _push(task, clock.us)
+        self.waiting = []
+
+    def clear(self):
+        self.state = False
+
+    async def wait(self):
+        if not self.state:
+            await _Wait(self)
+        return True
+
+
+def _step(task):
+    try:
+        req = task.coro.send(None)
+    except StopIteration:
+        return
+    except Exception as e:
+        clock.errors.append((clock.time(), task.coro.__qualname__, e))
+        if clock.on_error is None:
+            raise
+        clock.on_error(e)
+        return
+    if isinstance(req, _Wait):
+        req.event.waiting.append(task)
+    else:
+        _push(task, req.until)
+
+
+def run_until(us):
+    """Runs the tasks due until the virtual time us, then advances to us."""
+    while _ready and _ready[0][0] <= us:
+        due, _, task = heapq.heappop(_ready)
+        clock.run_until(due)
+        _step(task)
+    clock.run_until(us)
@@ -0,0 +1,192 @@
+"""Virtuelle Uhr für die Simulation unter CPython.
+
+Die Uhr ersetzt die MicroPython-Funktionen des Moduls time (sleep_ms,
+ticks_ms, ...) und treibt die Timer der Ersatzmodule an. Die Zeit läuft
+nur weiter, wenn die Simulation es verlangt (run_until) oder die Firmware
+schläft; so lassen sich Monate in Sekunden durchspielen.
+
+Timer-Callbacks laufen wie auf dem Board "im Interrupt", mit
+micropython.schedule() eingereihte Funktionen danach außerhalb. Die
+Warteschlange ist wie bei MicroPython auf SCHEDULE_DEPTH Einträge begrenzt.
+"""
+import calendar
+import gc
+import time
+
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+SCHEDULE_DEPTH = 8
+
+_gmtime = time.gmtime
+
+
+class CallbackStats:
+    """Count, total and maximum CPU time (host seconds) of a callback."""
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, dt):
+        self.count += 1
+        self.total += dt
+        if dt > self.max:
+            self.max = dt
+
+
+class VirtualClock:
+    def __init__(self, epoch=0):
+        self.epoch = epoch     # Unix-Zeit beim Start der Simulation
+        self.start = epoch     # Bleibt, auch wenn set_rtc() epoch ändert
+        self.us = 0            # Simulierte Mikrosekunden seit dem Start
+        self.timers = []
+        self.queue = []
+        self.schedule_failures = 0
+        self.stats = {}        # Name -> CallbackStats der geplanten Funktionen
+        self.errors = []       # (Zeit, Name, Exception) aus geplanten Funktionen
+        self.on_error = None   # Optional: Funktion(exc), die Exceptions behandelt
+        self._running = False
+
+    # Zeitfunktionen im Stil von MicroPython
+    def time(self):
+        return self.epoch + self.us // 1000000
+
+    def realtime(self):
+        """Unix time of the simulated world, unaffected by set_rtc()."""
+        return self.start + self.us // 1000000
+
+    def set_rtc(self, t):
+        """Sets the clock of the board (time()) to t, like a RTC without
+        battery after a power cut.
+        """
+        self.epoch = t - self.us // 1000000
+
+    def ticks_us(self):
+        return self.us & TICKS_MAX
+
+    def ticks_ms(self):
+        return (self.us // 1000) & TICKS_MAX
+
+    # Während des Schlafens laufen Timer weiter; geplante Funktionen nur,
+    # wenn nicht gerade selbst eine geplante Funktion schläft.
+    def sleep_us(self, us):
+        self._advance(self.us + int(us), True)
+
+    def sleep_ms(self, ms):
+        self._advance(self.us + int(ms * 1000), True)
+
+    def sleep(self, s):
+        self._advance(self.us + int(s * 1000000), True)
+
+    # Timer und Scheduler
+    def add_timer(self, timer):
+        if timer not in self.timers:
+            self.timers.append(timer)
+
+    def remove_timer(self, timer):
+        if timer in self.timers:
+            self.timers.remove(timer)
+
+    def next_deadline(self):
+        """Virtual time (us) at which the next timer fires, or None."""
+        if not self.timers:
+            return None
+        return min(t.due for t in self.timers)
+
+    def schedule(self, fn, arg):
+        if len(self.queue) >= SCHEDULE_DEPTH:
+            self.schedule_failures += 1
+            raise RuntimeError("schedule queue full")
+        self.queue.append((fn, arg))
+
+    def run_scheduled(self):
+        """Runs the queued functions like MicroPython does after an IRQ."""
+        if self._running:
+            return  # Geplante Funktionen laufen nie verschachtelt
+        self._running = True
+        try:
+            while self.queue:
+                fn, arg = self.queue.pop(0)
+                name = getattr(fn, "__name__", repr(fn))
+                stats = self.stats.get(name)
+                if stats is None:
+                    stats = self.stats[name] = CallbackStats()
+                start = time.perf_counter()
+                try:
+                    fn(arg)
+                except Exception as e:
+                    self.errors.append((self.time(), name, e))
+                    if self.on_error is None:
+                        raise
+                    self.on_error(e)
+                finally:
+                    stats.add(time.perf_counter() - start)
+        finally:
+            self._running = False
+
+    def run_until(self, us):
+        """Advances the simulation to us, running timers and callbacks."""
+        self._advance(us, True)
+
+    def _advance(self, target, run_queue):
+        while True:
+            due = self.next_deadline()
+            if due is None or due > target:
+                break
+            if due > self.us:
+                self.us = due
+            for timer in [t for t in self.timers if t.due <= self.us]:
+                timer.fire()
+            if run_queue:
+                self.run_scheduled()
+        if target > self.us:
+            self.us = target
+        if run_queue:
+            self.run_scheduled()
+
+
+clock = VirtualClock()
+
+
+def _mktime(tm):
+    """time.mktime() accepting the 8-tuples used by MicroPython."""
+    return calendar.timegm(tuple(tm[:6]) + (0, 0, 0))
+
+
+def _localtime(secs=None):
+    if secs is None:
+        secs = clock.time()
+    return _gmtime(secs)
+
+
+def install(epoch=0):
+    """Resets the virtual clock to epoch and patches the modules time and
+    gc with the MicroPython specific functions.
+    """
+    clock.__init__(epoch)
+    time.time = clock.time
+    time.ticks_us = clock.ticks_us
+    time.ticks_ms = clock.ticks_ms
+    time.ticks_cpu = clock.ticks_us
+    time.ticks_diff = ticks_diff
+    time.ticks_add = ticks_add
+    time.sleep_us = clock.sleep_us
+    time.sleep_ms = clock.sleep_ms
+    time.sleep = clock.sleep
+    time.mktime = _mktime
+    time.localtime = _localtime
+    time.gmtime = _localtime
+    if not hasattr(gc, "mem_free"):
+        gc.mem_free = lambda: 200000
+        gc.mem_alloc = lambda: 64000
+    return clock
+
+
+def ticks_diff(a, b):
+    return ((a - b + TICKS_PERIOD // 2) & TICKS_MAX) - TICKS_PERIOD // 2
+
+
+def ticks_add(a, delta):
+    return (a + delta) & TICKS_MAX
@@ -1,8 +1,6 @@
-import micropython, dht, math, time, os, io, machine
-from machine import Pin, I2C, Timer, reset
-from time import sleep_ms
-from machine_i2c_lcd import I2cLcd
-from led import Singleton, RGB_led, Led
+import time
+BOOT_TICKS = time.ticks_ms() # Beginn des Starts, siehe boot_ms
+from machine import Pin
 
 # Define constants
 RELAIPIN = 6 # Anschluss des Lüfter-Relais
@@ -11,8 +9,11 @@ DHTPIN_1 = 2  # Datenleitung für den DHT-Sensor 1 (innen)
 DHTPIN_2 = 10 # Datenleitung für den DHT-Sensor 2 (außen)
 
 
-# USR Button
+# USR Button: schaltet die Beleuchtung des LCD ein (und weckt im Betrieb
+# "lowpower"), bei eingeschalteter Beleuchtung blättert er durch die Statistik
 USR_PIN = 13
+# Die Beleuchtung geht BACKLIGHT_MS nach dem letzten Tastendruck aus, 0: immer an
+BACKLIGHT_MS = 2*60*1000
 
 # *******  Korrekturwerte der einzelnen Sensorwerte  *******
 Korrektur_t_1 = -2 # Korrekturwert Innensensor Temperatur
@@ -21,232 +22,1020 @@ Korrektur_h_1 =  0 # Korrekturwert Innensensor Luftfeuchtigkeit
 Korrektur_h_2 = -1 # Korrekturwert Außensensor Luftfeuchtigkeit
 #***********************************************************
 
+# Sensoren: Datenpin -> (Name, Korrektur Temperatur, Korrektur Feuchte)
+SENSORS = {
+    DHTPIN_1: ("Sensor 1", Korrektur_t_1, Korrektur_h_1),
+    DHTPIN_2: ("Sensor 2", Korrektur_t_2, Korrektur_h_2),
+}
+# Lüftungszonen (bis zu 8): Name, Pin Innensensor, Pin Außensensor,
+# Relais-Pin und ein dict mit abweichenden Schwellen der Zone, z. B.
+# {"hysterese": 2.0, "temp1_min": 8.0}. Mehrere Zonen dürfen denselben
+# Außensensor verwenden, er wird dann nur einmal gemessen.
+ZONES = (
+    ("Keller", DHTPIN_1, DHTPIN_2, RELAIPIN, {}),
+)
+# Jeder Sensor wird alle MEASURE_MS gemessen, die Messungen der Sensoren
+# sind gleichmäßig über diese Zeit verteilt (siehe zones.ReadScheduler)
+MEASURE_MS = 3000
+# Ist die Taupunktdifferenz weit vom Schaltpunkt entfernt und ändert sich
+# kaum, wird seltener gemessen, höchstens alle MEASURE_MAX_MS (unter
+# SENSOR_STALE_MS bleiben). Nahe am Schaltpunkt wieder alle MEASURE_MS.
+# 0 schaltet das ab
+MEASURE_MAX_MS = 60*1000
+# Bei mehreren Zonen zeigt das LCD jede Zone PAGE_TICKS Anzeigetakte lang,
+# im ersten Takt ihren Namen und den Zustand des Lüfters
+PAGE_TICKS = 3
+
+# Nach einem Messfehler wird der letzte gute Wert höchstens SENSOR_STALE_MS
+# lang weiter verwendet, danach wird der Lüfter ausgeschaltet. Wiederholt
+# wird erst bei einer späteren Messung, höchstens sensors.MAX_RETRIES mal
+# mit wachsender Pause, danach nur noch jede Minute (siehe sensors.py)
+SENSOR_STALE_MS = 2*60*1000
+
+# Filter vor der Schaltentscheidung: "none", "median", "ema" oder "outlier"
+FILTER = "median"
+FILTER_LEN = 5    # Fenster für Median und Ausreißererkennung (Messungen)
+
+# Standardwerte der Schwellen aller Zonen
 SCHALTmin = 0.2   # minimaler Taupunktunterschied, bei dem das Relais schaltet
 HYSTERESE = 3.0   # Abstand von Ein- und Ausschaltpunkt
 TEMP1_min = 10.0  # Minimale Innentemperatur, bei der die Lüftung aktiviert wird
 TEMP2_min = -10.0 # Minimale Außentemperatur, bei der die Lüftung aktiviert wird
 
-# Logfile (Einträge alle 5 min, einmal pro Tag geschrieben)
-# Date,t1,h1,t2,h2,fan
-# 23.08.2022 01:12:48,22.3,40.5,7.6,39.3,1
+# Log (Einträge alle 10 min im Verzeichnis "log", weitere Zonen in "log1",
+# "log2", ...). In den Logspeicher wird immer ein ganzes Segment (ca. 4 kB,
+# gut 2 Tage) auf einmal geschrieben, bis dahin sichert CHECKPOINT_FILE
+# jeden neuen Eintrag, der nach einem Stromausfall beim Start
+# wiederhergestellt wird. Verloren gehen so höchstens die Einträge seit der
+# letzten Sicherung (10 min), solange FLASH_BLOCKS_PER_DAY reicht.
+CHECKPOINT_FILE = "ckpt.dat"
+FLASH_BLOCKS_PER_DAY = 300 # Blockschreibvorgänge (4 kB) für Log und Sicherung
+# export_csv() erzeugt daraus die Datei EXPORTFILENAME im bisherigen Format:
+# Date,t1,h1,tp1,t2,h2,tp2,fan
+# 23.08.2022 01:12:48,22.30,40.50,8.32,7.60,39.30,-5.43,True
+EXPORTFILENAME = "export.csv"
+# Logdatei älterer Versionen: wird beim Start einmal in den Logspeicher
+# der ersten Zone übernommen und danach in LOGFILENAME + ".old" umbenannt
 LOGFILENAME = "taupunkt.csv"
+# export_log() schreibt das Log in Blöcken von EXPORT_CHUNK Bytes mit CRC
+# auf die Konsole, abholen mit python3 tools/logrecv.py /dev/ttyACM0
+EXPORT_CHUNK = 2048
+
+# Rollende Statistik (siehe history.py): Minimum, Mittel und Maximum je
+# Sensor, Laufzeit und Schaltvorgänge je Lüfter. Je Fenster: Anzeige,
+# Abschnittslänge in s, Zahl der Abschnitte, Datei. Gesichert wird etwa
+# alle HISTORY_SAVE_S. Die Statistikseiten auf dem LCD gehen nach
+# HISTORY_PAGE_MS ohne Tastendruck zurück zu den Messwerten
+HISTORY = (("24h", 60*60, 24, "hist24h.dat"),
+           ("7d", 6*60*60, 28, "hist7d.dat"))
+HISTORY_SAVE_S = 60*60
+HISTORY_PAGE_MS = 30*1000
+
+# Schnellstart: die Relais sofort wie vor dem Neustart schalten (RELAYFILE),
+# die Anlaufzeit der Sensoren (SENSOR_WARMUP_MS, nur nach dem Einschalten)
+# mit dem Initialisieren des LCD überbrücken. Logspeicher, Statistik und
+# Telemetrie werden immer erst nach der ersten Schaltentscheidung geladen.
+# Die Zeit bis dahin steht in boot_ms (gemessen mit bench/bench_boot.py).
+# FAST_BOOT = False: Start wie bisher mit Meldungen auf dem LCD
+FAST_BOOT = True
+RELAYFILE = "relay.dat"
+SENSOR_WARMUP_MS = 2000
+
+# Betriebsart: "timer" (Hardware-Timer und micropython.schedule),
+# "asyncio" (kooperative uasyncio-Tasks, siehe run_tasks()) oder
+# "lowpower" (schläft zwischen den Aufgaben mit machine.lightsleep(), siehe
+# run_lowpower(); die USB-Konsole ist dann nicht zuverlässig erreichbar)
+RUNTIME = "timer"
+
+# Laufzeitmessung der Callbacks (siehe instrument.py). Ist sie eingeschaltet,
+# wird bei jedem Logeintrag eine Zeile an STATSFILENAME angehängt.
+# Im laufenden Betrieb auch mit enable_stats() einschaltbar.
+INSTRUMENT = False
+STATSFILENAME = "stats.csv"
+
+# Telemetrie über MQTT (siehe telemetry.py): alle TELEMETRY_MS werden die
+# Messwerte aller Zonen vorgemerkt, Schaltvorgänge sofort. Gesendet wird
+# gebündelt, spätestens nach telemetry.MAX_AGE_MS. Ohne Verbindung landen
+# die Nachrichten begrenzt im Flash, soweit FLASH_BLOCKS_PER_DAY reicht.
+# Gewartet wird dabei nie, weder auf den Verbindungsaufbau noch auf das
+# PUBACK (siehe mqtt.py), die Messung läuft auch ohne Broker ungestört.
+# MQTT_SERVER = None schaltet die Telemetrie ab. Ein Name statt der
+# IP-Adresse blockiert bei der DNS-Anfrage. Ohne WLAN_SSID wird eine
+# schon bestehende Netzwerkverbindung verwendet.
+MQTT_SERVER = None      # IP-Adresse des Brokers, z. B. "192.168.1.10"
+MQTT_PORT = 1883
+MQTT_TOPIC = "taupunkt"
+MQTT_CLIENT_ID = "taupunktluefter"
+WLAN_SSID = None
+WLAN_PASSWORD = ""
+TELEMETRY_MS = 60*1000
+
+# Ausgabe der Messwerte auf der Konsole durch display(): höchstens alle
+# CONSOLE_MS und bei jedem Schalten eines Relais, 0 schaltet sie ab
+CONSOLE_MS = 60*1000
 
 # Spezielle Zeichen
 ue = 245
 grad = 223
 
-# Globale Variablen
-h1 = 0.0 # Innenluftfeuchtigkeit
-t1 = 0.0 # Innentemperatur
-t2 = 0.0 # Außentemperatur
-h2 = 0.0 # Außenluftfeuchtigkeit
+# Relais zuerst
+# ======================================
+# Noch vor den übrigen Modulen, damit die Lüfter nach einem Neustart ohne
+# Pause weiterlaufen. Braucht nur Pin und RELAYFILE, die Zeit bis hierher
+# steht in relay_ms
+def restore_relays():
+    """
+    Zustand der Relais aus RELAYFILE, ein Byte je Zone (leer: alle aus)
+    """
+    if not FAST_BOOT:
+        return b""
+    try:
+        with open(RELAYFILE, "rb") as f:
+            return f.read()
+    except OSError:
+        return b""
+
+relay_state = restore_relays()
+relays = []
+for i, zone_def in enumerate(ZONES):
+    on = i < len(relay_state) and relay_state[i] == 1
+    relays.append(Pin(zone_def[3], Pin.OUT, value=0 if on else 1)) # Low aktiv
+relay_ms = time.ticks_diff(time.ticks_ms(), BOOT_TICKS)
+
+# Was bis zur ersten Schaltentscheidung gebraucht wird. Logspeicher,
+# Sicherung und Statistik werden erst danach geladen (siehe Setup)
+import micropython, dht, machine, gc
+from machine import I2C, Timer
+from time import sleep_ms
+from machine_i2c_lcd import I2cLcd
+from led import Singleton, RGB_led, Led, effects
+from sensors import Sensor
+from filters import make_filter
+import instrument
+from lcdformat import SensorLine, lcd_bytes
+from zones import Channel, Zone, ReadScheduler, DHT_MIN_MS
+from power import Backlight
+
+# Anzeigezeilen, werden von display() an Ort und Stelle beschrieben
+line1 = SensorLine()
+line2 = SensorLine()
+frame = [line1.buf, line2.buf]
+console_last = None # ticks_ms() der letzten Konsolenausgabe
+page = 0            # Zone, die das LCD gerade zeigt
+page_tick = 0       # Anzeigetakt innerhalb der Seite
+fans_on = 0         # Anzahl laufender Lüfter
+history_page = 0    # Statistikseite auf dem LCD, 0: Messwerte
+history_next = False # USR-Taster: nächste Statistikseite
+history_since = 0   # ticks_ms() des letzten Blätterns
+history_saved = 0   # now() der letzten Sicherung der Statistik
+flushing = None     # flush_steps(), solange ein Segment in Stücken geschrieben wird
+flush_continue = None # Plant das nächste Stück ein, je nach RUNTIME
 
-logbuffer = io.StringIO()
+micropython.alloc_emergency_exception_buf(100) # Fehlermeldungen aus den Timer-Callbacks
 
 # Helper functions
 # ======================================
-def taupunkt(t, r):
-    if (t >= 0):
-        a = 7.5
-        b = 237.3
-    elif (t < 0):
-        a = 7.6
-        b = 240.7
-    else:
-        a = b = 0
-  
-    # Sättigungsdampfdruck in hPa
-    sdd = 6.1078 * 10**((a*t)/(b+t))
-  
-    # Dampfdruck in hPa
-    dd = sdd * (r/100)
-  
-    # v-Parameter
-    v = math.log10(dd/6.1078)
-  
-    # Taupunkttemperatur (°C)
-    tt = (b*v) / (a-v)
-    return tt
-
-def pt(t = None):
-    """
-    Format a time integer in human readable form (pt for Pretty format Time)
-    """
-    if t == None:
-        t = time.time()
-        if t > 1913677968 : # Hot fix for emulator
-            t = time.mktime((2022, 8, 23, 1, 12, 48, 0, 0))
-    y, mm, d, h, m, s = time.localtime(t)[0:6]
-    return f"{d:02d}.{mm:02d}.{y} {h:02d}:{m:02d}:{s:02d}"
-
-def print_log(name=LOGFILENAME):
-    with open(name,"rt") as f:
-        for line in f:
-            print(line)
+def print_sensors():
+    """
+    Zustand und Fehlerzähler der Sensoren ausgeben
+    """
+    for ch in channels:
+        print(ch.sensor)
+
+def print_zones():
+    """
+    Messwerte und Lüfter aller Zonen ausgeben
+    """
+    for zone in zones:
+        print_zone(zone)
+
+def print_zone(zone):
+    prefix = f"{zone.name}: " if len(zones) > 1 else ""
+    s = zone.snapshot
+    print(f"{prefix}S1: {s.t1:.2f}°C|{s.h1:.2f}%|{s.tp1:.2f}°C | "
+          f"S2: {s.t2:.2f}°C|{s.h2:.2f}%|{s.tp2:.2f}°C | "
+          f"DeltaTP {s.tp1 - s.tp2:.2f} | {s.fan}")
+
+def log_records(t0=None, t1=None, zone=0):
+    """
+    Logeinträge der Zone zwischen t0 und t1, gespeicherte und die im Buffer
+    """
+    for rec in logstores[zone].query(t0, t1):
+        yield rec
+    for rec in logbuffers[zone].records():
+        if (t0 is None or rec[0] >= t0) and (t1 is None or rec[0] <= t1):
+            yield rec
+
+def print_log(t0=None, t1=None, zone=0, name=None):
+    """
+    Gib die Logeinträge der Zone zwischen t0 und t1 (time.time() Werte) als CSV aus.
+    Wie in älteren Versionen geht auch print_log(name): gibt die Datei name aus
+    (z. B. EXPORTFILENAME), LOGFILENAME nach der Übernahme aus dem Logspeicher
+    """
+    if isinstance(t0, str):
+        name, t0 = t0, None
+    if name is not None and (name != LOGFILENAME or exists(name)):
+        with open(name) as f:
+            for line in f:
+                print(line, end="")
+        return
+    print(CSV_HEADER, end="")
+    for rec in log_records(t0, t1, zone):
+        print(csvline(rec), end="")
+
+def export_log(offset=0, since=None, zone=0, compress=False, chunk=EXPORT_CHUNK):
+    """
+    Logeinträge der Zone als CSV in Blöcken mit CRC auf die Konsole
+    schreiben (siehe export.py), für den Empfänger tools/logrecv.py. offset
+    setzt einen abgebrochenen Export fort, since ("23.08.2022 01:12:48" oder
+    time.time() Wert) liefert nur die neueren Einträge
+    """
+    import export
+    if isinstance(since, str):
+        since = parse_time(since)
+    def pieces():
+        yield CSV_HEADER
+        for rec in log_records(None if since is None else since + 1, None, zone):
+            yield csvline(rec)
+    return export.send(pieces(), offset, chunk, compress)
+
+def export_csv(name=EXPORTFILENAME, t0=None, t1=None, zone=0):
+    """
+    Schreibe die Logeinträge der Zone zwischen t0 und t1 im alten CSV-Format
+    nach name. Eine noch nicht übernommene LOGFILENAME wird nicht überschrieben
+    """
+    if name == LOGFILENAME and exists(LOGFILENAME):
+        raise OSError(f"{LOGFILENAME} ist noch nicht übernommen (migrate_log())")
+    n = 0
+    with open(name, "wt") as f:
+        f.write(CSV_HEADER)
+        for rec in log_records(t0, t1, zone):
+            f.write(csvline(rec))
+            n += 1
+    return n
+
+def print_history():
+    """
+    Statistik aller Fenster ausgeben: je Sensor Minimum, Mittel und Maximum,
+    je Zone Laufzeit des Lüfters und Schaltvorgänge
+    """
+    ts = now()
+    for h, (label, _, _, _) in zip(history, HISTORY):
+        for i, ch in enumerate(channels):
+            s = h.summary(i, ts)
+            if s is None:
+                print(f"{label} {ch.name}: keine Daten")
+                continue
+            print(f"{label} {ch.name}: {s[0]:.1f}/{s[1]:.1f}/{s[2]:.1f}°C "
+                  f"{s[3]:.1f}/{s[4]:.1f}/{s[5]:.1f}% (min/mittel/max)")
+        for i, zone in enumerate(zones):
+            on, n = h.fan_summary(i, ts)
+            print(f"{label} {zone.name}: Lüfter {on / 3600:.1f} h, {n} Schaltvorgänge")
+
+def flash_bytes():
+    return sum(store.bytes_written for store in logstores) + checkpoint.bytes_written
+
+def print_stats():
+    """
+    Laufzeiten der Callbacks, freien Speicher und die Zähler ausgeben
+    """
+    instrument.report()
+    print(f"Start bis zur ersten Schaltentscheidung {boot_ms} ms")
+    print(f"mem_free {gc.mem_free()} B, schedule Fehler {schedule_failures()}, "
+          f"I2C {lcd.i2c_transfers} Übertragungen {lcd.i2c_bytes} B, "
+          f"Flash {flash_bytes()} B")
+    print(budget)
+    print(reader)
+    for zone in zones:
+        print(zone.timing())
+    if telemetry:
+        print(telemetry)
+    if idle:
+        print(idle)
+        for job in idle.jobs:
+            print(job)
+
+def enable_stats(on=True):
+    """
+    Laufzeitmessung im laufenden Betrieb ein- oder ausschalten
+    """
+    instrument.ENABLED = on
+    if alarm:
+        alarm.wrap()
+
+def schedule_failures():
+    return alarm.schedule_failures if alarm else 0
+
+def log_stats():
+    """
+    Hänge eine Zeile mit den Messwerten an STATSFILENAME an, wenn das
+    Flashbudget es erlaubt
+    """
+    if not budget.take(1):
+        return
+    with open(STATSFILENAME, "at") as f:
+        f.write(f"{pt()},{gc.mem_free()},{schedule_failures()},{lcd.i2c_bytes},"
+                f"{flash_bytes()},{instrument.line()}\n")
 
 # Hauptklasse
 class Alarm_timer(Singleton):
     def __init__(self):
-        self.measure_ref = measure
-        self.display_ref = display
-        self.logdta_ref = logdta
+        self.schedule_failures = 0 # Volle schedule-Warteschlange
+        self.wrap()
         self.timer1 = Timer(period=2000, mode=Timer.PERIODIC, callback=self._cb1) # Anzeige: Alle 2s
-        self.timer2 = Timer(period=3000, mode=Timer.PERIODIC, callback=self._cb2) # Messung: Alle 3s
+        self.timer2 = Timer(period=reader.tick_ms, mode=Timer.PERIODIC, callback=self._cb2) # Messung: ein Sensor je Takt
         self.timer3 = Timer(period=10*60*1000, mode=Timer.PERIODIC, callback=self._cb3) # Loggen: Alle 10min
+        self.timer4 = None
+        if telemetry:
+            self.timer4 = Timer(period=TELEMETRY_MS, mode=Timer.PERIODIC, callback=self._cb4) # Telemetrie
     def stop(self):
         self.timer1.deinit()
         self.timer2.deinit()
         self.timer3.deinit()
+        if self.timer4:
+            self.timer4.deinit()
+    def wrap(self):
+        # Referenzen einmal anlegen, damit die ISR nichts allozieren muss
+        self.measure_ref = instrument.wrap("measure", measure)
+        self.display_ref = instrument.wrap("display", display)
+        self.logdta_ref = instrument.wrap("logdta", logdta)
+        self.telemetry_ref = instrument.wrap("send_telemetry", send_telemetry)
+        self.flush_ref = instrument.wrap("flush", self._flush)
 
     # These call backs are interrupt driven, hence complicated functions are not allowed
     # We use micropython.schedule to start the "real" worker
     # We war not allowed to allocate memory in the ISR See
     # https://docs.micropython.org/en/latest/reference/isr_rules.html#isr-rulese
     def _cb1(self, tim):
-        micropython.schedule(self.display_ref, tim)
+        try:
+            micropython.schedule(self.display_ref, tim)
+        except RuntimeError: # Warteschlange voll
+            self.schedule_failures += 1
     def _cb2(self, tim):
-        micropython.schedule(self.measure_ref, tim)
+        try:
+            micropython.schedule(self.measure_ref, tim)
+        except RuntimeError:
+            self.schedule_failures += 1
     def _cb3(self, tim):
-        micropython.schedule(self.logdta_ref, tim)
+        try:
+            micropython.schedule(self.logdta_ref, tim)
+        except RuntimeError:
+            self.schedule_failures += 1
+    def _cb4(self, tim):
+        try:
+            micropython.schedule(self.telemetry_ref, tim)
+        except RuntimeError:
+            self.schedule_failures += 1
 
-def measure(args=None):
-    global h1, t1, h2, t2
+    # Das Log in Stücken schreiben: jedes Stück reiht das nächste hinter den
+    # schon wartenden Callbacks ein
+    def schedule_flush(self):
+        try:
+            micropython.schedule(self.flush_ref, None)
+        except RuntimeError:
+            self.schedule_failures += 1
+            while flush_next(): # Dann eben in einem Zug
+                pass
+    def _flush(self, args=None):
+        if flush_next():
+            self.schedule_flush()
+
+def first_measure():
+    """
+    Alle Sensoren einmal lesen und die Relais aller Zonen setzen. Ohne
+    FAST_BOOT wird das Ergebnis paarweise je 1 s angezeigt, mit FAST_BOOT
+    ein fehlgeschlagener Sensor nach DHT_MIN_MS noch einmal gelesen, bevor
+    die wiederhergestellten Relais ohne Messwerte ausgeschaltet werden
+    """
+    global fans_on
     led.blink()
-    fehler = False
-    msg0 = ""
-    msg1 = ""
-    try:
-        dht1.measure()                           # Sensoren lesen
-        h1 = dht1.humidity()+Korrektur_h_1       # Innenluftfeuchtigkeit auslesen und unter „h1“ speichern
-        t1 = dht1.temperature()+ Korrektur_t_1   # Innentemperatur auslesen und unter „t1“ speichern
-    except OSError as e:
-        fehler = True
-    if (fehler == True or h1 > 100 or h1 < 1 or t1 < -40 or t1 > 80 ):
-        msg0="Fehler Sensor 1"
-    elif (firstrun):
-        msg0="Sensor 1 ok"
-    try:
-        dht2.measure()                           # Sensoren lesen
-        h2 = dht2.humidity()+Korrektur_h_2       # Außenluftfeuchtigkeit auslesen und unter „h2“ speichern
-        t2 = dht2.temperature()+ Korrektur_t_2   # Außentemperatur auslesen und unter „t2“ speichern
-    except OSError as e:
-        fehler = True
-    if (fehler == True or h2 > 100 or h2 < 1 or t2 < -40 or t2 > 80 ):
-        msg1="Fehler Sensor 2"
-    elif (firstrun):
-        msg1="Sensor 2 ok"
-    if msg0 or msg1:
-        lcd.clear()
-        lcd.move_to(0,0)
-        lcd.putstr(msg0)
-        lcd.move_to(0,1)
-        lcd.putstr(msg1)
-        sleep_ms(1000)  # Zeit um das Display zu lesen
-    if (fehler == True):
-        Relais.on() # "High": Lüfter "aus", da bei "low" Lüfter "an"
+    for ch in channels:
+        ch.update()
+    if FAST_BOOT:
+        if not all(ch.fresh(SENSOR_STALE_MS) for ch in channels):
+            sleep_ms(DHT_MIN_MS)
+            for ch in channels:
+                if not ch.fresh(SENSOR_STALE_MS):
+                    ch.update()
+    else:
+        msgs = [ch.name + " ok" if ch.fresh(SENSOR_STALE_MS) else "Fehler " + ch.name
+                for ch in channels]
+        for i in range(0, len(msgs), 2):
+            show_message(msgs[i], msgs[i + 1] if i + 1 < len(msgs) else "")
+            sleep_ms(1000)  # Zeit um das Display zu lesen
         lcd.clear()
-        lcd.move_to(0,0)
-        lcd.putstr("Reset ...")
-        sleep_ms(1000)
-        reset()
-        
-def display(args=None):
-    # **** Taupunkte errechnen********
-    Taupunkt_1 = taupunkt(t1, h1)
-    Taupunkt_2 = taupunkt(t2, h2)
+    fans_on = 0
+    for zone in zones:
+        zone.control(SENSOR_STALE_MS)
+        fans_on += zone.rel
+        print_zone(zone)
+    rgb_led.set(RGB_led.red if fans_on else RGB_led.green)
 
-    # Werteausgabe auf dem I2C-Display
+def save_relays():
     """
-    Grad Angaben auf ein Grad genau (3 Stellen, da Minusgrade)
-    Luftfeuctigkeit auf 1% genau (99% maximal ???)
-    Taupunkt auf 0,1 Grad ?
-    0123456789ABCDEF
-    xxx°C|xx%|xx,x°C
-    xxx°C|xx%|xx,x°C
-    """
-    global rel
-    _t1 = round(t1) # Convert to integer
-    _h1 = round(h1) # Convert to integer
-    _t2 = round(t2) # Convert to integer
-    _h2 = round(h2) # Convert to integer
+    Zustand der Relais nach RELAYFILE schreiben, wenn er sich geändert hat
+    """
+    global relay_state
+    if not FAST_BOOT:
+        return
+    state = bytes(1 if zone.rel else 0 for zone in zones)
+    if state == relay_state:
+        return
+    with open(RELAYFILE, "wb") as f:
+        f.write(state)
+    budget.take(1, force=True)
+    relay_state = state
+
+def warmup():
+    """
+    Auf die Sensoren warten: ohne FAST_BOOT immer 2 s, sonst nur nach dem
+    Einschalten und nur den Rest von SENSOR_WARMUP_MS seit dem Start
+    """
+    if not FAST_BOOT:
+        sleep_ms(2000)
+    elif machine.reset_cause() == machine.PWRON_RESET:
+        wait = SENSOR_WARMUP_MS - time.ticks_diff(time.ticks_ms(), BOOT_TICKS)
+        if wait > 0:
+            sleep_ms(wait)
+
+def set_filter(kind=FILTER, n=FILTER_LEN):
+    """
+    Filter für Temperatur und Feuchte aller Sensoren neu anlegen (siehe filters.make_filter)
+    """
+    for ch in channels:
+        ch.filter_t = make_filter(kind, n, max_dev=2.0)
+        ch.filter_h = make_filter(kind, n, max_dev=5.0)
+
+def show_message(msg0, msg1=""):
     lcd.clear()
     lcd.move_to(0,0)
-    out1 = f"{_t1:3.0f}{chr(grad)}C|{_h1:2.0f}%|{Taupunkt_1:4.1f}{chr(grad)}C"
-    out2 = f"{_t2:3.0f}{chr(grad)}C|{_h2:2.0f}%|{Taupunkt_2:4.1f}{chr(grad)}C"
-    lcd.putstr(out1)
+    lcd.putstr(msg0)
     lcd.move_to(0,1)
-    lcd.putstr(out2)
-    DeltaTP = Taupunkt_1 - Taupunkt_2
-    # Genaue Ausgabe auf Konsole
-    if (DeltaTP > (SCHALTmin + HYSTERESE)):
-        rel = True
-    if (DeltaTP < (SCHALTmin)):
-        rel = False
-    if (t1 < TEMP1_min ):
-        rel = False
-    if (t2 < TEMP2_min ):
-        rel = False
-    if (rel == True):
-        Relais.off() # Relais einschalten
-        rgb_led.set(RGB_led.red)
+    lcd.putstr(msg1)
+
+def measure(args=None):
+    """
+    Einen Sensor messen (reihum) und nur die Zonen neu bewerten, die ihn
+    verwenden. Fehler zeigt display() an, der Lüfter bleibt dann aus.
+    True, wenn ein Sensor gemessen wurde
+    """
+    ch = reader.step()
+    if ch: # Adaptiv fallen Takte ohne fälligen Sensor aus
+        control(ch) # Vor allem anderen, siehe zone.latency_us
+        led.blink()
+    return ch is not None
+
+def control(ch):
+    """
+    Schaltentscheidung der Zonen, die den Kanal ch verwenden, sofort nach
+    der Messung. Zuerst werden alle Relais geschaltet, erst danach folgt
+    was länger dauern kann (Konsole, Telemetrie, RELAYFILE, Statistik),
+    alles aus zone.snapshot
+    """
+    global fans_on
+    switched = False
+    for zone in ch.zones:
+        switched |= zone.control(SENSOR_STALE_MS)
+    if switched:
+        ts = now()
+        for zone in ch.zones:
+            s = zone.snapshot
+            if not s.switched:
+                continue
+            fans_on += 1 if s.fan else -1
+            i = zones.index(zone)
+            for h in history:
+                h.switch(i, s.fan, ts)
+            if telemetry:
+                telemetry.event(ts, zone.name, s.fan)
+            if CONSOLE_MS:
+                print_zone(zone)
+        rgb_led.set(RGB_led.red if fans_on else RGB_led.green)
+        save_relays()
+    if ch.good and history:
+        # Die Werte der eben getroffenen Entscheidung, nicht die des Kanals
+        ts = now()
+        i = channels.index(ch)
+        zone = ch.zones[0]
+        s = zone.snapshot
+        t, hum = (s.t1, s.h1) if zone.inner is ch else (s.t2, s.h2)
+        for h in history:
+            h.sample(i, t, hum, ts)
+
+def display(args=None, lcd_out=True):
+    # Werteausgabe auf dem I2C-Display
+    """
+    Grad Angaben auf ein Grad genau (3 Stellen, da Minusgrade)
+    Luftfeuctigkeit auf 1% genau (99% maximal)
+    Taupunkt auf 0,1 Grad, unter -9.9 Grad auf 1 Grad
+    0123456789ABCDEF
+    xxx°C|xx%|xx.x°C
+    xxx°C|xx%|xx.x°C
+    Die Zeilen sind vorab angelegt (lcdformat.SensorLine), hier werden nur
+    Ziffern geschrieben, damit display() keinen Speicher anfordert.
+    Bei mehreren Zonen wird nur die Zone der aktuellen Seite gezeigt, die
+    Dauer hängt also nicht von der Zahl der Zonen ab. Nach einem Druck auf
+    den USR-Taster zeigt das LCD statt dessen die Statistikseiten
+    """
+    global page, page_tick, console_last, history_page, history_next, history_since
+    zone = zones[page]
+    backlight.poll()
+    if history_next:
+        history_next = False
+        history_since = time.ticks_ms()
+        history_page += 1
+        if history_page > len(history) * (len(channels) + len(zones)):
+            history_page = 0
+    elif history_page and time.ticks_diff(time.ticks_ms(), history_since) >= HISTORY_PAGE_MS:
+        history_page = 0
+    # Ohne Beleuchtung ist das LCD kaum lesbar, dann nichts übertragen
+    if lcd_out and backlight.on: # Nicht während eine Meldung angezeigt wird
+        s = zone.snapshot # Stand der letzten Schaltentscheidung
+        if history_page:
+            frame[0], frame[1] = history_lines(history_page - 1)
+        elif page_tick == 0 and len(zones) > 1:
+            frame[0] = titles[page]
+            frame[1] = FAN_ON if s.fan else FAN_OFF
+        else:
+            if s.ok1:
+                frame[0] = line1.set(round(s.t1), round(s.h1), s.tp1_tenths)
+            else:
+                frame[0] = zone.inner.err
+            if s.ok2:
+                frame[1] = line2.set(round(s.t2), round(s.h2), s.tp2_tenths)
+            else:
+                frame[1] = zone.outer.err
+        lcd.render_frame(frame) # Nur geänderte Zeichen übertragen
+    page_tick += 1
+    if page_tick >= PAGE_TICKS:
+        page_tick = 0
+        page = (page + 1) % len(zones)
+    # Genaue Ausgabe auf der Konsole, selten, weil sie Speicher braucht
+    if CONSOLE_MS:
+        now_ms = time.ticks_ms()
+        if console_last is None or time.ticks_diff(now_ms, console_last) >= CONSOLE_MS:
+            console_last = now_ms
+            print_zones()
+
+def history_lines(k):
+    """
+    Die beiden Zeilen der Statistikseite k: je Fenster zuerst die Sensoren
+    (Temperatur und Feuchte, Minimum, Mittel, Maximum), dann die Lüfter
+    """
+    per = len(channels) + len(zones)
+    h = history[k // per]
+    label = HISTORY[k // per][0]
+    k %= per
+    ts = now()
+    if k < len(channels):
+        s = h.summary(k, ts)
+        if s is None:
+            return lcd_bytes(f"{label:3} {channels[k].name}"), b"keine Daten"
+        return (lcd_bytes(f"{label:3}T{s[0]:4.0f}{s[1]:4.0f}{s[2]:4.0f}"),
+                lcd_bytes(f"S{k + 1:<2}H{s[3]:4.0f}{s[4]:4.0f}{s[5]:4.0f}"))
+    k -= len(channels)
+    on, n = h.fan_summary(k, ts)
+    return (lcd_bytes(f"{label:3} {zones[k].name}"[:16]),
+            FAN + lcd_bytes(f"fter{on / 3600:5.1f}h{min(n, 999):3d}x"))
+
+def save_history(force=False):
+    """
+    Statistik nach HISTORY sichern, höchstens alle HISTORY_SAVE_S und wenn
+    das Flashbudget es erlaubt
+    """
+    global history_saved
+    ts = now()
+    if not history or (not force and ts - history_saved < HISTORY_SAVE_S):
+        return
+    if not budget.take(len(history), force=force):
+        return
+    for h, (_, _, _, name) in zip(history, HISTORY):
+        h.save(name)
+    history_saved = ts
+
+def load_history():
+    """
+    Statistik anlegen und die Sicherung aus HISTORY laden
+    """
+    global history_saved
+    for label, bucket_s, nbuckets, name in HISTORY:
+        h = Rolling(len(channels), len(zones), bucket_s, nbuckets)
+        if h.load(name):
+            print(f"Statistik {label} aus {name} geladen")
+        ts = now()
+        for i, zone in enumerate(zones):
+            h.fan(i, zone.snapshot.fan, ts)
+        history.append(h)
+    history_saved = now()
+
+def logdta(args=None, store=False):
+    """
+    Logge Werte in Buffer und Sicherung, volle Segmente in den Logspeicher.
+    Mit store=True wird der ganze Buffer gespeichert
+    """
+    log_append()
+    if instrument.ENABLED:
+        log_stats()
+    if store:
+        flush_log(LOGBUFFER)
     else:
-        Relais.on() # Relais ausschalten
-        rgb_led.set(RGB_led.green)
-    out  = f"S1: {t1:.2f}°C|{h1:.2f}%|{Taupunkt_1:.2f}°C | " + \
-           f"S2: {t2:.2f}°C|{h2:.2f}%|{Taupunkt_2:.2f}°C | " + \
-           f"DeltaTP {DeltaTP:.2f} | {not Relais.value()}"
-    print(out)
-
-
-def logdta(args=None,fname=LOGFILENAME, store=False):
-    """
-    Logge Werte in Buffer und einmal pro Tag in Datei fname
-    """
-    global logbuffer
-    MAXLINES = 144
-    dta = f"{pt()},{t1:.2f},{h1:.2f},{taupunkt(t1,h1):.2f},{t2:.2f},{h2:.2f},{taupunkt(t2,h2):.2f},{not Relais.value()}\n"
-    print(dta)
-    logbuffer.write(dta)
-    if store or logbuffer.getvalue().count("\n") > MAXLINES:
-        with open(LOGFILENAME,"a") as f:
-            state = machine.disable_irq() # Sicher stellen, dass logbuffer unverändert bleibt
-            logbuffer.flush()
-            log = logbuffer.getvalue() # Lese gesamten Puffer
-            logbuffer = io.StringIO() # Puffer löschen
-            machine.enable_irq(state)
-            print("Logbuffer gelöscht")
-            f.write(log)
+        start_flush()
+    checkpoint_log()
+    save_history()
 
-# Setup
-# Logfile vorbereiten
-try:
-    with open(LOGFILENAME,"rt") as f:
+def log_append():
+    ts = now()
+    for i, (zone, buf) in enumerate(zip(zones, logbuffers)):
+        s = zone.snapshot
+        if len(buf) == buf.capacity and saved[i]:
+            del saved[i][0] # append() überschreibt den ältesten Eintrag
+        buf.append(ts, s.t1, s.h1, s.t2, s.h2, s.fan)
+        for h in history: # Laufzeit des Lüfters bis jetzt
+            h.fan(i, s.fan, ts)
+        if len(zones) > 1:
+            print(zone.name, end=": ")
+        print(csvline(buf.get(-1), s.tp1, s.tp2), end="") # Taupunkte aus der Schaltentscheidung
+
+def flush_steps(n=None, only=None):
+    """
+    Schreibe die ältesten n Einträge der Buffer in den Logspeicher. Ohne n
+    nur dann, wenn sie das aktuelle Segment genau füllen. Die Segmentdatei
+    bleibt offen und bekommt die Einträge in Stücken von LOGCHUNK, nach
+    jedem Stück gibt der Generator die Kontrolle ab (yield). Index und
+    Buffer werden erst geändert, wenn das Segment geschrieben ist; der Index
+    merkt sich die Folgenummer des letzten gesicherten Eintrags darin
+    """
+    for i in (range(len(zones)) if only is None else only): # only: Nummern der Zonen
+        buf = logbuffers[i]
+        store = logstores[i]
+        if n is None:
+            k = store.space()
+            if len(buf) < k:
+                continue
+        else:
+            k = min(n, len(buf))
+        if k == 0:
+            continue
+        j = 0
+        try:
+            while j < k:
+                m = min(LOGCHUNK, k - j)
+                store.write(buf.records(m, j))
+                j += m
+                yield
+            if saved[i]:
+                store.slot = saved[i][min(k, len(saved[i])) - 1]
+        finally:
+            store.sync()
+        budget.take((k * RECSIZE + BLOCK - 1) // BLOCK + 1, force=True) # Segment und Index
+        state = machine.disable_irq() # Sicher stellen, dass der Buffer unverändert bleibt
+        buf.discard(k) # Puffer löschen
+        del saved[i][:k]
+        machine.enable_irq(state)
+        print(f"{k} Logeinträge gespeichert")
+        if buf.dropped:
+            print(f"Logbuffer übergelaufen, {buf.dropped} Einträge verloren")
+            buf.dropped = 0
+
+def flush_log(n=None, only=None):
+    """
+    Wie flush_steps(), aber in einem Zug
+    """
+    while flush_next(): # Laufendes Schreiben erst beenden
+        pass
+    for _ in flush_steps(n, only):
+        pass
+
+def flush_next(args=None):
+    """
+    Das nächste Stück des laufenden Schreibens. True, solange noch etwas fehlt
+    """
+    global flushing
+    if flushing is None:
+        return False
+    try:
+        next(flushing)
+        return True
+    except StopIteration:
+        flushing = None
+        return False
+
+def start_flush():
+    """
+    Volle Segmente schreiben, das erste Stück sofort, die übrigen plant
+    flush_continue ein. Ohne flush_continue in einem Zug
+    """
+    global flushing
+    while flush_next():
         pass
-except OSError:
-    # Datei existiert nicht, erzeuge und schreibe Header
-    with open(LOGFILENAME,"wt") as f:
-        f.write("Date,t1,h1,tp1,t2,h2,tp2,fan\n")
+    flushing = flush_steps()
+    if flush_next():
+        if flush_continue:
+            flush_continue()
+        else:
+            while flush_next():
+                pass
 
+def checkpoint_log():
+    """
+    Die noch nicht gesicherten Einträge aller Zonen in CHECKPOINT_FILE
+    schreiben, wenn das Flashbudget es erlaubt, sonst beim nächsten Mal
+    """
+    n = 0
+    for i, buf in enumerate(logbuffers):
+        n += len(buf) - len(saved[i])
+    if n == 0 or not budget.take(checkpoint.blocks(n)):
+        return
+    items = []
+    seq = checkpoint.seq
+    for i, buf in enumerate(logbuffers):
+        for j in range(len(saved[i]), len(buf)):
+            items.append((i, buf.raw(j)))
+            saved[i].append(seq)
+            seq += 1
+    checkpoint.save(items)
+
+def exists(name):
+    import os
+    try:
+        os.stat(name)
+        return True
+    except OSError:
+        return False
+
+def migrate_log():
+    """
+    Logdatei LOGFILENAME älterer Versionen in den Logspeicher der ersten
+    Zone übernehmen, danach umbenennen. Bricht das ab (Flash voll,
+    Stromausfall), geht es beim nächsten Start hinter dem letzten
+    übernommenen Eintrag weiter
+    """
+    import os
+    if not exists(LOGFILENAME):
+        return
+    store = logstores[0]
+    written = store.bytes_written
+    try:
+        with open(LOGFILENAME) as f:
+            n = store.import_csv(f)
+    except OSError as e:
+        print(f"Übernahme von {LOGFILENAME} abgebrochen: {e}")
+        return
+    finally:
+        budget.take((store.bytes_written - written + BLOCK - 1) // BLOCK, force=True)
+    os.rename(LOGFILENAME, LOGFILENAME + ".old")
+    print(f"{n} Einträge aus {LOGFILENAME} übernommen, alte Datei: {LOGFILENAME}.old")
+
+def recover_log():
+    """
+    Einträge aus CHECKPOINT_FILE, die noch nicht im Logspeicher sind,
+    zurück in die Buffer holen. Maßgeblich ist die Folgenummer der Slots,
+    nicht die Zeit
+    """
+    found = checkpoint.recover([store.slot for store in logstores],
+                               [store.last_ts() for store in logstores])
+    n = 0
+    for i, recs in enumerate(found):
+        for seq, rec in recs[-LOGBUFFER:]:
+            logbuffers[i].append(*rec)
+            saved[i].append(seq)
+        n += min(len(recs), LOGBUFFER)
+    if n:
+        print(f"{n} Logeinträge aus {CHECKPOINT_FILE} wiederhergestellt")
+
+def send_telemetry(args=None):
+    """
+    Messwerte aller Zonen vormerken und senden, was in die Zeit passt
+    """
+    ts = now()
+    for zone in zones:
+        s = zone.snapshot
+        telemetry.reading(ts, zone.name, s.t1, s.h1, s.t2, s.h2, s.fan)
+    telemetry.pump()
+
+def start_telemetry():
+    wlan = None
+    if WLAN_SSID:
+        import network
+        wlan = network.WLAN(network.STA_IF)
+        wlan.active(True)
+        wlan.connect(WLAN_SSID, WLAN_PASSWORD) # Wartet nicht, pump() prüft die Verbindung
+    from mqtt import MQTTClient
+    from telemetry import Telemetry, FlashQueue
+    client = MQTTClient(MQTT_CLIENT_ID, MQTT_SERVER, MQTT_PORT)
+    return Telemetry(client, MQTT_TOPIC + "/" + MQTT_CLIENT_ID, FlashQueue(budget=budget),
+                     wlan=wlan)
+
+# uasyncio Betrieb (RUNTIME = "asyncio")
+# ======================================
+# Jede Aufgabe ist ein eigener Task, gewartet wird nur mit await.
+async def measure_task():
+    measure()
+
+async def display_task():
+    display()
+
+async def telemetry_task():
+    send_telemetry()
+
+async def log_task():
+    logdta()
+    aiotasks.report(task_stats)
+
+async def flush_task():
+    # Volle Segmente in Stücken schreiben, dazwischen kommen die anderen Tasks dran
+    while flush_next():
+        await aiotasks.sleep_ms(0)
+
+def flush_asyncio():
+    aiotasks.asyncio.create_task(flush_task())
+
+async def led_task():
+    # Spielt die LED-Effekte ab, ohne Effekte wartet der Task auf led_event
+    while True:
+        await led_event.wait()
+        led_event.clear()
+        while True:
+            wait = effects.tick()
+            if wait is None:
+                break
+            await aiotasks.sleep_ms(wait)
+
+def run_tasks():
+    """
+    Startet die Tasks und läuft bis zur Unterbrechung, danach mit
+    aiotasks.report(task_stats) die Statistik ausgeben
+    """
+    global led_event, task_stats, flush_continue
+    asyncio = aiotasks.asyncio
+    flush_continue = flush_asyncio
+    led_event = asyncio.Event()
+    effects.use_timer = False
+    effects.on_start = led_event.set
+    task_stats = [aiotasks.TaskStats("Anzeige", 2000, 50),
+                  aiotasks.TaskStats("Messung", reader.tick_ms, 100),
+                  aiotasks.TaskStats("Loggen", 10*60*1000, 200)]
+    if telemetry:
+        task_stats.append(aiotasks.TaskStats("Telemetrie", TELEMETRY_MS, 300))
+    async def main():
+        asyncio.create_task(aiotasks.periodic(task_stats[0], display_task))
+        asyncio.create_task(aiotasks.periodic(task_stats[1], measure_task))
+        asyncio.create_task(aiotasks.periodic(task_stats[2], log_task))
+        if telemetry:
+            asyncio.create_task(aiotasks.periodic(task_stats[3], telemetry_task))
+        await led_task()
+    asyncio.run(main())
+
+# Sparbetrieb (RUNTIME = "lowpower")
+# ======================================
+def measure_lowpower(args=None):
+    # measure(), geschlafen wird bis zur nächsten fälligen Messung
+    measure()
+    return reader.next_ms()
+
+def led_lowpower(args=None):
+    # Nächsten Schritt der LED-Effekte, ohne Effekte weckt erst led_start()
+    wait = effects.tick()
+    return 60*60*1000 if wait is None else wait
+
+def led_start():
+    led_job.due = time.ticks_ms()
+
+def flush_lowpower(args=None):
+    # Nächstes Stück des Logs, ohne laufendes Schreiben weckt erst flush_wake()
+    return 0 if flush_next() else 60*60*1000
+
+def flush_wake():
+    flush_job.due = time.ticks_ms()
+
+def display_lowpower(args=None):
+    # Ohne Beleuchtung nur noch für die Konsolenausgabe aufwachen, der
+    # Taster weckt ohnehin
+    display()
+    return 2000 if backlight.on else (CONSOLE_MS or 60*1000)
+
+def usr_pressed(pin):
+    # Interrupt des USR-Tasters, nur Flags setzen. Ist die Beleuchtung schon
+    # an, blättert display() zur nächsten Statistikseite
+    global history_next
+    if backlight.on:
+        history_next = True
+    backlight.press(pin)
+    if idle:
+        idle.wake(pin)
+
+def run_lowpower():
+    """
+    Die Aufgaben aus einer Schleife aufrufen und dazwischen mit
+    machine.lightsleep() bis zur nächsten Fälligkeit schlafen (siehe
+    power.Tickless). Der USR-Taster weckt und zeigt sofort die Werte an
+    """
+    global idle, led_job, flush_job, flush_continue
+    from power import Tickless, Job
+    jobs = [Job("Anzeige", 2000, instrument.wrap("display", display_lowpower)),
+            Job("Messung", reader.tick_ms, instrument.wrap("measure", measure_lowpower)),
+            Job("Loggen", 10*60*1000, instrument.wrap("logdta", logdta))]
+    if telemetry:
+        jobs.append(Job("Telemetrie", TELEMETRY_MS, instrument.wrap("send_telemetry", send_telemetry)))
+    flush_job = Job("Schreiben", 60*60*1000, instrument.wrap("flush", flush_lowpower))
+    jobs.append(flush_job)
+    flush_continue = flush_wake
+    # Zuletzt, damit ein eben gestarteter Effekt noch im selben Durchlauf beginnt
+    led_job = Job("LED", 60*60*1000, led_lowpower)
+    jobs.append(led_job)
+    effects.use_timer = False
+    effects.on_start = led_start
+    idle = Tickless(jobs, on_wake=display)
+    idle.run()
+
+# Setup
+# ======================================
+instrument.ENABLED = INSTRUMENT
+alarm = None
+idle = None
+telemetry = None # Wird erst nach der ersten Schaltentscheidung gestartet
+boot_ms = None
+history = [] # Statistik je Fenster aus HISTORY, siehe load_history()
+budget = None # Erst nach der ersten Schaltentscheidung
+
+# Sensoren und Zonen anlegen, jeder Sensor nur einmal, auch wenn ihn
+# mehrere Zonen verwenden
+channels = []
+by_pin = {}
+def channel(pin):
+    ch = by_pin.get(pin)
+    if ch is None:
+        name, korr_t, korr_h = SENSORS[pin]
+        sensor = Sensor(dht.DHT22(Pin(pin)), korr_t, korr_h, name) # Wiederholung, Cache, Fehlerzähler
+        ch = by_pin[pin] = Channel(sensor, None, None)
+        channels.append(ch)
+    return ch
+zones = []
+for (name, pin_in, pin_out, relay_pin, opts), relay in zip(ZONES, relays):
+    kw = {"schalt_min": SCHALTmin, "hysterese": HYSTERESE,
+          "temp1_min": TEMP1_min, "temp2_min": TEMP2_min}
+    kw.update(opts)
+    zones.append(Zone(name, channel(pin_in), channel(pin_out), relay,
+                      rel=not relay.value(), **kw))
+set_filter()
+reader = ReadScheduler(channels, MEASURE_MS, min(MEASURE_MAX_MS, SENSOR_STALE_MS // 2))
+
+# Vorbereitete Zeilen der Seitenwechsel
+titles = [lcd_bytes(f"{i + 1}: {zone.name}"[:16]) for i, zone in enumerate(zones)]
+FAN = bytes((ord("L"), ue))
+FAN_ON = FAN + b"fter an"
+FAN_OFF = FAN + b"fter aus"
 
-dht1 = dht.DHT22(Pin(DHTPIN_1))   # Der Innensensor wird ab jetzt mit dht1 angesprochen
-dht2 = dht.DHT22(Pin(DHTPIN_2))   # Der Außensensor wird ab jetzt mit dht2 angesprochen
-Relais = Pin(RELAIPIN,Pin.OUT)
-Relais.on() # Relais ausschalten
-rel = False # Relais ist aus
 rgb_led = RGB_led()
 led = Led()
 # Initialisierung I2C
 i2c = I2C(0, sda=Pin(20), scl=Pin(21), freq=100000)
 # Initialisierung LCD über I2C
 lcd = I2cLcd(i2c, 0x27, 2, 16) # LCD: I2C-Addresse und Displaygröße setzen
-lcd.backlight_on()                      
+lcd.backlight_on()
+backlight = Backlight(lcd, BACKLIGHT_MS)
+usr = Pin(USR_PIN, Pin.IN, Pin.PULL_UP)
+usr.irq(handler=usr_pressed, trigger=Pin.IRQ_FALLING)
 lcd.move_to(0,0)
 lcd.putstr("Teste Sensoren..")
-sleep_ms(2000)                    # Time for sensor setup
-lcd.clear()
-firstrun = True
-fehler = measure()
+warmup()                          # Time for sensor setup
+first_measure()
 display()
-firstrun=False
+boot_ms = time.ticks_diff(time.ticks_ms(), BOOT_TICKS)
+
+# Ab hier nach der ersten Schaltentscheidung: Flashbudget, Logspeicher
+# (legt die Verzeichnisse beim ersten Start an), Sicherung, Statistik
+from logring import LogRing, RECSIZE
+from logstore import LogStore, LOGDIR, SEGRECORDS, CSV_HEADER, now, pt, csvline, parse_time
+from checkpoint import Checkpoint, WriteBudget, BLOCK
+from history import Rolling
+budget = WriteBudget(FLASH_BLOCKS_PER_DAY)
+save_relays()
+# Logpuffer im RAM je Zone: ein Segment des Logspeichers, der Rest ist
+# Reserve falls das Schreiben scheitert
+LOGBUFFER = SEGRECORDS + 32
+LOGCHUNK = 16 # Einträge pro Schreibvorgang, dazwischen kommen Messung und Anzeige dran
+logbuffers = [LogRing(LOGBUFFER) for zone in zones]
+logstores = [LogStore(LOGDIR if i == 0 else f"{LOGDIR}{i}") for i in range(len(zones))]
+logbuffer = logbuffers[0]
+# Folgenummern der Slots (checkpoint.py) der Einträge je Buffer, die schon
+# in der Sicherung stehen
+saved = [[] for zone in zones]
+checkpoint = Checkpoint(CHECKPOINT_FILE, len(zones) * (LOGBUFFER + 1))
+migrate_log()
+recover_log()
+load_history()
+if MQTT_SERVER:
+    telemetry = start_telemetry()
+ready_ms = time.ticks_diff(time.ticks_ms(), BOOT_TICKS)
+print(f"Start: Relais nach {relay_ms} ms, erste Schaltentscheidung nach {boot_ms} ms, "
+      f"fertig nach {ready_ms} ms")
 
-alarm = Alarm_timer()
\ No newline at end of file
+if RUNTIME == "asyncio":
+    import aiotasks
+    run_tasks()
+elif RUNTIME == "lowpower":
+    run_lowpower()
+else:
+    alarm = Alarm_timer()
+    flush_continue = alarm.schedule_flush
@@ -0,0 +1,247 @@
+"""Telemetrie: Messwerte und Schaltvorgänge gebündelt per MQTT senden.
+
+reading() und event() hängen nur eine kurze Textzeile an den aktuellen
+Stapel im RAM an, sie machen weder Netzwerk- noch Flashzugriffe und können
+daher aus dem Mess- und Regelpfad aufgerufen werden:
+
+    <Zeit>,<Zone>,<t1>,<h1>,<t2>,<h2>,<Lüfter 0/1>     Messwerte
+    <Zeit>,<Zone>,E,<Lüfter 0/1>                       Schaltvorgang
+
+Ein voller Stapel (batch Zeilen) oder einer, dessen erste Zeile älter als
+max_age_ms ist, wird zu einer Nachricht. pump() wird periodisch
+aufgerufen und wartet nie auf das Netz (siehe mqtt.py): ein Aufruf
+beginnt den Verbindungsaufbau (nach Fehlern mit wachsender Pause), die
+folgenden führen ihn weiter. Steht die Verbindung, übernimmt pump() die
+eingetroffenen PUBACKs und gibt neue Nachrichten mit QoS 1 an den Client,
+zuerst die aus der Warteschlange im Flash, danach die im RAM, bis WINDOW
+Nachrichten auf ihr PUBACK warten oder budget_ms verbraucht ist. Erst mit
+dem PUBACK wird eine Nachricht gelöscht; kommt es nicht innerhalb von
+ack_ms, gilt die Verbindung als unterbrochen und die unbestätigten
+Nachrichten werden später noch einmal gesendet. Ist die Verbindung
+unterbrochen, wandern die Nachrichten aus dem RAM in die FlashQueue. Diese
+ist auf max_msgs Nachrichten begrenzt, bei Überlauf wird die älteste
+verworfen. Jede Nachricht im Flash ist eine Datei und kostet einen Block
+aus dem Flashbudget (checkpoint.WriteBudget); reicht es nicht, bleiben bis
+zu MAX_PENDING Nachrichten im RAM, weitere werden verworfen.
+"""
+import os
+from time import ticks_ms, ticks_diff, ticks_add
+
+BATCH = 20              # Zeilen pro Nachricht
+MAX_AGE_MS = 10*60*1000 # Längste Wartezeit einer Zeile bis zum Senden
+MAX_PENDING = 4         # Nachrichten im RAM, weitere gehen in den Flash
+QUEUE_DIR = "tq"
+QUEUE_MSGS = 200        # Nachrichten im Flash
+BUDGET_MS = 200         # Sendezeit pro pump()
+WINDOW = 4              # Nachrichten, die gleichzeitig auf ihr PUBACK warten
+ACK_MS = 30000          # Längste Wartezeit auf ein PUBACK
+RETRY_MS = 10000
+MAX_RETRY_MS = 10*60*1000
+
+
+class FlashQueue:
+    """Bounded FIFO of messages, one file per message."""
+
+    def __init__(self, path=QUEUE_DIR, max_msgs=QUEUE_MSGS, budget=None):
+        self.path = path
+        self.max_msgs = max_msgs
+        self.budget = budget    # checkpoint.WriteBudget oder None
+        self.dropped = 0
+        try:
+            os.mkdir(path)
+        except OSError:
+            pass # existiert schon
+        self.seqs = sorted(int(n[:-4]) for n in os.listdir(path) if n.endswith(".msg"))
+        self.next = self.seqs[-1] + 1 if self.seqs else 0
+
+    def _name(self, seq):
+        return f"{self.path}/{seq:05d}.msg"
+
+    def __len__(self):
+        return len(self.seqs)
+
+    def put(self, msg):
+        """Appends msg. Returns False (and writes nothing) if the budget
+        does not allow another block now.
+        """
+        if self.budget is not None and not self.budget.take(1):
+            return False
+        with open(self._name(self.next), "wb") as f:
+            f.write(msg)
+        self.seqs.append(self.next)
+        self.next += 1
+        while len(self.seqs) > self.max_msgs:
+            self.pop()
+            self.dropped += 1
+        return True
+
+    def after(self, seq):
+        """The oldest message newer than seq, None if there is none."""
+        for s in self.seqs:
+            if s > seq:
+                return s
+        return None
+
+    def read(self, seq):
+        with open(self._name(seq), "rb") as f:
+            return f.read()
+
+    def remove(self, seq):
+        if seq in self.seqs:
+            self.seqs.remove(seq)
+            os.remove(self._name(seq))
+
+    def pop(self):
+        self.remove(self.seqs[0])
+
+
+class Telemetry:
+    def __init__(self, client, topic, queue, batch=BATCH, max_age_ms=MAX_AGE_MS,
+                 budget_ms=BUDGET_MS, retry_ms=RETRY_MS, max_retry_ms=MAX_RETRY_MS,
+                 ack_ms=ACK_MS, wlan=None):
+        self.client = client    # mqtt.MQTTClient
+        self.topic = topic
+        self.queue = queue
+        self.batch = batch
+        self.max_age_ms = max_age_ms
+        self.budget_ms = budget_ms
+        self.retry_ms = retry_ms
+        self.max_retry_ms = max_retry_ms
+        self.ack_ms = ack_ms
+        self.wlan = wlan        # network.WLAN oder None
+        self.lines = []
+        self.started = 0        # ticks_ms() der ersten Zeile des Stapels
+        self.pending = []       # Fertige Nachrichten im RAM
+        self.inflight = []      # (Paketnummer, Nummer im Flash oder None, Nachricht, ticks_ms())
+        self.sent_seq = -1      # Letzte an den Client gegebene Nachricht aus dem Flash
+        self.connected = False
+        self.connecting = False
+        self.next_try = None
+        self.failures = 0       # Fehlversuche in Folge
+        self.published = 0
+        self.errors = 0
+        self.dropped = 0        # Verworfen, weil das Flashbudget nicht reichte
+
+    def reading(self, ts, zone, t1, h1, t2, h2, fan):
+        self._add(f"{ts},{zone},{t1:.1f},{h1:.1f},{t2:.1f},{h2:.1f},{int(fan)}\n")
+
+    def event(self, ts, zone, fan):
+        self._add(f"{ts},{zone},E,{int(fan)}\n")
+
+    def _add(self, line):
+        if not self.lines:
+            self.started = ticks_ms()
+        self.lines.append(line)
+        if len(self.lines) >= self.batch:
+            self.seal()
+
+    def seal(self):
+        """Turns the current batch into a message."""
+        if self.lines:
+            self.pending.append("".join(self.lines).encode())
+            self.lines = []
+        while len(self.pending) > MAX_PENDING:
+            if not self.queue.put(self.pending.pop(0)):
+                self.dropped += 1
+
+    def _link_up(self, now):
+        """Starts connecting without waiting when it is time to. Returns
+        True while the connection is up or being set up.
+        """
+        if not (self.connected or self.connecting):
+            if self.next_try is not None and ticks_diff(self.next_try, now) > 0:
+                return False
+            if self.wlan is not None and not self.wlan.isconnected():
+                self._failed(now)
+                return False
+            try:
+                self.client.connect()
+            except OSError:
+                self._failed(now)
+                return False
+            self.connecting = True
+        return True
+
+    def _failed(self, now):
+        self.errors += 1
+        self.failures += 1
+        retry = self.retry_ms << min(self.failures - 1, 16)
+        if retry > self.max_retry_ms:
+            retry = self.max_retry_ms
+        self.next_try = ticks_add(now, retry)
+
+    def _drop_link(self):
+        self.connected = self.connecting = False
+        self.client.close()
+        # Unbestätigte Nachrichten aus dem RAM wieder vorn einreihen, die aus
+        # dem Flash liegen dort noch
+        self.pending[:0] = [f[2] for f in self.inflight if f[1] is None]
+        self.inflight = []
+        self.sent_seq = -1
+        self._failed(ticks_ms())
+
+    def _acked(self, pid):
+        for k, f in enumerate(self.inflight):
+            if f[0] == pid:
+                del self.inflight[k]
+                if f[1] is not None:
+                    self.queue.remove(f[1])
+                return 1
+        return 0
+
+    def pump(self, flush=False):
+        """Advances the connection, takes the PUBACKs that have arrived and
+        hands new messages to the client; never waits for the network.
+        With flush=True the current batch is sent even if not full.
+        Returns the number of messages confirmed by the broker.
+        """
+        if flush or (self.lines and
+                     ticks_diff(ticks_ms(), self.started) >= self.max_age_ms):
+            self.seal()
+        sent = 0
+        now = ticks_ms()
+        if (self.queue or self.pending or self.inflight or self.connecting) and \
+                self._link_up(now):
+            try:
+                for pid in self.client.poll():
+                    sent += self._acked(pid)
+                if self.connecting and self.client.isconnected():
+                    self.connecting = False
+                    self.connected = True
+                    self.failures = 0
+                    self.next_try = None
+                if self.inflight and ticks_diff(now, self.inflight[0][3]) > self.ack_ms:
+                    raise OSError("PUBACK fehlt")
+                while self.connected and len(self.inflight) < WINDOW and \
+                        ticks_diff(ticks_ms(), now) < self.budget_ms:
+                    seq = self.queue.after(self.sent_seq)
+                    if seq is not None:
+                        msg = self.queue.read(seq)
+                    elif self.pending:
+                        msg = self.pending[0]
+                    else:
+                        break
+                    pid = self.client.publish(self.topic, msg, qos=1)
+                    if seq is None:
+                        self.pending.pop(0)
+                        self.inflight.append((pid, None, msg, ticks_ms()))
+                    else:
+                        self.sent_seq = seq
+                        self.inflight.append((pid, seq, None, ticks_ms()))
+            except OSError:
+                self._drop_link()
+        if not (self.connected or self.connecting):
+            # Offline: nichts im RAM behalten, was ein Neustart verlieren
+            # würde, soweit das Flashbudget reicht
+            while self.pending and self.queue.put(self.pending[0]):
+                self.pending.pop(0)
+        self.published += sent
+        return sent
+
+    def __repr__(self):
+        state = "verbunden" if self.connected else "verbinde" if self.connecting else "getrennt"
+        return (f"Telemetrie: {state}, "
+                f"{self.published} gesendet, {len(self.inflight)} unbestätigt, "
+                f"{len(self.pending)} im RAM, "
+                f"{len(self.queue)} im Flash, {self.queue.dropped + self.dropped} verworfen, "
+                f"{self.errors} Fehler")
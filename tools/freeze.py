@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Firmware als Bytecode (.mpy) für das Board bauen.
+
+Übersetzt alle Module im Hauptverzeichnis mit mpy-cross nach build/, so
+entfällt das Kompilieren beim Start auf dem Board. main.py wird durch eine
+Zeile ersetzt, die taupunktluefter importiert (main.py selbst muss Quelltext
+sein). Mit --deploy wird build/ danach mit mpremote auf das Board kopiert,
+mit --manifest zusätzlich build/manifest.py geschrieben, um die Module in
+ein eigenes MicroPython-Image einzufrieren (freeze):
+
+    python3 tools/freeze.py
+    python3 tools/freeze.py --deploy
+    make -C ports/rp2 BOARD=RPI_PICO FROZEN_MANIFEST=/pfad/build/manifest.py
+
+Benötigt mpy-cross in der Version der Firmware auf dem Board (pip install
+mpy-cross), ohne es im PATH wird das Python-Paket mpy_cross verwendet.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+MAIN = "taupunktluefter"
+ARCH = "armv6m"     # RP2040 (Cortex-M0+)
+
+
+def modules():
+    """Names of the firmware modules (the .py files in the top directory)."""
+    return sorted(n[:-3] for n in os.listdir(ROOT)
+                  if n.endswith(".py") and n != "main.py")
+
+
+def mpy_cross():
+    exe = shutil.which("mpy-cross")
+    if exe:
+        return [exe]
+    try:
+        import mpy_cross  # noqa: F401
+    except ImportError:
+        sys.exit("mpy-cross nicht gefunden: pip install mpy-cross")
+    return [sys.executable, "-m", "mpy_cross"]
+
+
+def build(out, arch=ARCH, opt=2):
+    cmd = mpy_cross()
+    os.makedirs(out, exist_ok=True)
+    total = 0
+    for name in modules():
+        dst = os.path.join(out, name + ".mpy")
+        subprocess.run(cmd + [f"-march={arch}", f"-O{opt}", "-o", dst,
+                              os.path.join(ROOT, name + ".py")], check=True)
+        total += os.path.getsize(dst)
+    with open(os.path.join(out, "main.py"), "w") as f:
+        f.write(f"import {MAIN}\n")
+    return total
+
+
+def manifest(out):
+    with open(os.path.join(out, "manifest.py"), "w") as f:
+        f.write('include("$(PORT_DIR)/boards/manifest.py")\n')
+        for name in modules():
+            f.write(f'module("{name}.py", base_path="{os.path.abspath(ROOT)}", opt=2)\n')
+
+
+def deploy(out):
+    files = sorted(n for n in os.listdir(out) if n.endswith(".mpy")) + ["main.py"]
+    # Alte Quelltexte entfernen, sonst lädt MicroPython .py vor .mpy
+    for name in modules():
+        subprocess.run(["mpremote", "rm", f":{name}.py"], stderr=subprocess.DEVNULL)
+    subprocess.run(["mpremote", "cp"] + [os.path.join(out, n) for n in files] + [":"],
+                   check=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Firmware als .mpy bauen")
+    parser.add_argument("-o", "--out", default=os.path.join(ROOT, "build"))
+    parser.add_argument("--arch", default=ARCH, help="mpy-cross -march (Standard armv6m)")
+    parser.add_argument("--manifest", action="store_true",
+                        help="build/manifest.py zum Einfrieren in ein Image schreiben")
+    parser.add_argument("--deploy", action="store_true", help="Mit mpremote auf das Board kopieren")
+    args = parser.parse_args(argv)
+    total = build(args.out, args.arch)
+    print(f"{len(modules())} Module, {total} Bytes Bytecode in {args.out}")
+    if args.manifest:
+        manifest(args.out)
+    if args.deploy:
+        deploy(args.out)
+
+
+if __name__ == "__main__":
+    main()
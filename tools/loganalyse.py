@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""Auswertung von Logdateien (taupunkt.csv) auf dem Host.
+
+Liest eine oder mehrere CSV-Dateien im Format von logdta()/export_csv()
+
+    Date,t1,h1,tp1,t2,h2,tp2,fan
+    23.08.2022 01:12:48,22.30,40.50,8.32,7.60,39.30,-5.43,True
+
+blockweise (der Speicherbedarf hängt nur von --chunk und der Anzahl der
+Stunden/Tage ab, nicht von der Dateigröße) und berechnet je Gerät stündliche
+und tägliche Werte: min/max/Mittel von t, h und Taupunkt je Sensor, die
+Einschaltdauer des Lüfters (Anteil 0..1) und die Anzahl der Schaltvorgänge.
+Ältere Dateien ohne tp-Spalten (Date,t1,h1,t2,h2,fan) werden ebenfalls
+gelesen, der Taupunkt wird dann berechnet. Jede Datei ist ein Gerät; sein
+Name ist das kürzeste Ende des Pfads ohne .csv, das die Dateien
+unterscheidet (einheit1/taupunkt.csv und einheit2/taupunkt.csv werden zu
+einheit1/taupunkt und einheit2/taupunkt), oder mit --unit je Datei
+angegeben. Doppelte Namen sind ein Fehler. Mit --jobs werden die Dateien
+parallel ausgewertet.
+
+    python3 tools/loganalyse.py --jobs 4 -o stunden.csv einheit*/taupunkt.csv
+    python3 tools/loganalyse.py --daily einheit1.csv
+    python3 tools/loganalyse.py --unit keller --unit garage a/taupunkt.csv b/taupunkt.csv
+
+Benötigt NumPy.
+"""
+import argparse
+import os
+import sys
+from multiprocessing import Pool
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dewpoint import taupunkt_batch  # noqa: E402
+
+COLUMNS = ("t1", "h1", "tp1", "t2", "h2", "tp2")
+HOUR = 3600
+DAY = 86400
+CHUNK = 32 * 1024 * 1024  # Bytes pro Lesevorgang
+
+
+def days_from_civil(y, m, d):
+    """Days since 1970-01-01 for (arrays of) proleptic Gregorian dates."""
+    y = y - (m <= 2)
+    era = np.floor_divide(y, 400)
+    yoe = y - era * 400
+    mp = (m + 9) % 12
+    doy = (153 * mp + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def parse_block(data, ncols):
+    """Parses complete data lines (bytes, lines separated by newline).
+
+    ncols is the number of numeric columns between date and fan (6 with
+    dew points, 4 without). Returns (ts, values, fan) with values holding
+    the columns of COLUMNS.
+    """
+    data = data.rstrip(b"\n")
+    raw = np.frombuffer(data, dtype=np.uint8)
+    starts = np.concatenate(([0], np.flatnonzero(raw == 10) + 1))
+    n = len(starts)
+    # Datum/Zeit hat feste Breite: Ziffern direkt aus dem Puffer lesen
+    date = starts[:, None] + np.arange(19)
+    digits = raw[date].astype(np.int64) - 48
+    day = digits[:, 0] * 10 + digits[:, 1]
+    month = digits[:, 3] * 10 + digits[:, 4]
+    year = digits[:, 6] * 1000 + digits[:, 7] * 100 + digits[:, 8] * 10 + digits[:, 9]
+    secs = ((digits[:, 11] * 10 + digits[:, 12]) * 3600 +
+            (digits[:, 14] * 10 + digits[:, 15]) * 60 +
+            digits[:, 17] * 10 + digits[:, 18])
+    ts = days_from_civil(year, month, day) * DAY + secs
+    # Zahlenwerte: Datum ausblenden, True/False ersetzen, am Stück wandeln
+    buf = bytearray(data)
+    np.frombuffer(buf, dtype=np.uint8)[date] = ord("0")
+    text = bytes(buf).replace(b"True", b"1").replace(b"False", b"0").replace(b"\n", b",")
+    values = np.fromstring(text, sep=",").reshape(n, ncols + 2)
+    fan = values[:, -1].astype(np.int8)
+    if ncols == 6:
+        values = values[:, 1:7]
+    else:
+        t1, h1, t2, h2 = values[:, 1], values[:, 2], values[:, 3], values[:, 4]
+        values = np.column_stack((t1, h1, taupunkt_batch(t1, h1), t2, h2, taupunkt_batch(t2, h2)))
+    return ts, values, fan
+
+
+def _valid_lines(data, ncols):
+    """Returns data reduced to the well-formed data lines (all of them in
+    the usual case, then data is returned unchanged).
+    """
+    if not data:
+        return data
+    raw = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(raw == 10)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    commas = np.concatenate(([0], np.cumsum(raw == 44)))
+    length = ends - starts
+    ok = length > 20
+    first = raw[np.minimum(starts, len(raw) - 1)]
+    ok &= (first >= 48) & (first <= 57)
+    ok &= raw[np.minimum(starts + 19, len(raw) - 1)] == 44
+    ok &= commas[ends] - commas[starts] == ncols + 1
+    ok &= raw[np.maximum(ends - 1, 0)] != 13
+    if ok.all():
+        return data
+    return b"".join(data[s:e + 1] for s, e in zip(starts[ok].tolist(), ends[ok].tolist()))
+
+
+def read_blocks(name, chunk=CHUNK):
+    """Yields (ts, values, fan) for consecutive blocks of the file name.
+
+    Header lines (repeated whenever the file was recreated) and broken
+    lines, e.g. cut off by a power loss, are skipped.
+    """
+    ncols = 6
+    rest = b""
+    with open(name, "rb") as f:
+        while True:
+            data = f.read(chunk)
+            eof = not data
+            data = rest + data
+            rest = b""
+            if eof:
+                if data and not data.endswith(b"\n"):
+                    data += b"\n"
+            else:
+                # Unvollständige letzte Zeile für den nächsten Block aufheben
+                cut = data.rfind(b"\n") + 1
+                data, rest = data[:cut], data[cut:]
+            data = data.replace(b"\r\n", b"\n")
+            # Kopfzeilen trennen den Block, danach kann sich ncols ändern
+            pos = 0
+            while pos < len(data):
+                head = data.find(b"Date,", pos)
+                while head > 0 and data[head - 1] != 10:
+                    head = data.find(b"Date,", head + 1)
+                part = data[pos:] if head < 0 else data[pos:head]
+                part = _valid_lines(part, ncols)
+                if part:
+                    yield parse_block(part, ncols)
+                if head < 0:
+                    break
+                pos = data.find(b"\n", head) + 1
+                ncols = data.count(b",", head, pos) - 1
+                if pos == 0:
+                    break
+            if eof:
+                break
+
+
+class Aggregate:
+    """Min/max/sum/count of the COLUMNS, fan on-time and switch count per
+    time bucket of width seconds.
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self.keys = np.empty(0, dtype=np.int64)
+        self.min = np.empty((0, len(COLUMNS)))
+        self.max = np.empty((0, len(COLUMNS)))
+        self.sum = np.empty((0, len(COLUMNS)))
+        self.count = np.empty(0, dtype=np.int64)
+        self.fan = np.empty(0, dtype=np.int64)
+        self.switches = np.empty(0, dtype=np.int64)
+
+    def add(self, ts, values, fan, switch):
+        """Adds samples; switch[i] is 1 if the fan changed at sample i."""
+        keys = ts // self.width
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        values = values[order]
+        uniq, starts = np.unique(keys, return_index=True)
+        self._merge(uniq,
+                    np.minimum.reduceat(values, starts),
+                    np.maximum.reduceat(values, starts),
+                    np.add.reduceat(values, starts),
+                    np.diff(np.append(starts, len(keys))),
+                    np.add.reduceat(fan[order].astype(np.int64), starts),
+                    np.add.reduceat(switch[order].astype(np.int64), starts))
+
+    def _merge(self, keys, mins, maxs, sums, count, fan, switches):
+        keys = np.concatenate((self.keys, keys))
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        uniq, starts = np.unique(keys, return_index=True)
+        self.keys = uniq
+        self.min = np.minimum.reduceat(np.concatenate((self.min, mins))[order], starts)
+        self.max = np.maximum.reduceat(np.concatenate((self.max, maxs))[order], starts)
+        self.sum = np.add.reduceat(np.concatenate((self.sum, sums))[order], starts)
+        self.count = np.add.reduceat(np.concatenate((self.count, count))[order], starts)
+        self.fan = np.add.reduceat(np.concatenate((self.fan, fan))[order], starts)
+        self.switches = np.add.reduceat(np.concatenate((self.switches, switches))[order], starts)
+
+    def rows(self):
+        """Yields (bucket start, count, min, max, mean, fan duty, switches)."""
+        mean = self.sum / self.count[:, None]
+        duty = self.fan / self.count
+        for i in range(len(self.keys)):
+            yield (int(self.keys[i]) * self.width, int(self.count[i]), self.min[i],
+                   self.max[i], mean[i], duty[i], int(self.switches[i]))
+
+
+def unit_names(names, units=None):
+    """Name of the unit of each logfile, see the module docstring. Raises
+    ValueError if two files would get the same name.
+    """
+    if units:
+        if len(units) != len(names):
+            raise ValueError(f"{len(units)} Namen mit --unit für {len(names)} Dateien")
+    else:
+        paths = [os.path.splitext(os.path.normpath(n))[0].split(os.sep) for n in names]
+        depth = 1
+        while True:
+            units = ["/".join(p[-depth:]) for p in paths]
+            if len(set(units)) == len(units) or all(len(p) <= depth for p in paths):
+                break
+            depth += 1
+    seen = set()
+    for unit, name in zip(units, names):
+        if unit in seen:
+            raise ValueError(f"Gerät {unit} doppelt ({name})")
+        seen.add(unit)
+    return units
+
+
+def analyse_file(name, unit, chunk=CHUNK):
+    """Returns (unit, hourly Aggregate, daily Aggregate) for one logfile."""
+    hourly = Aggregate(HOUR)
+    daily = Aggregate(DAY)
+    last = None  # Lüfterzustand am Ende des vorigen Blocks
+    for ts, values, fan in read_blocks(name, chunk):
+        prev = np.empty_like(fan)
+        prev[1:] = fan[:-1]
+        prev[0] = fan[0] if last is None else last
+        switch = (fan != prev).astype(np.int8)
+        last = fan[-1]
+        hourly.add(ts, values, fan, switch)
+        daily.add(ts, values, fan, switch)
+    return unit, hourly, daily
+
+
+def _fmt_time(t):
+    days, secs = divmod(t, DAY)
+    # Umkehrung von days_from_civil
+    z = days + 719468
+    era = z // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    d = doy - (153 * mp + 2) // 5 + 1
+    m = mp + 3 if mp < 10 else mp - 9
+    y = yoe + era * 400 + (m <= 2)
+    return f"{d:02d}.{m:02d}.{y} {secs // 3600:02d}:{secs // 60 % 60:02d}"
+
+
+def write_report(out, results, daily=False):
+    head = ["unit", "start", "n"]
+    for stat in ("min", "max", "mean"):
+        head += [f"{c}_{stat}" for c in COLUMNS]
+    out.write(",".join(head + ["fan_duty", "switches"]) + "\n")
+    for unit in sorted(results):
+        agg = results[unit][1 if daily else 0]
+        for start, n, mn, mx, mean, duty, sw in agg.rows():
+            vals = ",".join(f"{v:.2f}" for v in np.concatenate((mn, mx, mean)))
+            out.write(f"{unit},{_fmt_time(start)},{n},{vals},{duty:.3f},{sw}\n")
+
+
+def analyse(names, jobs=1, chunk=CHUNK, units=None):
+    """Analyses the logfiles, returns {unit: (hourly, daily)}."""
+    units = unit_names(names, units)
+    if jobs > 1 and len(names) > 1:
+        with Pool(jobs) as pool:
+            parts = pool.starmap(analyse_file, [(n, u, chunk) for n, u in zip(names, units)])
+    else:
+        parts = (analyse_file(n, u, chunk) for n, u in zip(names, units))
+    return {unit: (hourly, daily) for unit, hourly, daily in parts}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stunden-/Tageswerte aus taupunkt.csv Logdateien")
+    parser.add_argument("files", nargs="+", help="Logdateien (eine pro Gerät)")
+    parser.add_argument("--daily", action="store_true", help="Tageswerte statt Stundenwerte")
+    parser.add_argument("--jobs", type=int, default=1, help="Anzahl paralleler Prozesse")
+    parser.add_argument("--chunk", type=int, default=CHUNK, help="Bytes pro Lesevorgang")
+    parser.add_argument("--unit", action="append",
+                        help="Name des Geräts, einmal je Datei in derselben Reihenfolge")
+    parser.add_argument("-o", "--output", help="Ausgabedatei (Standard: stdout)")
+    args = parser.parse_args(argv)
+    try:
+        results = analyse(args.files, args.jobs, args.chunk, args.unit)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.output:
+        with open(args.output, "w") as out:
+            write_report(out, results, args.daily)
+    else:
+        write_report(sys.stdout, results, args.daily)
+
+
+if __name__ == "__main__":
+    main()
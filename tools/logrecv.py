@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""Log des Boards über die serielle Konsole abholen (Gegenstück zu export.py).
+
+Ruft im REPL des Boards export_log() auf, prüft jeden Block (Folgenummer,
+Position, CRC32) und schreibt nur geprüfte Daten in die Ausgabedatei. Fehlt
+ein Block oder stimmt die CRC nicht, wird der Export mit Strg-C
+abgebrochen und ab dem letzten geprüften Byte neu angefordert.
+
+    python3 tools/logrecv.py /dev/ttyACM0 -o taupunkt.csv
+    python3 tools/logrecv.py /dev/ttyACM0 -o taupunkt.csv --resume
+    python3 tools/logrecv.py /dev/ttyACM0 -o taupunkt.csv --since
+
+--resume setzt einen abgebrochenen Export an der Größe der Datei fort
+(die letzten Bytes werden zur Kontrolle noch einmal übertragen und
+verglichen), --since holt nur die Einträge nach der letzten Zeile der
+Datei und hängt sie an. Das Board muss im REPL erreichbar sein
+(RUNTIME = "timer"). Braucht nur die Standardbibliothek (termios, also
+Linux oder macOS).
+"""
+import argparse
+import binascii
+import os
+import select
+import sys
+import termios
+import time
+import tty
+import zlib
+
+PREFIX = b"#TPX"
+VERSION = 1
+CHUNK = 2048
+TIMEOUT = 5.0       # s ohne Daten, nach denen neu angefordert wird
+RETRIES = 5
+OVERLAP = 64        # Bytes, die --resume zur Kontrolle noch einmal holt
+
+
+class ExportError(Exception):
+    pass
+
+
+class Port:
+    """Serial port (or pseudo-terminal) in raw mode, read line by line."""
+
+    def __init__(self, path, baud=115200):
+        self.fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+        tty.setraw(self.fd)
+        attrs = termios.tcgetattr(self.fd)
+        speed = getattr(termios, f"B{baud}", termios.B115200)
+        attrs[4] = attrs[5] = speed
+        termios.tcsetattr(self.fd, termios.TCSANOW, attrs)
+        self.buf = b""
+
+    def write(self, data):
+        while data:
+            n = os.write(self.fd, data)
+            data = data[n:]
+
+    def readline(self, timeout):
+        """Next line without line end, None after timeout seconds without data."""
+        while b"\n" not in self.buf:
+            r, _, _ = select.select([self.fd], [], [], timeout)
+            if not r:
+                return None
+            try:
+                data = os.read(self.fd, 4096)
+            except OSError:     # Andere Seite geschlossen
+                return None
+            if not data:
+                return None
+            self.buf += data
+        line, self.buf = self.buf.split(b"\n", 1)
+        return line.rstrip(b"\r")
+
+    def drain(self, quiet=0.3):
+        """Discards input until nothing arrives for quiet seconds."""
+        self.buf = b""
+        while select.select([self.fd], [], [], quiet)[0]:
+            try:
+                if not os.read(self.fd, 4096):
+                    break
+            except OSError:
+                break
+
+    def close(self):
+        os.close(self.fd)
+
+
+def command(offset, since, zone, compress, chunk):
+    args = [f"offset={offset}", f"zone={zone}", f"chunk={chunk}"]
+    if since:
+        args.append(f"since={since!r}")
+    if compress:
+        args.append("compress=True")
+    return f"export_log({', '.join(args)})\r".encode()
+
+
+def transfer(port, sink, offset=0, since=None, zone=0, compress=False, chunk=CHUNK,
+             timeout=TIMEOUT, retries=RETRIES, stats=None):
+    """Fetches the stream from offset on and passes every verified block
+    to sink(pos, data). Returns the length of the stream.
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("retries", 0)
+    stats.setdefault("blocks", 0)
+    stats.setdefault("wire", 0)
+    failures = 0
+    while True:
+        try:
+            total = _once(port, sink, offset, since, zone, compress, chunk, timeout, stats)
+            if total is not None:
+                return total
+        except _Resume as e:
+            offset = e.offset
+            if e.progress:
+                failures = 0
+        failures += 1
+        stats["retries"] += 1
+        if failures > retries:
+            raise ExportError(f"Abbruch nach {retries} Wiederholungen bei Byte {offset}")
+        port.write(b"\x03")   # Laufenden Export abbrechen
+        port.drain()
+
+
+class _Resume(Exception):
+    def __init__(self, offset, progress):
+        self.offset = offset
+        self.progress = progress
+
+
+def _once(port, sink, offset, since, zone, compress, chunk, timeout, stats):
+    port.drain(0.05)
+    port.write(command(offset, since, zone, compress, chunk))
+    start = offset
+    seq = 0
+    begun = False
+    error = []
+    while True:
+        line = port.readline(timeout)
+        if line is None:
+            raise _Resume(offset, offset > start)
+        if not line.startswith(PREFIX):
+            # Echo, Eingabeaufforderung oder Fehlermeldung des Boards
+            if error or line.startswith(b"Traceback"):
+                error.append(line.decode(errors="replace"))
+                if line.startswith(b">>>") or "Error" in error[-1]:
+                    raise ExportError("Fehler auf dem Board:\n" + "\n".join(error))
+            continue
+        stats["wire"] += len(line) + 1
+        f = line.split(b" ")
+        kind = f[1] if len(f) > 1 else b""
+        if kind == b"B":
+            if int(f[2]) != VERSION or f[3] != (b"z" if compress else b"r") or \
+                    int(f[4]) != chunk or int(f[5]) != offset:
+                raise ExportError(f"Unerwarteter Beginn: {line.decode(errors='replace')}")
+            begun = True
+        elif kind == b"K" and begun:
+            pass    # Das Board überspringt noch den Anfang
+        elif kind == b"D" and begun and len(f) == 6:
+            if int(f[2]) != seq or int(f[3]) != offset:
+                raise _Resume(offset, offset > start)   # Block fehlt
+            try:
+                data = binascii.a2b_base64(f[5])
+                if compress:
+                    data = zlib.decompress(data)
+            except (binascii.Error, zlib.error):
+                raise _Resume(offset, offset > start)
+            if len(data) > chunk or binascii.crc32(data) != int(f[4], 16):
+                raise _Resume(offset, offset > start)
+            sink(offset, data)
+            offset += len(data)
+            seq += 1
+            stats["blocks"] += 1
+        elif kind == b"E" and begun:
+            if int(f[2]) != seq or int(f[3]) != offset:
+                raise _Resume(offset, offset > start)
+            return offset
+        else:
+            raise _Resume(offset, offset > start)
+
+
+class FileSink:
+    """Writes verified data at its position; data before known_size must
+    match what the file already holds.
+    """
+
+    def __init__(self, f, known_size=0, base=0, skip_header=False):
+        self.f = f
+        self.known = known_size
+        self.base = base            # Position der Datei für Position 0 des Stroms
+        self.skip = 0 if not skip_header else None  # Länge der Kopfzeile, None: unbekannt
+
+    def __call__(self, pos, data):
+        if self.skip is None:
+            if pos != 0:
+                raise ExportError("Kopfzeile fehlt")
+            self.skip = data.index(b"\n") + 1
+        if pos < self.skip:
+            data = data[self.skip - pos:]
+            pos = self.skip
+        at = self.base + pos - self.skip
+        if at < self.known:
+            n = min(len(data), self.known - at)
+            self.f.seek(at)
+            if self.f.read(n) != data[:n]:
+                raise ExportError("Das Log auf dem Board hat sich geändert, --since verwenden")
+            data = data[n:]
+            at += n
+        if data:
+            self.f.seek(at)
+            self.f.write(data)
+
+
+def last_date(f):
+    """Truncates f after its last complete line and returns the Date of
+    that line (None if there is no log entry).
+    """
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(max(0, size - 4096))
+    tail = f.read()
+    end = tail.rfind(b"\n")
+    if end < 0:
+        return None
+    f.truncate(size - len(tail) + end + 1)
+    start = tail.rfind(b"\n", 0, end) + 1
+    date = tail[start:end].split(b",")[0].decode()
+    return None if date == "Date" else date
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Log des Boards über die serielle Konsole abholen")
+    parser.add_argument("port", help="Serielle Schnittstelle, z. B. /dev/ttyACM0")
+    parser.add_argument("-o", "--output", default="taupunkt.csv")
+    parser.add_argument("--zone", type=int, default=0)
+    parser.add_argument("--compress", action="store_true", help="Blöcke komprimiert übertragen")
+    parser.add_argument("--chunk", type=int, default=CHUNK, help="Bytes je Block")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--resume", action="store_true",
+                       help="Abgebrochenen Export an der Größe der Datei fortsetzen")
+    group.add_argument("--since", action="store_true",
+                       help="Nur Einträge nach der letzten Zeile der Datei anhängen")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT)
+    parser.add_argument("--retries", type=int, default=RETRIES)
+    parser.add_argument("--baud", type=int, default=115200)
+    args = parser.parse_args(argv)
+
+    exists = os.path.exists(args.output)
+    f = open(args.output, "r+b" if exists and (args.resume or args.since) else "w+b")
+    offset = 0
+    since = None
+    if args.resume:
+        known = f.seek(0, os.SEEK_END)
+        offset = max(0, known - OVERLAP)
+        sink = FileSink(f, known)
+    elif args.since:
+        since = last_date(f)
+        base = f.seek(0, os.SEEK_END)
+        sink = FileSink(f, base=base, skip_header=base > 0)
+    else:
+        sink = FileSink(f)
+    port = Port(args.port, args.baud)
+    stats = {}
+    t0 = time.monotonic()
+    try:
+        total = transfer(port, sink, offset, since, args.zone, args.compress, args.chunk,
+                         args.timeout, args.retries, stats)
+    except ExportError as e:
+        f.close()
+        sys.exit(str(e))
+    finally:
+        port.close()
+    if not args.since:
+        f.truncate(total)
+    size = f.seek(0, os.SEEK_END)
+    f.close()
+    dt = time.monotonic() - t0
+    print(f"{args.output}: {size} Bytes, {stats['blocks']} Blöcke, {stats['wire']} Bytes "
+          f"übertragen in {dt:.1f} s, {stats['retries']} Wiederholungen")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""Lüftungszonen mit eigenem Innensensor, Relais und Schwellen.
+
+Channel ist ein Sensor mit seinen Filtern. Ein Außensensor, den mehrere
+Zonen verwenden, ist ein einziger Channel und wird nur einmal gemessen.
+
+Zone verbindet einen Innen- und einen Außenkanal mit einem Relais und
+trifft die Schaltentscheidung (Taupunktdifferenz mit Hysterese,
+Mindesttemperaturen, veraltete Messwerte schalten aus). Die Taupunkte
+werden dabei einmal je Messung berechnet. Das Ergebnis steht danach als
+unveränderliches Tupel in zone.snapshot (Snapshot); Anzeige, Log und
+Telemetrie lesen nur dieses und rechnen nichts nach. Jede Entscheidung
+hält die Zeit von der Messung bis zum Schalten des Relais (latency_us)
+und das Alter des älteren Messwerts (age_ms) fest.
+
+ReadScheduler misst bei jedem Aufruf von step() genau einen Kanal, reihum.
+Bei n Kanälen und einem Takt von period_ms // n wird jeder Sensor alle
+period_ms gemessen, der DHT22 also nie schneller als erlaubt, und ein
+Aufruf dauert unabhängig von der Zahl der Zonen höchstens eine Messung.
+Danach werden nur die Zonen neu bewertet, die diesen Kanal verwenden.
+
+Mit max_ms > period_ms misst ReadScheduler adaptiv: jeder Kanal wird erst
+wieder gemessen, wenn sein Intervall (Channel.interval()) abgelaufen ist,
+sonst fällt der Takt aus. Das Intervall ist period_ms, solange eine Zone
+des Kanals nahe an einem Schaltpunkt ist (Taupunktdifferenz an den
+Grenzen des Bandes schalt_min ... schalt_min + hysterese oder eine
+Temperatur nahe ihrem Minimum), sich die Taupunktdifferenz schnell ändert,
+die letzte Messung fehlschlug oder der Rohwert deutlich vom gefilterten
+Wert abweicht. Weit weg vom Schaltpunkt wächst es mit dem Quadrat des
+Abstands bis max_ms, aber höchstens auf ein Viertel der Zeit, die der
+Schaltpunkt bei gleicher Änderungsrate noch entfernt ist.
+"""
+from time import ticks_ms, ticks_us, ticks_diff
+from dewpoint import taupunkt
+from lcdformat import lcd_bytes
+try:
+    from collections import namedtuple
+except ImportError:
+    from ucollections import namedtuple
+
+DHT_MIN_MS = 2000   # Kürzester Abstand zweier Messungen eines DHT22
+DHT_SLACK_MS = 20   # Toleranz dafür (Auflösung von ticks_ms)
+MIN_TICK_MS = 100
+NEAR_K = 1.0        # Abstand zum Schaltpunkt, ab dem schnell gemessen wird
+SAFETY = 4          # Messungen bis zum Schaltpunkt bei gleicher Änderungsrate
+RATE_MS = 60000     # Zeitraum, über den die Änderungsrate bestimmt wird
+RATE_EMA = 0.5      # Glättung der Änderungsrate
+JUMP_T = 0.5        # Abweichung Rohwert/Filter, die schnelles Messen erzwingt
+JUMP_H = 2.0
+
+# Stand einer Zone nach einer Schaltentscheidung: Folgenummer, ticks_ms(),
+# Messwerte und Taupunkte, Lüfter, ob sich der Lüfter dabei geändert hat,
+# ob die Werte innen/außen aktuell sind, und die Taupunkte als ganze Zehntel
+# für die Anzeige (display() rechnet so nicht mit float)
+Snapshot = namedtuple("Snapshot", ("seq", "ms", "t1", "h1", "tp1", "t2", "h2", "tp2",
+                                   "fan", "switched", "ok1", "ok2", "tp1_tenths", "tp2_tenths"))
+
+
+class Channel:
+    def __init__(self, sensor, filter_t, filter_h):
+        self.sensor = sensor
+        self.filter_t = filter_t
+        self.filter_h = filter_h
+        self.t = 0.0
+        self.h = 0.0
+        self.zones = []     # Zonen, die diesen Kanal verwenden
+        self.err = lcd_bytes("Fehler " + sensor.name) # Anzeigezeile bei Fehler
+        self.last = None    # ticks_ms() der letzten Messung
+        self.read_us = None # ticks_us() am Ende der letzten Messung
+        self.good = False   # Letzte Messung erfolgreich
+        self.moving = False # Rohwert weicht deutlich vom gefilterten ab
+
+    @property
+    def name(self):
+        return self.sensor.name
+
+    def update(self):
+        """Measures once, only new good values go into the filters.
+        Returns True if there is a new value.
+        """
+        self.last = ticks_ms()
+        self.good = self.sensor.update()
+        self.read_us = ticks_us()
+        if self.good:
+            self.t = self.filter_t.update(self.sensor.t)
+            self.h = self.filter_h.update(self.sensor.h)
+            # Ein Sprung ist erst nach mehreren Messungen im Median zu sehen
+            self.moving = (abs(self.sensor.t - self.t) > JUMP_T or
+                           abs(self.sensor.h - self.h) > JUMP_H)
+        return self.good
+
+    def interval(self, period_ms, max_ms):
+        """Time in ms until this channel should be measured again."""
+        if not self.good or self.moving:
+            return period_ms
+        wait = max_ms
+        for zone in self.zones:
+            w = zone.wait_ms(period_ms, max_ms)
+            if w < wait:
+                wait = w
+        return wait
+
+    def fresh(self, max_age_ms):
+        return self.sensor.fresh(max_age_ms)
+
+
+class Zone:
+    def __init__(self, name, inner, outer, relay, schalt_min=0.2, hysterese=3.0,
+                 temp1_min=10.0, temp2_min=-10.0, rel=False):
+        self.name = name
+        self.inner = inner
+        self.outer = outer
+        self.relay = relay      # Pin, low aktiv: off() schaltet den Lüfter ein
+        self.schalt_min = schalt_min
+        self.hysterese = hysterese
+        self.temp1_min = temp1_min
+        self.temp2_min = temp2_min
+        self.rel = rel          # Anfangszustand, z. B. wie vor einem Neustart
+        self.snapshot = None    # Ergebnis der letzten Entscheidung
+        self.seq = 0
+        self.latency_us = 0     # Messung bis Relais der letzten Entscheidung
+        self.latency_max_us = 0
+        self.age_ms = 0         # Alter des älteren Messwerts dabei
+        self.age_max_ms = 0
+        self.margin = 0.0       # Abstand zum nächsten Schaltpunkt in K
+        self.rate = 0.0         # Änderung der Taupunktdifferenz in K/ms
+        self.last_delta = None
+        self.stamp = 0          # ticks_ms() von last_delta
+        inner.zones.append(self)
+        if outer is not inner:
+            outer.zones.append(self)
+        relay.value(0 if rel else 1)  # Low aktiv
+
+    def control(self, max_age_ms):
+        """Recomputes the dew points, switches the relay and publishes the
+        result as snapshot. Returns True if the state of the fan changed.
+        """
+        inner = self.inner
+        outer = self.outer
+        t1 = inner.t
+        t2 = outer.t
+        tp1 = taupunkt(t1, inner.h)
+        tp2 = taupunkt(t2, outer.h)
+        delta = tp1 - tp2
+        ok1 = inner.fresh(max_age_ms)
+        ok2 = outer.fresh(max_age_ms)
+        rel = self.rel
+        if delta > self.schalt_min + self.hysterese:
+            rel = True
+        if delta < self.schalt_min:
+            rel = False
+        if t1 < self.temp1_min or t2 < self.temp2_min:
+            rel = False
+        if not (ok1 and ok2): # Keine aktuellen Messwerte: Lüfter aus
+            rel = False
+        changed = rel != self.rel
+        self.rel = rel
+        if rel:
+            self.relay.off() # Relais einschalten
+        else:
+            self.relay.on()  # Relais ausschalten
+        self._latency(inner, outer)
+        self.seq += 1
+        self.snapshot = Snapshot(self.seq, ticks_ms(), t1, inner.h, tp1, t2, outer.h, tp2,
+                                 rel, changed, ok1, ok2, round(tp1 * 10), round(tp2 * 10))
+        self._track(delta, t1, t2)
+        return changed
+
+    def _latency(self, inner, outer):
+        # Von der neueren Messung (der gerade gelesenen) bis jetzt
+        if inner.last is None or outer.last is None:
+            return
+        newer = inner.read_us
+        if ticks_diff(outer.read_us, newer) > 0:
+            newer = outer.read_us
+        self.latency_us = ticks_diff(ticks_us(), newer)
+        if self.latency_us > self.latency_max_us:
+            self.latency_max_us = self.latency_us
+        older = inner.last
+        if ticks_diff(outer.last, older) < 0:
+            older = outer.last
+        self.age_ms = ticks_diff(ticks_ms(), older)
+        if self.age_ms > self.age_max_ms:
+            self.age_max_ms = self.age_ms
+
+    def _track(self, delta, t1, t2):
+        # Abstand zum nächsten Schaltpunkt und Änderungsrate für wait_ms()
+        on = self.schalt_min + self.hysterese
+        m = abs(delta - self.schalt_min)
+        if abs(delta - on) < m:
+            m = abs(delta - on)
+        if abs(t1 - self.temp1_min) < m:
+            m = abs(t1 - self.temp1_min)
+        if abs(t2 - self.temp2_min) < m:
+            m = abs(t2 - self.temp2_min)
+        self.margin = m
+        # Über RATE_MS, sonst überwiegt die Auflösung des DHT22 (0.1)
+        now = ticks_ms()
+        if self.last_delta is None:
+            self.last_delta = delta
+            self.stamp = now
+            return
+        dt = ticks_diff(now, self.stamp)
+        if dt >= RATE_MS:
+            rate = abs(delta - self.last_delta) / dt
+            self.rate += RATE_EMA * (rate - self.rate)
+            self.last_delta = delta
+            self.stamp = now
+
+    def wait_ms(self, period_ms, max_ms):
+        """Measuring interval this zone needs, between period_ms and max_ms."""
+        m = self.margin
+        if m < NEAR_K:
+            return period_ms
+        w = period_ms * (m / NEAR_K) ** 2
+        if self.rate > 0:
+            t = m / self.rate / SAFETY
+            if t < w:
+                w = t
+        if w < period_ms:
+            return period_ms
+        if w > max_ms:
+            return max_ms
+        return int(w)
+
+    def timing(self):
+        return (f"{self.name}: Messung bis Relais {self.latency_us} us (max {self.latency_max_us}), "
+                f"Alter der Messwerte {self.age_ms} ms (max {self.age_max_ms})")
+
+
+class ReadScheduler:
+    def __init__(self, channels, period_ms=3000, max_ms=0):
+        if period_ms < DHT_MIN_MS:
+            period_ms = DHT_MIN_MS
+        self.channels = channels
+        self.period_ms = period_ms
+        self.max_ms = max_ms        # <= period_ms: fester Takt
+        self.tick_ms = max(MIN_TICK_MS, period_ms // len(channels))
+        self.pos = 0
+        self.reads = 0
+        self.skipped = 0            # Takte ohne Messung
+
+    def adaptive(self):
+        return self.max_ms > self.period_ms
+
+    def step(self):
+        """Measures the next channel that is due and returns it, None if
+        no channel is due.
+        """
+        n = len(self.channels)
+        now = ticks_ms()
+        if self.adaptive():
+            slack = self.tick_ms // 2   # Jitter des Takts
+            for k in range(n):
+                ch = self.channels[(self.pos + k) % n]
+                if ch.last is None or ticks_diff(now, ch.last) >= \
+                        ch.interval(self.period_ms, self.max_ms) - slack:
+                    break
+            else:
+                self.skipped += 1
+                return None
+            self.pos = (self.pos + k) % n
+        ch = self.channels[self.pos]
+        # Z. B. kurz nach first_measure() beim Start
+        if ch.last is not None and ticks_diff(now, ch.last) < DHT_MIN_MS - DHT_SLACK_MS:
+            self.skipped += 1
+            return None
+        self.pos = (self.pos + 1) % n
+        self.reads += 1
+        ch.update()
+        return ch
+
+    def next_ms(self):
+        """Time in ms until the next channel is due, at least tick_ms."""
+        if not self.adaptive():
+            return self.tick_ms
+        now = ticks_ms()
+        wait = self.max_ms
+        for ch in self.channels:
+            if ch.last is None:
+                return self.tick_ms
+            w = ch.interval(self.period_ms, self.max_ms) - ticks_diff(now, ch.last)
+            if w < wait:
+                wait = w
+        return wait if wait > self.tick_ms else self.tick_ms
+
+    def __repr__(self):
+        return (f"Messungen: {self.reads}, ausgelassene Takte {self.skipped}, "
+                f"Intervalle " + " ".join(f"{ch.name} {ch.interval(self.period_ms, self.max_ms)} ms"
+                                          for ch in self.channels))